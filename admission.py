@@ -0,0 +1,268 @@
+"""Admission control for the password endpoints: /login, /token and /register.
+
+Each of them runs bcrypt, so a credential-stuffing burst can occupy every
+worker's hashing pool and slow down all other traffic with it. Two checks
+shed that load before it costs a hash:
+
+- Token buckets per client IP and per account (the submitted username or
+  email) refuse callers over their rate with 429 and a Retry-After header.
+  The IP is the one uvicorn reports, taken from X-Forwarded-For when the
+  connection comes from an address in FORWARDED_ALLOW_IPS. Otherwise every
+  client behind the proxy shares the proxy's bucket; the Procfile trusts
+  any address, as only the platform's router can reach the dynos.
+- hashing.PasswordHasher refuses hashes once its queue is full or too slow,
+  which is turned into a 503 here. While the queue is full, requests are
+  refused before they reach the route at all.
+
+Buckets are kept per worker by default. With AUTH_RATE_LIMIT_BACKEND=redis
+they are shared by every worker and host (needs the ``redis`` package);
+when Redis cannot be reached requests are let through rather than refused.
+A burst or rate of 0 turns that limit off.
+
+Routes add the check as a dependency:
+
+    @router.post("/token", dependencies=[Depends(AuthAdmission("token", "username"))])
+"""
+import hashlib
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+from prometheus_client import Counter
+from hashing import PasswordHashingOverloaded, password_hasher
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+AUTH_RATE_LIMIT_BACKEND = os.getenv("AUTH_RATE_LIMIT_BACKEND", "memory")
+AUTH_RATE_LIMIT_REDIS_URL = os.getenv("AUTH_RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+# Buckets kept per worker by the memory backend; the least recently used
+# one is dropped past this, which only resets it to full.
+AUTH_RATE_LIMIT_SIZE = int(os.getenv("AUTH_RATE_LIMIT_SIZE", 100000))
+AUTH_RATE_LIMIT_IP_BURST = float(os.getenv("AUTH_RATE_LIMIT_IP_BURST", 20))
+AUTH_RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("AUTH_RATE_LIMIT_IP_PER_MINUTE", 20))
+AUTH_RATE_LIMIT_ACCOUNT_BURST = float(os.getenv("AUTH_RATE_LIMIT_ACCOUNT_BURST", 5))
+AUTH_RATE_LIMIT_ACCOUNT_PER_MINUTE = float(os.getenv("AUTH_RATE_LIMIT_ACCOUNT_PER_MINUTE", 5))
+# Suggested to clients refused because hashing is overloaded.
+OVERLOADED_RETRY_AFTER = 1
+
+AUTH_REQUESTS = Counter(
+	"auth_requests_total",
+	"Requests to the password endpoints, by outcome: served, rate_limited or overloaded.",
+	["endpoint", "outcome"],
+)
+
+
+class Limit:
+	def __init__(self, burst: float, per_minute: float):
+		self.burst = burst
+		self.rate = per_minute / 60
+
+	@property
+	def enabled(self) -> bool:
+		return self.burst > 0 and self.rate > 0
+
+
+class MemoryBuckets:
+	"""Per-process buckets, each a (tokens, updated) pair."""
+
+	def __init__(self, maxsize: int):
+		self.maxsize = maxsize
+		self._buckets = OrderedDict()
+
+	async def take(self, key: str, limit: Limit) -> float:
+		# No await between reading and writing the bucket, so concurrent
+		# requests on the loop cannot both spend its last token.
+		now = time.monotonic()
+		tokens, updated = self._buckets.pop(key, (limit.burst, now))
+		tokens = min(limit.burst, tokens + (now - updated) * limit.rate)
+		wait = 0.0
+		if tokens >= 1:
+			tokens -= 1
+		else:
+			wait = (1 - tokens) / limit.rate
+		self._buckets[key] = (tokens, now)
+		while len(self._buckets) > self.maxsize:
+			self._buckets.popitem(last=False)
+		return wait
+
+	def clear(self):
+		self._buckets.clear()
+
+	def stats(self) -> dict:
+		return {"backend": "memory", "size": len(self._buckets), "maxsize": self.maxsize}
+
+
+# Refills and takes from one bucket atomically, on the server's clock so
+# hosts with skewed clocks agree. Returns the seconds until a token is free,
+# 0 when one was taken, as a string since Lua numbers come back truncated.
+_TAKE_SCRIPT = """
+local burst = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+	tokens = tokens - 1
+else
+	wait = (1 - tokens) / rate
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated", tostring(now))
+redis.call("EXPIRE", KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+	"""Buckets shared by every worker; needs Redis 5 or later for TIME in a
+	script. A bucket expires once it would be full again.
+
+	Pass ``client`` to use a client other than the one built from ``url``.
+	"""
+
+	def __init__(self, url: str = AUTH_RATE_LIMIT_REDIS_URL, client=None, prefix: str = "auth_rate_limit:"):
+		if client is None:
+			import redis.asyncio as redis
+
+			client = redis.from_url(url)
+		self.client = client
+		self.prefix = prefix
+		self.errors = 0
+		self._take = client.register_script(_TAKE_SCRIPT)
+
+	async def take(self, key: str, limit: Limit) -> float:
+		try:
+			wait = await self._take(keys=[self.prefix + key], args=[limit.burst, limit.rate])
+		except Exception:
+			self.errors += 1
+			logger.warning("Rate limit check failed, letting the request through", exc_info=True)
+			return 0.0
+		return float(wait)
+
+	def clear(self):
+		pass
+
+	def stats(self) -> dict:
+		return {"backend": "redis", "errors": self.errors}
+
+
+class RateLimiter:
+	"""Token buckets by scope ("ip", "account") and key."""
+
+	def __init__(self, backend, limits: dict):
+		self.backend = backend
+		self.limits = limits
+		self.allowed = {scope: 0 for scope in limits}
+		self.limited = {scope: 0 for scope in limits}
+
+	async def take(self, scope: str, key: str) -> float:
+		"""Spend a token of ``key``'s bucket: 0 when there was one, otherwise
+		the seconds until there is."""
+		limit = self.limits[scope]
+		if not limit.enabled:
+			return 0.0
+		wait = await self.backend.take(f"{scope}:{key}", limit)
+		if wait:
+			self.limited[scope] += 1
+		else:
+			self.allowed[scope] += 1
+		return wait
+
+	def clear(self):
+		self.backend.clear()
+
+	def stats(self) -> dict:
+		return {
+			**self.backend.stats(),
+			"limits": {
+				scope: {"burst": limit.burst, "per_minute": limit.rate * 60, "allowed": self.allowed[scope], "limited": self.limited[scope]}
+				for scope, limit in self.limits.items()
+			},
+		}
+
+
+def _make_backend():
+	if AUTH_RATE_LIMIT_BACKEND == "redis":
+		return RedisBuckets(AUTH_RATE_LIMIT_REDIS_URL)
+	return MemoryBuckets(AUTH_RATE_LIMIT_SIZE)
+
+
+rate_limiter = RateLimiter(_make_backend(), {
+	"ip": Limit(AUTH_RATE_LIMIT_IP_BURST, AUTH_RATE_LIMIT_IP_PER_MINUTE),
+	"account": Limit(AUTH_RATE_LIMIT_ACCOUNT_BURST, AUTH_RATE_LIMIT_ACCOUNT_PER_MINUTE),
+})
+
+
+async def _account(request: Request, field: str) -> Optional[str]:
+	# FastAPI has already read the body for the route, and Starlette keeps
+	# it on the request, so this does not read it again.
+	try:
+		if request.headers.get("content-type", "").startswith("application/json"):
+			value = (await request.json()).get(field)
+		else:
+			value = (await request.form()).get(field)
+	except Exception:
+		return None
+	if not isinstance(value, str) or not value.strip():
+		return None
+	# Hashed, so the buckets, and Redis, hold no email addresses.
+	return hashlib.sha256(value.strip().lower().encode()).hexdigest()
+
+
+class AuthAdmission:
+	"""Dependency that rate limits a password endpoint by client IP and by the
+	account in its ``account_field``, and turns hashing overload into a 503.
+	Counts every request in auth_requests_total.
+	"""
+
+	def __init__(self, endpoint: str, account_field: str):
+		self.endpoint = endpoint
+		self.account_field = account_field
+
+	async def __call__(self, request: Request):
+		keys = (
+			("ip", request.client.host if request.client else None),
+			("account", await _account(request, self.account_field)),
+		)
+		for scope, key in keys:
+			if key is None:
+				continue
+			wait = await rate_limiter.take(scope, key)
+			if wait:
+				AUTH_REQUESTS.labels(self.endpoint, "rate_limited").inc()
+				raise HTTPException(
+					status_code=429,
+					detail="Too many attempts, try again later.",
+					headers={"Retry-After": str(math.ceil(wait))},
+				)
+
+		# Refused before the route takes a database connection it would only
+		# hold while queueing for the hash.
+		if password_hasher.overloaded():
+			AUTH_REQUESTS.labels(self.endpoint, "overloaded").inc()
+			raise _overloaded()
+
+		outcome = "served"
+		try:
+			yield
+		except PasswordHashingOverloaded:
+			outcome = "overloaded"
+			raise _overloaded() from None
+		finally:
+			AUTH_REQUESTS.labels(self.endpoint, outcome).inc()
+
+
+def _overloaded() -> HTTPException:
+	return HTTPException(
+		status_code=503,
+		detail="Too many sign-ins in progress, try again shortly.",
+		headers={"Retry-After": str(OVERLOADED_RETRY_AFTER)},
+	)
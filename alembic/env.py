@@ -23,6 +23,18 @@ if config.config_file_name is not None:
 # target_metadata = None
 target_metadata = Base.metadata
 
+# Database-maintained objects that are deliberately not on the models, so
+# autogenerate must not emit drops for them.
+UNMAPPED_OBJECTS = {
+    ("column", "search_vector"),
+    ("index", "ix_rfps_search_vector"),
+    ("index", "ix_suppliers_search_vector"),
+}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    return not (reflected and (type_, name) in UNMAPPED_OBJECTS)
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -47,6 +59,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -68,7 +81,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,27 @@
+"""organization owner index
+
+Revision ID: 0d6b93f2e5a8
+Revises: f4b2d8e6a1c7
+Create Date: 2026-10-19 09:41:27.630158
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0d6b93f2e5a8'
+down_revision: Union[str, None] = 'f4b2d8e6a1c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The membership lookup on every authorized request includes the
+    # organizations the user owns.
+    op.create_index('ix_organizations_owner_uuid', 'organizations', ['owner_uuid'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_organizations_owner_uuid', table_name='organizations')
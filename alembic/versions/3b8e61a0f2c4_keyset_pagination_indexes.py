@@ -0,0 +1,30 @@
+"""keyset pagination indexes
+
+Revision ID: 3b8e61a0f2c4
+Revises: d52c18cbd514
+Create Date: 2026-10-18 09:12:41.508312
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8e61a0f2c4'
+down_revision: Union[str, None] = 'd52c18cbd514'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # List endpoints seek on (created_at, id) newest first within an organization.
+    op.create_index('ix_rfps_organization_uuid_created_at_id', 'rfps', ['organization_uuid', 'created_at', 'id'], unique=False)
+    op.create_index('ix_suppliers_organization_uuid_created_at_id', 'suppliers', ['organization_uuid', 'created_at', 'id'], unique=False)
+    op.create_index('ix_organizations_created_at_id', 'organizations', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_organizations_created_at_id', table_name='organizations')
+    op.drop_index('ix_suppliers_organization_uuid_created_at_id', table_name='suppliers')
+    op.drop_index('ix_rfps_organization_uuid_created_at_id', table_name='rfps')
@@ -0,0 +1,44 @@
+"""jsonb data columns
+
+Revision ID: 7c41d9e5b2a8
+Revises: 3b8e61a0f2c4
+Create Date: 2026-10-18 11:40:05.214877
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c41d9e5b2a8'
+down_revision: Union[str, None] = '3b8e61a0f2c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for table in ('rfps', 'suppliers'):
+        op.alter_column(
+            table, 'data',
+            existing_type=sa.JSON(),
+            type_=postgresql.JSONB(astext_type=sa.Text()),
+            existing_nullable=True,
+            postgresql_using='data::jsonb',
+        )
+        # jsonb_path_ops serves @> (the eq/contains filters) with a smaller index than jsonb_ops.
+        op.create_index(f'ix_{table}_data', table, ['data'], unique=False, postgresql_using='gin', postgresql_ops={'data': 'jsonb_path_ops'})
+
+
+def downgrade() -> None:
+    for table in ('suppliers', 'rfps'):
+        op.drop_index(f'ix_{table}_data', table_name=table, postgresql_using='gin')
+        op.alter_column(
+            table, 'data',
+            existing_type=postgresql.JSONB(astext_type=sa.Text()),
+            type_=sa.JSON(),
+            existing_nullable=True,
+            postgresql_using='data::json',
+        )
@@ -0,0 +1,41 @@
+"""search vector
+
+Revision ID: a4f2c7e81b39
+Revises: 7c41d9e5b2a8
+Create Date: 2026-10-18 14:02:37.508112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4f2c7e81b39'
+down_revision: Union[str, None] = '7c41d9e5b2a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match SEARCH_CONFIG / SEARCH_DATA_FIELDS in search.py. Names weigh
+# most, then titles, then the longer description and category text.
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(data ->> 'title', '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(data ->> 'description', '') || ' ' || coalesce(data ->> 'category', '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    for table in ('rfps', 'suppliers'):
+        # A stored generated column is kept current by Postgres on every
+        # insert and update, including Core and bulk writes.
+        op.add_column(table, sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR, persisted=True)))
+        op.create_index(f'ix_{table}_search_vector', table, ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    for table in ('suppliers', 'rfps'):
+        op.drop_index(f'ix_{table}_search_vector', table_name=table, postgresql_using='gin')
+        op.drop_column(table, 'search_vector')
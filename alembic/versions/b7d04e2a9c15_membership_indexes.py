@@ -0,0 +1,46 @@
+"""membership indexes
+
+Revision ID: b7d04e2a9c15
+Revises: e3a91c5d7f20
+Create Date: 2026-10-18 19:03:52.117604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d04e2a9c15'
+down_revision: Union[str, None] = 'e3a91c5d7f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MEMBERSHIP_TABLES = (
+    ('organization_users', 'organization_uuid'),
+    ('supplier_users', 'supplier_uuid'),
+)
+
+
+def upgrade() -> None:
+    for table, column in MEMBERSHIP_TABLES:
+        # Nothing stopped a membership from being added twice; keep the oldest row.
+        op.execute(sa.text(
+            f"DELETE FROM {table} WHERE id NOT IN "
+            f"(SELECT min(id) FROM {table} GROUP BY user_uuid, {column})"
+        ))
+        # Every authorized request looks memberships up by user; the unique
+        # index serves that and "is the user a member of X" from the index alone.
+        op.create_index(f'ix_{table}_user_uuid_{column}', table, ['user_uuid', column], unique=True)
+        # Loading the members of an organization or supplier goes the other way.
+        op.create_index(f'ix_{table}_{column}', table, [column], unique=False)
+    # Nothing filters or sorts on logo_url; the index only slowed down writes.
+    op.drop_index('ix_suppliers_logo_url', table_name='suppliers')
+
+
+def downgrade() -> None:
+    op.create_index('ix_suppliers_logo_url', 'suppliers', ['logo_url'], unique=False)
+    for table, column in reversed(MEMBERSHIP_TABLES):
+        op.drop_index(f'ix_{table}_{column}', table_name=table)
+        op.drop_index(f'ix_{table}_user_uuid_{column}', table_name=table)
@@ -0,0 +1,56 @@
+"""job queue
+
+Revision ID: c5e8a1f3d926
+Revises: b7d04e2a9c15
+Create Date: 2026-10-18 21:12:40.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e8a1f3d926'
+down_revision: Union[str, None] = 'b7d04e2a9c15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('uuid', sa.UUID(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('run_at', sa.DateTime(), nullable=False),
+    sa.Column('locked_by', sa.String(), nullable=True),
+    sa.Column('locked_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('owner_uuid', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['owner_uuid'], ['users.uuid'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_jobs_id'), 'jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_jobs_uuid'), 'jobs', ['uuid'], unique=True)
+    op.create_index('ix_jobs_queued_run_at', 'jobs', ['run_at'], unique=False, postgresql_where=sa.text("status = 'queued'"))
+    op.create_index('ix_jobs_running_locked_at', 'jobs', ['locked_at'], unique=False, postgresql_where=sa.text("status = 'running'"))
+    op.create_index('ix_jobs_owner_uuid_created_at_id', 'jobs', ['owner_uuid', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_owner_uuid_created_at_id', table_name='jobs')
+    op.drop_index('ix_jobs_running_locked_at', table_name='jobs', postgresql_where=sa.text("status = 'running'"))
+    op.drop_index('ix_jobs_queued_run_at', table_name='jobs', postgresql_where=sa.text("status = 'queued'"))
+    op.drop_index(op.f('ix_jobs_uuid'), table_name='jobs')
+    op.drop_index(op.f('ix_jobs_id'), table_name='jobs')
+    op.drop_table('jobs')
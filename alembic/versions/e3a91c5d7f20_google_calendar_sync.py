@@ -0,0 +1,61 @@
+"""google calendar sync
+
+Revision ID: e3a91c5d7f20
+Revises: a4f2c7e81b39
+Create Date: 2026-10-18 17:25:13.840216
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a91c5d7f20'
+down_revision: Union[str, None] = 'a4f2c7e81b39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('google_credentials',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_uuid', sa.UUID(), nullable=False),
+    sa.Column('credentials', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('sync_token', sa.String(), nullable=True),
+    sa.Column('synced_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_uuid'], ['users.uuid'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_uuid')
+    )
+    op.create_index(op.f('ix_google_credentials_id'), 'google_credentials', ['id'], unique=False)
+    op.create_table('calendar_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_uuid', sa.UUID(), nullable=False),
+    sa.Column('google_id', sa.String(), nullable=False),
+    sa.Column('summary', sa.String(), nullable=True),
+    sa.Column('start_at', sa.DateTime(), nullable=False),
+    sa.Column('end_at', sa.DateTime(), nullable=False),
+    sa.Column('data', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_uuid'], ['users.uuid'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_calendar_events_id'), 'calendar_events', ['id'], unique=False)
+    # The sync upserts on (user, Google id); /events seeks on start time per user.
+    op.create_index('ix_calendar_events_user_uuid_google_id', 'calendar_events', ['user_uuid', 'google_id'], unique=True)
+    op.create_index('ix_calendar_events_user_uuid_start_at_id', 'calendar_events', ['user_uuid', 'start_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_calendar_events_user_uuid_start_at_id', table_name='calendar_events')
+    op.drop_index('ix_calendar_events_user_uuid_google_id', table_name='calendar_events')
+    op.drop_index(op.f('ix_calendar_events_id'), table_name='calendar_events')
+    op.drop_table('calendar_events')
+    op.drop_index(op.f('ix_google_credentials_id'), table_name='google_credentials')
+    op.drop_table('google_credentials')
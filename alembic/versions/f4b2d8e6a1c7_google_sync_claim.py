@@ -0,0 +1,26 @@
+"""google sync claim
+
+Revision ID: f4b2d8e6a1c7
+Revises: c5e8a1f3d926
+Create Date: 2026-10-18 23:05:12.284519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b2d8e6a1c7'
+down_revision: Union[str, None] = 'c5e8a1f3d926'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('google_credentials', sa.Column('sync_claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('google_credentials', 'sync_claimed_at')
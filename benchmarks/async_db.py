@@ -0,0 +1,74 @@
+"""Concurrent-request throughput: sync SessionLocal vs AsyncSession.
+
+Each simulated request runs the `get_current_user` lookup plus a
+`pg_sleep` that stands in for network latency to the database, once
+through the blocking session (what the handlers did before) and once
+through the AsyncSession path, all from inside the event loop.
+
+    python -m benchmarks.async_db --requests 200 --concurrency 20 --latency-ms 5
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import select, text
+
+from database import SessionLocal, AsyncSessionLocal, engine, async_engine
+from models import User
+
+
+def _user_lookup():
+	return select(User).filter(User.uuid == uuid.uuid4())
+
+
+async def sync_request(latency: float):
+	db = SessionLocal()
+	try:
+		db.execute(_user_lookup()).scalars().first()
+		db.execute(text("SELECT pg_sleep(:latency)"), {"latency": latency})
+	finally:
+		db.close()
+
+
+async def async_request(latency: float):
+	async with AsyncSessionLocal() as db:
+		(await db.execute(_user_lookup())).scalars().first()
+		await db.execute(text("SELECT pg_sleep(:latency)"), {"latency": latency})
+
+
+async def run(request, total: int, concurrency: int, latency: float) -> float:
+	semaphore = asyncio.Semaphore(concurrency)
+
+	async def one():
+		async with semaphore:
+			await request(latency)
+
+	# Warm up the pool so connection setup is not part of the measurement.
+	await asyncio.gather(*(one() for _ in range(concurrency)))
+	start = time.perf_counter()
+	await asyncio.gather(*(one() for _ in range(total)))
+	return total / (time.perf_counter() - start)
+
+
+async def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--requests", type=int, default=200)
+	parser.add_argument("--concurrency", type=int, default=20)
+	parser.add_argument("--latency-ms", type=float, default=5.0)
+	args = parser.parse_args()
+	latency = args.latency_ms / 1000
+
+	before = await run(sync_request, args.requests, args.concurrency, latency)
+	after = await run(async_request, args.requests, args.concurrency, latency)
+
+	print(f"requests={args.requests} concurrency={args.concurrency} latency={args.latency_ms}ms")
+	print(f"sync session   {before:10.1f} req/s")
+	print(f"async session  {after:10.1f} req/s  ({after / before:.1f}x)")
+
+	engine.dispose()
+	await async_engine.dispose()
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
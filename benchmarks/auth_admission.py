@@ -0,0 +1,85 @@
+"""Admission control on the password endpoints: what is shed, and how fast.
+
+Seeds one user into the database from DATABASE_URL_ENV, then, in-process:
+
+- sends --burst POST /api/token calls for that account one after another,
+  which the per-account bucket should cut off after its burst with 429;
+- with the rate limits off, sends --logins calls at --concurrency, more
+  than the hashing pool can queue, which should shed the excess with 503.
+
+Prints the count and median latency per status code, and the
+auth_requests_total outcomes. Refusals are meant to be much faster than a
+bcrypt verification.
+
+    python -m benchmarks.auth_admission --logins 200 --concurrency 64 --create-schema
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import defaultdict
+
+import httpx
+
+from admission import AUTH_REQUESTS, Limit, rate_limiter
+from benchmarks.login_throughput import PASSWORD, seed
+from database import engine
+from hashing import password_hasher
+from models import Base
+
+
+async def send(client: httpx.AsyncClient, email: str, count: int, concurrency: int) -> dict:
+	semaphore = asyncio.Semaphore(concurrency)
+	latencies = defaultdict(list)
+
+	async def login():
+		async with semaphore:
+			start = time.perf_counter()
+			response = await client.post("/api/token", data={"username": email, "password": PASSWORD})
+			latencies[response.status_code].append(time.perf_counter() - start)
+
+	await asyncio.gather(*(login() for _ in range(count)))
+	return latencies
+
+
+def report(name: str, latencies: dict):
+	print(name)
+	for status, samples in sorted(latencies.items()):
+		print(f"  {status}: {len(samples):5d} responses, median {statistics.median(samples) * 1000:8.1f} ms")
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--burst", type=int, default=20, help="sequential logins for the rate limit phase")
+	parser.add_argument("--logins", type=int, default=200, help="logins for the overload phase")
+	parser.add_argument("--concurrency", type=int, default=64)
+	parser.add_argument("--create-schema", action="store_true", help="create tables with metadata.create_all")
+	args = parser.parse_args()
+
+	if args.create_schema:
+		Base.metadata.create_all(engine)
+	email = seed()
+
+	from main import app
+
+	async def run():
+		transport = httpx.ASGITransport(app=app)
+		async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+			report("rate limited, one account", await send(client, email, args.burst, 1))
+			rate_limiter.limits = {scope: Limit(0, 0) for scope in rate_limiter.limits}
+			report(
+				f"overloaded, {password_hasher.max_workers} hash workers, queue {password_hasher.max_queue}, "
+				f"wait {password_hasher.max_wait} s",
+				await send(client, email, args.logins, args.concurrency),
+			)
+
+	asyncio.run(run())
+	print("auth_requests_total")
+	for metric in AUTH_REQUESTS.collect():
+		for sample in metric.samples:
+			if sample.name.endswith("_total"):
+				print(f"  {sample.labels['endpoint']:8s} {sample.labels['outcome']:12s} {int(sample.value)}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,112 @@
+"""Rows per second: single-item create endpoints vs the bulk endpoints.
+
+Registers a throwaway user and organization through the API on the
+database from DATABASE_URL_ENV, then creates the same number of RFPs and
+suppliers once with POST /api/rfp and /api/supplier and once with the
+/bulk variants, in-process. Then queues a ?background=true import and
+runs its job twice, as a redelivered job would be, and checks the second
+run adds no rows.
+
+    python -m benchmarks.bulk_create --rows 500 --batch-size 250
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+from database import engine
+from models import Base
+
+
+async def register(client: httpx.AsyncClient) -> tuple:
+	response = await client.post("/api/register", json={
+		"email": f"bench-{uuid.uuid4().hex[:8]}@example.com",
+		"first_name": "Bench",
+		"last_name": "Bulk",
+		"password": "benchmark-password",
+	})
+	response.raise_for_status()
+	headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+	response = await client.post("/api/organization", json={"name": "Bulk benchmark"}, headers=headers)
+	response.raise_for_status()
+	return headers, response.json()["uuid"]
+
+
+def make_items(kind: str, organization_uuid: str, rows: int) -> list:
+	items = [{"organization_uuid": organization_uuid, "data": {"i": i, "source": "benchmark"}} for i in range(rows)]
+	if kind == "supplier":
+		for i, item in enumerate(items):
+			item["name"] = f"Supplier {i}"
+	return items
+
+
+async def single(client, headers, kind, items, concurrency) -> float:
+	semaphore = asyncio.Semaphore(concurrency)
+
+	async def create(item):
+		async with semaphore:
+			(await client.post(f"/api/{kind}", json=item, headers=headers)).raise_for_status()
+
+	start = time.perf_counter()
+	await asyncio.gather(*(create(item) for item in items))
+	return len(items) / (time.perf_counter() - start)
+
+
+async def bulk(client, headers, kind, items, batch_size) -> float:
+	start = time.perf_counter()
+	for offset in range(0, len(items), batch_size):
+		response = await client.post(f"/api/{kind}/bulk", json=items[offset:offset + batch_size], headers=headers)
+		response.raise_for_status()
+		assert not response.json()["errors"], response.json()["errors"][:3]
+	return len(items) / (time.perf_counter() - start)
+
+
+async def background_twice(client, headers, kind, items) -> int:
+	from sqlalchemy import func, select
+	from database import AsyncSessionLocal
+	from job_handlers import rfp_bulk_create, supplier_bulk_create
+	from models import RFP, Job, Supplier
+
+	response = await client.post(f"/api/{kind}/bulk", params={"background": "true"}, json=items, headers=headers)
+	response.raise_for_status()
+	model, run = (RFP, rfp_bulk_create) if kind == "rfp" else (Supplier, supplier_bulk_create)
+	async with AsyncSessionLocal() as db:
+		payload = await db.scalar(select(Job.payload).where(Job.uuid == uuid.UUID(response.json()["uuid"])))
+		before = await db.scalar(select(func.count()).select_from(model))
+		first, second = await run(payload), await run(payload)
+		after = await db.scalar(select(func.count()).select_from(model))
+	assert first == second and not first["errors"], "the second run reported other rows"
+	assert after - before == len(items), f"{after - before} rows for {len(items)} items"
+	return len(first["created"])
+
+
+async def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--rows", type=int, default=500)
+	parser.add_argument("--batch-size", type=int, default=250)
+	parser.add_argument("--concurrency", type=int, default=8, help="parallel single-item requests")
+	parser.add_argument("--create-schema", action="store_true", help="create tables with metadata.create_all")
+	args = parser.parse_args()
+
+	if args.create_schema:
+		Base.metadata.create_all(engine)
+
+	from main import app
+
+	transport = httpx.ASGITransport(app=app)
+	async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+		headers, organization_uuid = await register(client)
+		print(f"rows={args.rows} batch_size={args.batch_size} concurrency={args.concurrency}")
+		for kind in ("rfp", "supplier"):
+			items = make_items(kind, organization_uuid, args.rows)
+			single_rate = await single(client, headers, kind, items, args.concurrency)
+			bulk_rate = await bulk(client, headers, kind, items, args.batch_size)
+			print(f"{kind:10s} single {single_rate:9.1f} rows/s   bulk {bulk_rate:9.1f} rows/s  ({bulk_rate / single_rate:.1f}x)")
+			created = await background_twice(client, headers, kind, items[:args.batch_size])
+			print(f"{kind:10s} job run twice created {created} rows once")
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
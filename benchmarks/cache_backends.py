@@ -0,0 +1,78 @@
+"""Behaviour check of the shared cache backends against a local stand-in.
+
+Runs the same scenario through response_cache.ResponseCache on the memory
+backend and on RedisBackend over fakeredis (``pip install fakeredis``),
+so the Redis code path is exercised without a server: bodies are served
+only under their own ETag and variant, variants past
+RESPONSE_CACHE_VARIANTS are dropped oldest first, and invalidate() and
+clear() drop entries. Exits 1 on any failed check.
+
+    python -m benchmarks.cache_backends
+"""
+import asyncio
+import sys
+import uuid
+
+import fakeredis
+
+from response_cache import RESPONSE_CACHE_VARIANTS, MemoryBackend, RedisBackend, ResponseCache
+
+failures = []
+
+
+def check(name: str, condition: bool):
+	print(f"  {'ok  ' if condition else 'FAIL'} {name}")
+	if not condition:
+		failures.append(name)
+
+
+async def settle(backend):
+	# RedisBackend sends deletes from tasks, as the session hooks calling it are sync.
+	await asyncio.gather(*getattr(backend, "_pending", ()))
+
+
+async def exercise(cache: ResponseCache):
+	organization = str(uuid.uuid4())
+	owner, member = cache.key(organization, "owner"), cache.key(organization, "member")
+
+	check("miss on an empty cache", await cache.get(owner, "W/1", "a") is None)
+	await cache.set(owner, "W/1", "a", b"owner body")
+	check("hit under the same etag and variant", await cache.get(owner, "W/1", "a") == b"owner body")
+	check("miss under another etag", await cache.get(owner, "W/2", "a") is None)
+	check("miss under another variant", await cache.get(owner, "W/1", "b") is None)
+	check("miss under another permission scope", await cache.get(member, "W/1", "a") is None)
+
+	for i in range(RESPONSE_CACHE_VARIANTS + 1):
+		await cache.set(member, "W/1", f"v{i}", f"body {i}".encode())
+	if isinstance(cache.backend, MemoryBackend):
+		check("oldest variant dropped past the limit", await cache.get(member, "W/1", "v0") is None)
+	check("newest variant kept", await cache.get(member, "W/1", f"v{RESPONSE_CACHE_VARIANTS}") == f"body {RESPONSE_CACHE_VARIANTS}".encode())
+
+	cache.invalidate(organization)
+	await settle(cache.backend)
+	check("invalidate drops every scope", await cache.get(owner, "W/1", "a") is None and await cache.get(member, "W/1", "v1") is None)
+
+	await cache.set(owner, "W/1", "a", b"owner body")
+	cache.clear()
+	await settle(cache.backend)
+	check("clear drops everything", await cache.get(owner, "W/1", "a") is None)
+
+
+async def run():
+	backends = {
+		"memory": MemoryBackend("check_memory", 100, 60),
+		"redis (fakeredis)": RedisBackend("check_redis", 60, client=fakeredis.FakeAsyncRedis()),
+	}
+	for name, backend in backends.items():
+		print(name)
+		await exercise(ResponseCache(f"check_{name.split()[0]}", backend))
+
+
+def main():
+	asyncio.run(run())
+	print("FAILED" if failures else "ok")
+	sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+	main()
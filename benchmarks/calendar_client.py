@@ -0,0 +1,156 @@
+"""Google Calendar client against a local fake Calendar server.
+
+Starts a fake server in a thread that serves events.list and the OAuth
+token endpoint, with a fixed latency per call, and points the client at it
+through GOOGLE_CALENDAR_BASE_URL and GOOGLE_TOKEN_URI. Nothing goes to Google. It reports:
+
+  build      rebuilding the service per request (the old route) vs the cached one
+  events     concurrent events.list calls for several users, and how long the
+             event loop stalled while they ran (it should stay near zero)
+  refresh    a token expiring within the refresh margin is refreshed once,
+             before the call, and handed to that call's on_refresh, also
+             when the transport is reused by a later call
+
+    python -m benchmarks.calendar_client --users 8 --calls 40 --latency-ms 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeCalendar(BaseHTTPRequestHandler):
+	latency = 0.05
+	token_requests = 0
+	event_requests = 0
+	lock = threading.Lock()
+
+	def log_message(self, *args):
+		pass
+
+	def _reply(self, body: dict):
+		time.sleep(self.latency)
+		payload = json.dumps(body).encode()
+		self.send_response(200)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(payload)))
+		self.end_headers()
+		self.wfile.write(payload)
+
+	def do_POST(self):
+		self.rfile.read(int(self.headers.get("Content-Length", 0)))
+		with self.lock:
+			FakeCalendar.token_requests += 1
+		self._reply({"access_token": f"token-{time.monotonic_ns()}", "expires_in": 3600, "token_type": "Bearer"})
+
+	def do_GET(self):
+		assert self.headers["Authorization"].startswith("Bearer "), "request was not authorized"
+		with self.lock:
+			FakeCalendar.event_requests += 1
+		self._reply({
+			"kind": "calendar#events",
+			"items": [{"id": f"event-{i}", "summary": f"Event {i}"} for i in range(10)],
+		})
+
+
+def credentials_info(user: int, expires_in: timedelta) -> dict:
+	expiry = datetime.now(timezone.utc).replace(tzinfo=None) + expires_in
+	return {
+		"token": f"user-{user}-token",
+		"refresh_token": f"user-{user}-refresh",
+		"client_id": "fake-client",
+		"client_secret": "fake-secret",
+		"expiry": expiry.isoformat() + "Z",
+	}
+
+
+def list_events(service):
+	return service.events().list(calendarId="primary", maxResults=10, singleEvents=True, orderBy="startTime")
+
+
+async def max_loop_stall(stop: asyncio.Event) -> float:
+	worst = 0.0
+	while not stop.is_set():
+		start = time.perf_counter()
+		await asyncio.sleep(0.001)
+		worst = max(worst, time.perf_counter() - start - 0.001)
+	return worst
+
+
+async def run(args):
+	import google_calendar
+	from googleapiclient.discovery import build
+
+	start = time.perf_counter()
+	for _ in range(args.builds):
+		build("calendar", "v3", developerKey="unused", static_discovery=True, cache_discovery=False)
+	per_build = (time.perf_counter() - start) / args.builds
+	google_calendar.calendar_service()
+	start = time.perf_counter()
+	for _ in range(args.builds):
+		google_calendar.calendar_service()
+	per_cached = (time.perf_counter() - start) / args.builds
+	print(f"build     per request {per_build * 1000:8.2f} ms   cached {per_cached * 1000:8.4f} ms")
+
+	infos = {user: credentials_info(user, timedelta(hours=1)) for user in range(args.users)}
+	stop = asyncio.Event()
+	stall = asyncio.create_task(max_loop_stall(stop))
+	start = time.perf_counter()
+	results = await asyncio.gather(*(
+		google_calendar.execute(f"user-{call % args.users}", infos[call % args.users], list_events)
+		for call in range(args.calls)
+	))
+	elapsed = time.perf_counter() - start
+	stop.set()
+	worst_stall = await stall
+	assert all(len(result["items"]) == 10 for result in results)
+	assert FakeCalendar.token_requests == 0, "fresh tokens were refreshed"
+	serial = args.calls * args.latency_ms / 1000
+	print(
+		f"events    {args.calls} calls for {args.users} users in {elapsed * 1000:.0f} ms "
+		f"(serial {serial * 1000:.0f} ms), max loop stall {worst_stall * 1000:.1f} ms"
+	)
+
+	refreshed = []
+	expiring = credentials_info(args.users, google_calendar.GOOGLE_TOKEN_REFRESH_MARGIN / 2)
+	for _ in range(2):
+		await google_calendar.execute("expiring", expiring, list_events, on_refresh=refreshed.append)
+	assert FakeCalendar.token_requests == 1, f"expected one refresh, got {FakeCalendar.token_requests}"
+	assert len(refreshed) == 1 and refreshed[0].token.startswith("token-")
+
+	# A later call reuses the cached transport, and its own callback must get the next refresh.
+	google_calendar.user_transport("expiring", expiring).credentials.expiry = google_calendar._utcnow()
+	later = []
+	await google_calendar.execute("expiring", expiring, list_events, on_refresh=later.append)
+	assert FakeCalendar.token_requests == 2, f"expected a second refresh, got {FakeCalendar.token_requests}"
+	assert len(later) == 1 and len(refreshed) == 1, "the refresh went to an earlier call's callback"
+	print(f"refresh   token refreshed once ahead of expiry, then reported to the later caller; {FakeCalendar.event_requests} event calls served")
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--users", type=int, default=8)
+	parser.add_argument("--calls", type=int, default=40)
+	parser.add_argument("--latency-ms", type=float, default=50)
+	parser.add_argument("--builds", type=int, default=20)
+	args = parser.parse_args()
+
+	FakeCalendar.latency = args.latency_ms / 1000
+	server = ThreadingHTTPServer(("127.0.0.1", 0), FakeCalendar)
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	base_url = f"http://127.0.0.1:{server.server_port}"
+	# Read by google_calendar at import time.
+	os.environ["GOOGLE_CALENDAR_BASE_URL"] = f"{base_url}/calendar/v3/"
+	os.environ["GOOGLE_TOKEN_URI"] = f"{base_url}/token"
+	try:
+		asyncio.run(run(args))
+	finally:
+		server.shutdown()
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,268 @@
+"""Calendar sync against a local fake Calendar server, then /events reads.
+
+The fake server keeps an in-memory calendar with a change version per
+event, hands out sync tokens and pages like the Calendar API, and answers
+410 Gone for tokens it has expired. Against it this checks and times:
+
+  full         first sync of --events events
+  incremental  a sync after a few edits, cancellations and additions, which
+               must only fetch those changes
+  resync       an expired sync token, which falls back to a full sync and
+               drops events the calendar no longer has
+  claim        a sync of a user another sync holds is refused, and a sync
+               whose claim was dropped (as on reconnecting) writes nothing
+  events       paging through /api/events, with and without a time range
+
+Uses the database from DATABASE_URL_ENV (use a scratch database).
+
+    python -m benchmarks.calendar_sync --events 2000 --create-schema
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+
+from benchmarks.calendar_client import credentials_info
+
+PAGE_TOKEN_PREFIX = "offset-"
+
+
+class FakeCalendarState:
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.version = 0
+		self.events = {}
+		self.expired_tokens = set()
+		self.items_served = 0
+
+	def put(self, event: dict):
+		with self.lock:
+			self.version += 1
+			self.events[event["id"]] = {**event, "_version": self.version}
+
+	def cancel(self, id: str):
+		self.put({**self.events[id], "status": "cancelled"})
+
+	def forget(self, id: str):
+		# Gone without a cancellation record, as after Google prunes history.
+		with self.lock:
+			del self.events[id]
+
+
+state = FakeCalendarState()
+
+
+class FakeCalendar(BaseHTTPRequestHandler):
+	def log_message(self, *args):
+		pass
+
+	def _reply(self, status: int, body: dict):
+		payload = json.dumps(body).encode()
+		self.send_response(status)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(payload)))
+		self.end_headers()
+		self.wfile.write(payload)
+
+	def do_GET(self):
+		query = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+		page_size = int(query.get("maxResults", 250))
+		offset = int(query.get("pageToken", PAGE_TOKEN_PREFIX + "0")[len(PAGE_TOKEN_PREFIX):])
+		with state.lock:
+			sync_token = query.get("syncToken")
+			if sync_token in state.expired_tokens:
+				self._reply(410, {"error": {"code": 410, "message": "Sync token is no longer valid"}})
+				return
+			if sync_token:
+				since = int(sync_token)
+				events = [event for event in state.events.values() if event["_version"] > since]
+			else:
+				events = [event for event in state.events.values() if event.get("status") != "cancelled"]
+			events.sort(key=lambda event: event["_version"])
+			page = [{k: v for k, v in event.items() if k != "_version"} for event in events[offset:offset + page_size]]
+			state.items_served += len(page)
+			body = {"kind": "calendar#events", "items": page}
+			if offset + page_size < len(events):
+				body["nextPageToken"] = f"{PAGE_TOKEN_PREFIX}{offset + page_size}"
+			else:
+				body["nextSyncToken"] = str(state.version)
+		self._reply(200, body)
+
+
+def make_event(i: int, start: datetime) -> dict:
+	begins = start + timedelta(hours=i)
+	return {
+		"id": f"event{i}",
+		"status": "confirmed",
+		"summary": f"Event {i}",
+		"start": {"dateTime": begins.isoformat() + "Z"},
+		"end": {"dateTime": (begins + timedelta(minutes=30)).isoformat() + "Z"},
+	}
+
+
+def seed_user():
+	from database import SessionLocal
+	from models import GoogleCredential, User
+
+	db = SessionLocal()
+	try:
+		user = User(email=f"calendar-{uuid.uuid4().hex[:8]}@example.com", first_name="Bench", last_name="Calendar", hashed_password="x")
+		db.add(user)
+		db.flush()
+		db.add(GoogleCredential(user_uuid=user.uuid, credentials=credentials_info(0, timedelta(hours=1))))
+		db.commit()
+		return user.uuid
+	finally:
+		db.close()
+
+
+async def timed_sync(user_uuid) -> tuple:
+	from calendar_sync import sync_user_by_uuid
+
+	served = state.items_served
+	start = time.perf_counter()
+	await sync_user_by_uuid(user_uuid)
+	return time.perf_counter() - start, state.items_served - served
+
+
+async def local_count(user_uuid) -> int:
+	from sqlalchemy import func, select
+	from database import AsyncSessionLocal
+	from models import CalendarEvent
+
+	async with AsyncSessionLocal() as db:
+		return await db.scalar(select(func.count()).select_from(CalendarEvent).where(CalendarEvent.user_uuid == user_uuid))
+
+
+async def check_claim(user_uuid):
+	from sqlalchemy import select, update
+	from calendar_sync import SyncInProgress, _claim, sync_user, sync_user_by_uuid
+	from database import AsyncSessionLocal
+	from models import GoogleCredential
+
+	async with AsyncSessionLocal() as db:
+		id = await db.scalar(select(GoogleCredential.id).where(GoogleCredential.user_uuid == user_uuid))
+		claimed_at = await _claim(db, id)
+		assert claimed_at is not None
+		try:
+			await sync_user_by_uuid(user_uuid)
+		except SyncInProgress:
+			pass
+		else:
+			raise AssertionError("a second sync ran while the user was claimed")
+
+		with state.lock:
+			state.expired_tokens.clear()
+		state.put(make_event(10 ** 6, datetime(2026, 1, 1)))
+		before = await local_count(user_uuid)
+		# Reconnecting Google drops the claim of the sync in flight.
+		await db.execute(update(GoogleCredential).where(GoogleCredential.id == id).values(sync_claimed_at=None))
+		await db.commit()
+		sync_token = await db.scalar(select(GoogleCredential.sync_token).where(GoogleCredential.id == id))
+		assert await sync_user(db, await db.get(GoogleCredential, id), claimed_at) == 0
+
+	async with AsyncSessionLocal() as db:
+		assert await db.scalar(select(GoogleCredential.sync_token).where(GoogleCredential.id == id)) == sync_token
+	assert await local_count(user_uuid) == before, "a sync that lost its claim wrote events"
+	seconds, fetched = await timed_sync(user_uuid)
+	assert await local_count(user_uuid) == before + 1
+	print(f"claim        {fetched:6d} events fetched once free, {seconds * 1000:8.1f} ms")
+
+
+async def page_through(client, headers, params) -> tuple:
+	items, pages, cursor = [], 0, None
+	start = time.perf_counter()
+	while True:
+		response = await client.get("/api/events", params={**params, **({"cursor": cursor} if cursor else {})}, headers=headers)
+		response.raise_for_status()
+		body = response.json()
+		items.extend(body["items"])
+		pages += 1
+		cursor = body["next_cursor"]
+		if not cursor:
+			return items, pages, time.perf_counter() - start
+
+
+async def run(args):
+	from depencies import create_access_token
+	from main import app
+
+	start = datetime(2026, 1, 1)
+	for i in range(args.events):
+		state.put(make_event(i, start))
+	user_uuid = seed_user()
+
+	seconds, fetched = await timed_sync(user_uuid)
+	assert await local_count(user_uuid) == args.events
+	print(f"full         {fetched:6d} events fetched, {seconds * 1000:8.1f} ms")
+
+	for i in range(5):
+		state.put({**make_event(i, start), "summary": f"Edited {i}"})
+	for i in range(5, 8):
+		state.cancel(f"event{i}")
+	for i in range(args.events, args.events + 2):
+		state.put(make_event(i, start))
+	seconds, fetched = await timed_sync(user_uuid)
+	assert fetched == 10, f"incremental sync fetched {fetched} events, expected 10"
+	assert await local_count(user_uuid) == args.events - 3 + 2
+	print(f"incremental  {fetched:6d} events fetched, {seconds * 1000:8.1f} ms")
+
+	state.forget("event10")
+	with state.lock:
+		state.expired_tokens.update(str(version) for version in range(state.version + 1))
+	seconds, fetched = await timed_sync(user_uuid)
+	expected = args.events - 3 + 2 - 1
+	assert await local_count(user_uuid) == expected
+	print(f"resync       {fetched:6d} events fetched, {seconds * 1000:8.1f} ms")
+
+	await check_claim(user_uuid)
+	expected += 1
+
+	headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user_uuid)})}"}
+	async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+		items, pages, seconds = await page_through(client, headers, {"limit": 200})
+		starts = [item["start"]["dateTime"] for item in items]
+		assert len(items) == expected and starts == sorted(starts)
+		print(f"events       {len(items):6d} events in {pages} pages, {seconds / pages * 1000:8.2f} ms per page")
+
+		window = {"time_min": (start + timedelta(hours=100)).isoformat(), "time_max": (start + timedelta(hours=148)).isoformat()}
+		items, pages, seconds = await page_through(client, headers, {**window, "limit": 20})
+		assert len(items) == 48, f"time range returned {len(items)} events"
+		print(f"events       {len(items):6d} events in a 48h window, {seconds / pages * 1000:8.2f} ms per page")
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--events", type=int, default=2000)
+	parser.add_argument("--create-schema", action="store_true", help="create tables with metadata.create_all")
+	args = parser.parse_args()
+
+	server = ThreadingHTTPServer(("127.0.0.1", 0), FakeCalendar)
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	base_url = f"http://127.0.0.1:{server.server_port}"
+	# Read at import time; the background sync stays off, this drives it.
+	os.environ["GOOGLE_CALENDAR_BASE_URL"] = f"{base_url}/calendar/v3/"
+	os.environ["GOOGLE_TOKEN_URI"] = f"{base_url}/token"
+	os.environ["GOOGLE_SYNC_INTERVAL"] = "0"
+
+	if args.create_schema:
+		from database import engine
+		from models import Base
+
+		Base.metadata.create_all(engine)
+	try:
+		asyncio.run(run(args))
+	finally:
+		server.shutdown()
+
+
+if __name__ == "__main__":
+	main()
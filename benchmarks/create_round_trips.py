@@ -0,0 +1,106 @@
+"""Round-trip regression check for the create endpoints.
+
+Runs POST /api/register, /api/organization, /api/rfp and /api/supplier
+in-process against the database from DATABASE_URL_ENV (use a scratch
+database) and counts, per request, the SQL statements plus the BEGINs and
+COMMITs sent on the async engine, each of which is a round trip to the
+server. Fails if any endpoint goes over its budget. Caches are cleared
+before each request, so the counts include the user and membership
+lookups.
+
+    python -m benchmarks.create_round_trips --create-schema
+"""
+import argparse
+import asyncio
+import sys
+import uuid
+from collections import Counter
+
+import httpx
+from sqlalchemy import event
+
+from cache import caches
+from database import async_engine, engine
+from models import Base
+
+ROUND_TRIP_BUDGETS = {
+	# The email check is committed before the password is hashed, so the
+	# connection is not held through bcrypt; that costs a COMMIT and a BEGIN.
+	"register": 6,
+	"create_organization": 5,
+	"create_rfp": 5,
+	"create_supplier": 6,
+}
+
+counts = Counter()
+
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+	counts["statements"] += 1
+
+
+@event.listens_for(async_engine.sync_engine, "begin")
+def _count_begin(conn):
+	counts["begins"] += 1
+
+
+@event.listens_for(async_engine.sync_engine, "commit")
+def _count_commit(conn):
+	counts["commits"] += 1
+
+
+async def measure() -> dict:
+	from main import app
+
+	results = {}
+
+	async def call(name, path, body, headers=None):
+		for cache in caches.values():
+			cache.clear()
+		counts.clear()
+		response = await client.post(path, json=body, headers=headers)
+		response.raise_for_status()
+		results[name] = dict(counts)
+		return response.json()
+
+	transport = httpx.ASGITransport(app=app)
+	async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+		registered = await call("register", "/api/register", {
+			"email": f"bench-{uuid.uuid4().hex[:8]}@example.com",
+			"first_name": "Bench",
+			"last_name": "Writer",
+			"password": "benchmark-password",
+		})
+		headers = {"Authorization": f"Bearer {registered['access_token']}"}
+		organization = await call("create_organization", "/api/organization", {"name": "Round trips"}, headers)
+		item = {"organization_uuid": organization["uuid"], "data": {"source": "benchmark"}}
+		await call("create_rfp", "/api/rfp", item, headers)
+		await call("create_supplier", "/api/supplier", {**item, "name": "Round trip supplier"}, headers)
+	return results
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--create-schema", action="store_true", help="create tables with metadata.create_all")
+	args = parser.parse_args()
+
+	if args.create_schema:
+		Base.metadata.create_all(engine)
+	results = asyncio.run(measure())
+
+	failed = False
+	for name, result in results.items():
+		round_trips = sum(result.values())
+		budget = ROUND_TRIP_BUDGETS[name]
+		status = "ok" if round_trips <= budget else "OVER BUDGET"
+		failed = failed or round_trips > budget
+		print(
+			f"{name:20s} {round_trips:3d} round trips (budget {budget}): "
+			f"{result.get('statements', 0)} statements, {result.get('begins', 0)} begin, {result.get('commits', 0)} commit  {status}"
+		)
+	sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+	main()
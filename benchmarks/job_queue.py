@@ -0,0 +1,96 @@
+"""Job queue check: every job runs exactly once, failures are retried.
+
+Queues --jobs jobs of a benchmark kind on the database from
+DATABASE_URL_ENV (use a scratch database), each failing its first attempt
+when --flaky says so, runs a jobs.Worker with --concurrency loops until
+the queue is empty, and reports jobs per second. Fails if a job ran more
+often than its failed attempts explain or did not succeed. Run it from
+several shells at once against Postgres to see SKIP LOCKED share the
+queue between processes; SQLite ignores FOR UPDATE.
+
+    python -m benchmarks.job_queue --jobs 500 --concurrency 8 --create-schema
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import Counter
+
+# Retries would otherwise wait ten seconds.
+os.environ.setdefault("JOB_RETRY_DELAY", "0.05")
+
+from sqlalchemy import func, select
+
+import jobs
+from database import AsyncSessionLocal, engine
+from models import Base, Job
+
+runs = Counter()
+
+
+@jobs.handler("benchmark")
+async def benchmark(payload: dict):
+	runs[payload["i"]] += 1
+	await asyncio.sleep(payload["sleep"])
+	if payload["flaky"] and runs[payload["i"]] == 1:
+		raise RuntimeError("first attempt fails")
+	return {"runs": runs[payload["i"]]}
+
+
+async def measure(count: int, concurrency: int, flaky: float, sleep: float) -> tuple:
+	async with AsyncSessionLocal() as db:
+		queued = [
+			jobs.enqueue(db, "benchmark", {"i": i, "flaky": i < count * flaky, "sleep": sleep})
+			for i in range(count)
+		]
+		await db.commit()
+	uuids = [job.uuid for job in queued]
+
+	worker = jobs.Worker(concurrency, poll_interval=0.01)
+	start = time.perf_counter()
+	running = asyncio.create_task(worker.run())
+	while True:
+		async with AsyncSessionLocal() as db:
+			statuses = dict((await db.execute(
+				select(Job.status, func.count()).where(Job.uuid.in_(uuids)).group_by(Job.status)
+			)).all())
+		if statuses.get(jobs.QUEUED, 0) + statuses.get(jobs.RUNNING, 0) == 0:
+			break
+		await asyncio.sleep(0.05)
+	elapsed = time.perf_counter() - start
+	worker.stop()
+	await running
+	return statuses, elapsed
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--jobs", type=int, default=200)
+	parser.add_argument("--concurrency", type=int, default=4)
+	parser.add_argument("--flaky", type=float, default=0.1, help="share of jobs whose first attempt fails")
+	parser.add_argument("--sleep", type=float, default=0.005, help="seconds each attempt takes")
+	parser.add_argument("--create-schema", action="store_true", help="create tables with metadata.create_all")
+	args = parser.parse_args()
+
+	# The failed first attempts are expected; keep their tracebacks quiet.
+	logging.getLogger("jobs").setLevel(logging.ERROR)
+	if args.create_schema:
+		Base.metadata.create_all(engine)
+	statuses, elapsed = asyncio.run(measure(args.jobs, args.concurrency, args.flaky, args.sleep))
+
+	expected = {i: 2 if i < args.jobs * args.flaky else 1 for i in range(args.jobs)}
+	flaky = sum(1 for i in expected if expected[i] == 2)
+	wrong = {i: runs[i] for i in expected if runs[i] != expected[i]}
+	print(f"{args.jobs} jobs ({flaky} retried once) with {args.concurrency} loops: {elapsed:.2f} s, {args.jobs / elapsed:.0f} jobs/s")
+	print(f"statuses: {statuses}")
+	failed = bool(wrong) or statuses.get(jobs.SUCCEEDED, 0) != args.jobs
+	if wrong:
+		print(f"jobs run an unexpected number of times: {dict(list(wrong.items())[:10])}")
+	print("FAILED" if failed else "ok")
+	sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+	main()
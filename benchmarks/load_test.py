@@ -0,0 +1,302 @@
+"""Load test of the main API endpoints, compared against a stored baseline.
+
+Seeds synthetic organizations, users, RFPs and suppliers at the requested
+scale into the database from DATABASE_URL_ENV (a local Postgres, or an
+embedded SQLite file as a stand-in), then drives each scenario under
+concurrency through the app from main.py, in-process by default or over
+HTTP with --base-url. Per scenario it records p50/p95/p99 latency,
+throughput, SQL statements per request (from the x-query-count header)
+and errors.
+
+With --compare the results are checked against a baseline file and the
+run exits 1 on any regression: errors, more queries on the cold or warm
+path of a request, or latency/throughput worse than --tolerance. Latency
+and throughput are only compared when the baseline was recorded with the
+same database and scale.
+
+    python -m benchmarks.load_test --create-schema --save-baseline benchmarks/baseline.json
+    python -m benchmarks.load_test --create-schema --compare benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import sys
+import time
+import uuid
+from datetime import timedelta
+
+import httpx
+from sqlalchemy import insert
+
+# Every login comes from one client, and admission control would shed it:
+# measure the endpoints, not the limits. A server given with --base-url
+# needs the same settings.
+for _name in ("AUTH_RATE_LIMIT_IP_BURST", "AUTH_RATE_LIMIT_ACCOUNT_BURST", "PASSWORD_HASH_MAX_QUEUE", "PASSWORD_HASH_MAX_WAIT"):
+	os.environ.setdefault(_name, "0")
+
+from cache import caches
+from database import engine
+from instrumentation import QUERY_COUNT_HEADER
+from models import Base, Organization, OrganizationUser, RFP, Supplier, SupplierUser, User
+
+PASSWORD = "benchmark-password"
+SEED_BATCH_SIZE = 5000
+
+
+def _insert(connection, model, rows: list):
+	for offset in range(0, len(rows), SEED_BATCH_SIZE):
+		connection.execute(insert(model), rows[offset:offset + SEED_BATCH_SIZE])
+
+
+def seed(args) -> list:
+	"""Insert the dataset with Core executemany and return one
+	(email, user_uuid, organization_uuid) entry per user.
+	"""
+	from depencies import get_password_hash
+
+	# One hash for everyone: bcrypt per user would dominate seeding.
+	hashed_password = get_password_hash(PASSWORD)
+	run = uuid.uuid4().hex[:8]
+	users, organizations, organization_users = [], [], []
+	rfps, suppliers, supplier_users = [], [], []
+	accounts = []
+	for o in range(args.organizations):
+		organization_uuid = uuid.uuid4()
+		members = []
+		for u in range(args.users_per_org):
+			user_uuid = uuid.uuid4()
+			email = f"load-{run}-{o}-{u}@example.com"
+			users.append(dict(
+				uuid=user_uuid, email=email, first_name="Load", last_name=f"User {u}",
+				hashed_password=hashed_password, active_organization_uuid=organization_uuid,
+			))
+			organization_users.append(dict(user_uuid=user_uuid, organization_uuid=organization_uuid))
+			accounts.append((email, user_uuid, organization_uuid))
+			members.append(user_uuid)
+		organizations.append(dict(uuid=organization_uuid, name=f"Load org {o}", owner_uuid=members[0]))
+		for i in range(args.rfps_per_org):
+			rfps.append(dict(
+				uuid=uuid.uuid4(), name=f"RFP {i}", organization_uuid=organization_uuid,
+				owner_uuid=members[i % len(members)], data={"i": i, "status": "open" if i % 2 else "closed"},
+			))
+		for i in range(args.suppliers_per_org):
+			supplier_uuid = uuid.uuid4()
+			suppliers.append(dict(
+				uuid=supplier_uuid, name=f"Supplier {i}", organization_uuid=organization_uuid,
+				owner_uuid=members[i % len(members)], data={"i": i},
+			))
+			supplier_users.extend(dict(user_uuid=member, supplier_uuid=supplier_uuid) for member in members)
+
+	with engine.begin() as connection:
+		# users.active_organization_uuid and organizations.owner_uuid point at
+		# each other, so users go in first without their active organization.
+		_insert(connection, User, [{**user, "active_organization_uuid": None} for user in users])
+		_insert(connection, Organization, organizations)
+		for user in users:
+			connection.execute(
+				User.__table__.update().where(User.uuid == user["uuid"]).values(active_organization_uuid=user["active_organization_uuid"])
+			)
+		_insert(connection, OrganizationUser, organization_users)
+		_insert(connection, RFP, rfps)
+		_insert(connection, Supplier, suppliers)
+		_insert(connection, SupplierUser, supplier_users)
+	return accounts
+
+
+def build_scenarios(accounts: list, tokens: list) -> dict:
+	"""Each scenario maps a request number to (method, path, httpx kwargs),
+	spreading requests across the seeded users and their organizations.
+	"""
+	def auth(i):
+		return {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+
+	def organization(i):
+		return str(accounts[i % len(accounts)][2])
+
+	return {
+		"login": lambda i: ("POST", "/api/token", {
+			"data": {"username": accounts[i % len(accounts)][0], "password": PASSWORD},
+		}),
+		"get_rfps": lambda i: ("GET", "/api/rfp", {
+			"params": {"organization_uuid": organization(i)}, "headers": auth(i),
+		}),
+		"get_suppliers": lambda i: ("GET", "/api/suppliers", {
+			"params": {"organization_uuid": organization(i)}, "headers": auth(i),
+		}),
+		"get_organizations": lambda i: ("GET", "/api/organization", {"headers": auth(i)}),
+		"get_organization": lambda i: ("GET", f"/api/organization/{organization(i)}", {"headers": auth(i)}),
+		"create_rfp": lambda i: ("POST", "/api/rfp", {
+			"json": {"organization_uuid": organization(i), "data": {"load": i}}, "headers": auth(i),
+		}),
+		"create_supplier": lambda i: ("POST", "/api/supplier", {
+			"json": {"organization_uuid": organization(i), "name": f"Load supplier {i}"}, "headers": auth(i),
+		}),
+	}
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+	return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+async def run_scenario(client: httpx.AsyncClient, request, requests: int, concurrency: int) -> dict:
+	semaphore = asyncio.Semaphore(concurrency)
+	latencies, query_counts, errors = [], [], 0
+
+	async def one(i):
+		nonlocal errors
+		method, path, kwargs = request(i)
+		async with semaphore:
+			start = time.perf_counter()
+			response = await client.request(method, path, **kwargs)
+			latencies.append(time.perf_counter() - start)
+		if response.status_code >= 400:
+			errors += 1
+		count = response.headers.get(QUERY_COUNT_HEADER.decode())
+		if count is not None:
+			query_counts.append(int(count))
+
+	start = time.perf_counter()
+	await asyncio.gather(*(one(i) for i in range(requests)))
+	elapsed = time.perf_counter() - start
+
+	latencies.sort()
+	return {
+		"requests": requests,
+		"errors": errors,
+		"throughput_rps": requests / elapsed,
+		"p50_ms": percentile(latencies, 0.50) * 1000,
+		"p95_ms": percentile(latencies, 0.95) * 1000,
+		"p99_ms": percentile(latencies, 0.99) * 1000,
+		"queries_per_request": sum(query_counts) / len(query_counts) if query_counts else None,
+		# Cold (cache misses) and warm paths of the request.
+		"queries_min": min(query_counts) if query_counts else None,
+		"queries_max": max(query_counts) if query_counts else None,
+	}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+	"""Return a description of every regression against ``baseline``."""
+	regressions = []
+	same_setup = baseline.get("config") == results["config"]
+	for name, current in results["scenarios"].items():
+		previous = baseline["scenarios"].get(name)
+		if previous is None:
+			continue
+		if current["errors"]:
+			regressions.append(f"{name}: {current['errors']} failed requests")
+		# Every scenario starts cold, so the maximum is the cold path at any
+		# scale; how often the warm path is reached depends on the scale.
+		for key in ("queries_max", "queries_min") if same_setup else ("queries_max",):
+			if current.get(key) is not None and previous.get(key) is not None and current[key] > previous[key]:
+				regressions.append(f"{name}: {key} {current[key]}, baseline {previous[key]}")
+		if not same_setup:
+			continue
+		if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+			regressions.append(f"{name}: p95 {current['p95_ms']:.1f} ms, baseline {previous['p95_ms']:.1f} ms")
+		if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+			regressions.append(
+				f"{name}: {current['throughput_rps']:.1f} req/s, baseline {previous['throughput_rps']:.1f} req/s"
+			)
+	if not same_setup:
+		print("baseline was recorded with a different database or scale; comparing query counts and errors only")
+	return regressions
+
+
+async def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--organizations", type=int, default=10)
+	parser.add_argument("--users-per-org", type=int, default=10)
+	parser.add_argument("--rfps-per-org", type=int, default=500)
+	parser.add_argument("--suppliers-per-org", type=int, default=100)
+	parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+	parser.add_argument("--login-requests", type=int, default=40, help="requests for the bcrypt-bound login scenario")
+	parser.add_argument("--concurrency", type=int, default=16)
+	parser.add_argument("--scenario", action="append", help="run only these scenarios (repeatable)")
+	parser.add_argument("--base-url", help="drive a running server over HTTP instead of the app in-process")
+	parser.add_argument("--create-schema", action="store_true", help="create tables with metadata.create_all")
+	parser.add_argument("--output", help="write the results as JSON")
+	parser.add_argument("--compare", help="baseline JSON to compare against; exit 1 on regression")
+	parser.add_argument("--save-baseline", help="write the results as the new baseline")
+	parser.add_argument("--tolerance", type=float, default=0.25, help="allowed latency/throughput regression")
+	parser.add_argument("--log-level", default="ERROR", help="root log level while measuring in-process")
+	args = parser.parse_args()
+
+	if args.create_schema:
+		Base.metadata.create_all(engine)
+	start = time.perf_counter()
+	accounts = seed(args)
+	print(f"seeded {len(accounts)} users in {args.organizations} organizations in {time.perf_counter() - start:.1f}s")
+
+	from depencies import create_access_token
+
+	tokens = [
+		create_access_token(data={"sub": str(user_uuid)}, expires_delta=timedelta(hours=1))
+		for _, user_uuid, _ in accounts
+	]
+	scenarios = build_scenarios(accounts, tokens)
+	if args.scenario:
+		scenarios = {name: scenarios[name] for name in args.scenario}
+
+	if args.base_url:
+		client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+	else:
+		from main import app
+
+		# main.py logs at DEBUG, which would dominate the timings.
+		logging.getLogger().setLevel(args.log_level)
+		# Unhandled errors become 500s and count as failed requests.
+		transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+		client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60)
+
+	results = {
+		"config": {
+			"database": engine.dialect.name,
+			"organizations": args.organizations,
+			"users_per_org": args.users_per_org,
+			"rfps_per_org": args.rfps_per_org,
+			"suppliers_per_org": args.suppliers_per_org,
+			"concurrency": args.concurrency,
+		},
+		"scenarios": {},
+	}
+	async with client:
+		print(f"{'scenario':18s} {'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'queries':>10s} {'errors':>7s}")
+		for name, request in scenarios.items():
+			requests = args.login_requests if name == "login" else args.requests
+			concurrency = args.concurrency
+			if name.startswith("create_") and engine.dialect.name == "sqlite":
+				# SQLite allows one writer at a time; concurrent creates only fail with "database is locked".
+				concurrency = 1
+			if not args.base_url:
+				for cache in caches.values():
+					cache.clear()
+			result = await run_scenario(client, request, requests, concurrency)
+			results["scenarios"][name] = result
+			queries = "-" if result["queries_min"] is None else f"{result['queries_min']}-{result['queries_max']}"
+			print(
+				f"{name:18s} {result['throughput_rps']:8.1f} {result['p50_ms']:8.1f} {result['p95_ms']:8.1f} "
+				f"{result['p99_ms']:8.1f} {queries:>10s} {result['errors']:7d}"
+			)
+
+	for path in (args.output, args.save_baseline):
+		if path:
+			with open(path, "w") as f:
+				json.dump(results, f, indent=2)
+				f.write("\n")
+
+	if args.compare:
+		with open(args.compare) as f:
+			baseline = json.load(f)
+		regressions = compare(results, baseline, args.tolerance)
+		for regression in regressions:
+			print(f"REGRESSION {regression}")
+		if regressions:
+			sys.exit(1)
+		print("no regressions against", args.compare)
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
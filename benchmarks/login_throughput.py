@@ -0,0 +1,118 @@
+"""Login throughput while other traffic is running.
+
+Seeds one user into the database from DATABASE_URL_ENV, then drives
+concurrent POST /api/token calls alongside a steady stream of cheap
+GET / requests, in-process. It runs once with bcrypt inline on the event
+loop and once through the bounded hashing pool, and reports login
+throughput, the throughput of the other traffic and event-loop lag.
+
+    python -m benchmarks.login_throughput --logins 40 --concurrency 8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+
+import httpx
+
+# Every login is for one account from one client, and more of them queue
+# than admission control lets through: measure hashing, not the limits.
+for _name in ("AUTH_RATE_LIMIT_IP_BURST", "AUTH_RATE_LIMIT_ACCOUNT_BURST", "PASSWORD_HASH_MAX_QUEUE", "PASSWORD_HASH_MAX_WAIT"):
+	os.environ.setdefault(_name, "0")
+
+from database import SessionLocal, engine
+from depencies import get_password_hash
+from hashing import PasswordHasher, password_hasher, pwd_context
+from models import Base, User
+
+PASSWORD = "benchmark-password"
+
+
+def seed() -> str:
+	db = SessionLocal()
+	try:
+		email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+		db.add(User(email=email, first_name="Bench", last_name="Login", hashed_password=get_password_hash(PASSWORD)))
+		db.commit()
+		return email
+	finally:
+		db.close()
+
+
+async def run(client: httpx.AsyncClient, email: str, logins: int, concurrency: int) -> dict:
+	semaphore = asyncio.Semaphore(concurrency)
+	done = asyncio.Event()
+	other_requests = 0
+	loop_lag = []
+
+	async def login():
+		async with semaphore:
+			response = await client.post("/api/token", data={"username": email, "password": PASSWORD})
+			response.raise_for_status()
+
+	async def other_traffic():
+		nonlocal other_requests
+		while not done.is_set():
+			(await client.get("/")).raise_for_status()
+			other_requests += 1
+			await asyncio.sleep(0)
+
+	async def lag_probe():
+		# How late a 5 ms timer fires is what every other request on the worker waits.
+		while not done.is_set():
+			start = time.perf_counter()
+			await asyncio.sleep(0.005)
+			loop_lag.append(time.perf_counter() - start - 0.005)
+
+	background = [asyncio.create_task(other_traffic()) for _ in range(4)]
+	background.append(asyncio.create_task(lag_probe()))
+	start = time.perf_counter()
+	await asyncio.gather(*(login() for _ in range(logins)))
+	elapsed = time.perf_counter() - start
+	done.set()
+	await asyncio.gather(*background)
+
+	loop_lag.sort()
+	return {
+		"logins_per_second": logins / elapsed,
+		"other_per_second": other_requests / elapsed,
+		"lag_p50_ms": statistics.median(loop_lag) * 1000,
+		"lag_max_ms": loop_lag[-1] * 1000,
+	}
+
+
+async def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--logins", type=int, default=40)
+	parser.add_argument("--concurrency", type=int, default=8)
+	parser.add_argument("--create-schema", action="store_true", help="create tables with metadata.create_all")
+	args = parser.parse_args()
+
+	if args.create_schema:
+		Base.metadata.create_all(engine)
+	email = seed()
+
+	import depencies
+	from main import app
+
+	transport = httpx.ASGITransport(app=app)
+	async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+		await run(client, email, 2, 2)
+		depencies.password_hasher = PasswordHasher(pwd_context, 0)
+		inline = await run(client, email, args.logins, args.concurrency)
+		depencies.password_hasher = password_hasher
+		pooled = await run(client, email, args.logins, args.concurrency)
+
+	print(f"logins={args.logins} concurrency={args.concurrency} workers={password_hasher.max_workers}")
+	for name, result in (("inline", inline), ("pooled", pooled)):
+		print(
+			f"{name:8s} {result['logins_per_second']:7.1f} logins/s   "
+			f"other traffic {result['other_per_second']:8.1f} req/s   "
+			f"loop lag p50 {result['lag_p50_ms']:6.1f} ms, max {result['lag_max_ms']:6.1f} ms"
+		)
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
@@ -0,0 +1,91 @@
+"""Check that the Google OAuth state cannot be used as an access token.
+
+The state travels through Google's redirect URL, so it must only ever be
+accepted by the OAuth callback. Registers a throwaway user in-process on
+the database from DATABASE_URL_ENV and checks that POST /api/user refuses
+the state as a bearer token, a state-like token without an audience too,
+while the callback's reader accepts the state and refuses an access
+token, and that /loginGoogle answers with the auth URL as JSON. Needs
+GOOGLE_CLIENT_SECRET set to a client configuration, as the google router
+does. Exits 1 on any failed check.
+
+    python -m benchmarks.oauth_state --create-schema
+"""
+import argparse
+import asyncio
+import sys
+import uuid
+from urllib.parse import parse_qs, urlparse
+from uuid import UUID
+
+import httpx
+from fastapi import HTTPException
+
+from database import engine
+from depencies import create_access_token
+from models import Base
+
+failures = []
+
+
+def check(name: str, condition: bool):
+	print(f"{'ok  ' if condition else 'FAIL'} {name}")
+	if not condition:
+		failures.append(name)
+
+
+async def run():
+	from main import app
+	from routes.google import OAUTH_STATE_PURPOSE, create_oauth_state, read_oauth_state
+
+	transport = httpx.ASGITransport(app=app)
+	async with httpx.AsyncClient(transport=transport, base_url="http://check") as client:
+		response = await client.post("/api/register", json={
+			"email": f"check-{uuid.uuid4().hex[:8]}@example.com",
+			"first_name": "Check",
+			"last_name": "State",
+			"password": "check-password",
+		})
+		response.raise_for_status()
+		access_token = response.json()["access_token"]
+		user_uuid = UUID(response.json()["user"]["uuid"])
+
+		async def status(token: str) -> int:
+			return (await client.post("/api/user", headers={"Authorization": f"Bearer {token}"})).status_code
+
+		state = create_oauth_state(user_uuid)
+		check("the access token authenticates", await status(access_token) == 200)
+		check("the OAuth state does not authenticate", await status(state) == 401)
+		unscoped = create_access_token({"sub": str(user_uuid), "purpose": OAUTH_STATE_PURPOSE})
+		check("a token with a purpose but no audience does not authenticate", await status(unscoped) == 401)
+
+		# Answered as JSON, since a page sending a bearer token cannot follow
+		# a cross-origin redirect.
+		response = await client.get("/api/loginGoogle", headers={"Authorization": f"Bearer {access_token}"})
+		auth_url = response.json().get("auth_url", "") if response.status_code == 200 else ""
+		query = parse_qs(urlparse(auth_url).query)
+		check("/loginGoogle returns the auth URL with a state", bool(query.get("state")))
+		if query.get("state"):
+			check("the auth URL's state names the user", read_oauth_state(query["state"][0]) == user_uuid)
+
+	check("the callback reads the state", read_oauth_state(state) == user_uuid)
+	try:
+		read_oauth_state(access_token)
+		check("the callback refuses an access token", False)
+	except HTTPException as e:
+		check("the callback refuses an access token", e.status_code == 400)
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--create-schema", action="store_true", help="create tables with metadata.create_all")
+	args = parser.parse_args()
+
+	if args.create_schema:
+		Base.metadata.create_all(engine)
+	asyncio.run(run())
+	sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,135 @@
+"""Query-count regression check for the list endpoints.
+
+Seeds an organization with many RFPs, suppliers and members into the
+database from DATABASE_URL_ENV (use a scratch database), calls the list
+endpoints in-process, in their default shallow shape and with every
+relationship expanded, and the batch reads with 50 uuids. Fails if any of
+them runs more SQL statements than its budget. The budgets do not depend on the number of rows, so an
+N+1 regression shows up as a failure rather than a slowdown.
+
+    python -m benchmarks.query_counts --rows 100
+"""
+import argparse
+import asyncio
+import sys
+import uuid
+
+import httpx
+
+from database import SessionLocal, engine
+from instrumentation import QUERY_COUNT_HEADER
+from cache import caches
+from models import Base, User, Organization, OrganizationUser, RFP, Supplier, SupplierUser, Invitation
+
+# Statements per request with cold caches, so including the user and
+# membership lookups.
+QUERY_BUDGETS = {
+	"get_rfps": 3,
+	"get_rfps_expanded": 3,
+	"get_suppliers": 4,  # includes the ETag fingerprint query
+	"get_suppliers_expanded": 5,
+	"get_organizations": 2,
+	"get_organizations_expanded": 6,
+	"get_rfps_batch": 3,
+	"get_suppliers_batch": 4,
+}
+
+PASSWORD = "benchmark-password"
+
+
+def seed(rows: int) -> tuple:
+	from depencies import get_password_hash
+
+	db = SessionLocal()
+	try:
+		email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+		owner = User(email=email, first_name="Bench", last_name="Owner", hashed_password=get_password_hash(PASSWORD))
+		db.add(owner)
+		db.flush()
+
+		organizations = [Organization(name=f"Org {i}", owner_uuid=owner.uuid) for i in range(3)]
+		db.add_all(organizations)
+		db.flush()
+		owner.active_organization_uuid = organizations[0].uuid
+
+		for organization in organizations:
+			db.add(OrganizationUser(user_uuid=owner.uuid, organization_uuid=organization.uuid))
+			members = [
+				User(email=f"member-{uuid.uuid4().hex[:8]}@example.com", first_name="Bench", last_name="Member", hashed_password="x")
+				for _ in range(5)
+			]
+			db.add_all(members)
+			db.flush()
+			for member in members:
+				db.add(OrganizationUser(user_uuid=member.uuid, organization_uuid=organization.uuid))
+				db.add(Invitation(email=member.email, organization_uuid=organization.uuid, owner_uuid=owner.uuid))
+
+			for i in range(rows):
+				owner_uuid = members[i % len(members)].uuid
+				db.add(RFP(name=f"RFP {i}", organization_uuid=organization.uuid, owner_uuid=owner_uuid, data={"i": i}))
+				supplier = Supplier(name=f"Supplier {i}", organization_uuid=organization.uuid, owner_uuid=owner_uuid, data={"i": i})
+				db.add(supplier)
+				db.flush()
+				db.add(SupplierUser(user_uuid=owner.uuid, supplier_uuid=supplier.uuid))
+		db.commit()
+		return email, organizations[0].uuid
+	finally:
+		db.close()
+
+
+async def measure(email: str, organization_uuid) -> dict:
+	from main import app
+
+	transport = httpx.ASGITransport(app=app)
+	async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+		response = await client.post("/api/token", data={"username": email, "password": PASSWORD})
+		response.raise_for_status()
+		headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+		params = {"organization_uuid": str(organization_uuid)}
+		batches = {}
+		for name, path in (("rfp", "/api/rfp"), ("supplier", "/api/suppliers")):
+			response = await client.get(path, params={**params, "fields": "uuid", "limit": 50}, headers=headers)
+			response.raise_for_status()
+			batches[name] = {**params, "uuid": [item["uuid"] for item in response.json()["items"]]}
+
+		counts = {}
+		for name, path, query in (
+			("get_rfps", "/api/rfp", params),
+			("get_rfps_expanded", "/api/rfp", {**params, "expand": "owner,organization"}),
+			("get_suppliers", "/api/suppliers", params),
+			("get_suppliers_expanded", "/api/suppliers", {**params, "expand": "owner,organization,users"}),
+			("get_organizations", "/api/organization", None),
+			("get_organizations_expanded", "/api/organization", {"expand": "users,invitations,rfps,suppliers"}),
+			("get_rfps_batch", "/api/rfp/batch", {**batches["rfp"], "expand": "owner,organization"}),
+			("get_suppliers_batch", "/api/suppliers/batch", {**batches["supplier"], "expand": "owner,organization,users"}),
+		):
+			for cache in caches.values():
+				cache.clear()
+			response = await client.get(path, params=query, headers=headers)
+			response.raise_for_status()
+			counts[name] = int(response.headers[QUERY_COUNT_HEADER.decode()])
+		return counts
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--rows", type=int, default=100, help="RFPs and suppliers per organization")
+	parser.add_argument("--create-schema", action="store_true", help="create tables with metadata.create_all")
+	args = parser.parse_args()
+
+	if args.create_schema:
+		Base.metadata.create_all(engine)
+	email, organization_uuid = seed(args.rows)
+	counts = asyncio.run(measure(email, organization_uuid))
+
+	failed = False
+	for name, count in counts.items():
+		budget = QUERY_BUDGETS[name]
+		status = "ok" if count <= budget else "OVER BUDGET"
+		failed = failed or count > budget
+		print(f"{name:28s} {count:4d} queries (budget {budget})  {status}")
+	sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,172 @@
+"""Query-plan regression check for the routers' hot queries.
+
+Fills the membership and listing tables at scale with generate_series
+(Postgres only), ANALYZEs them, then runs EXPLAIN ANALYZE on the
+statements the routers issue on every request: membership lookups, the
+RFP and supplier list pages and the member loads behind organization and
+supplier responses. It fails if any plan sequentially scans one of the
+large tables, which at this size means an index is missing or unusable.
+
+    python -m benchmarks.query_plans --users 20000 --organizations 2000 --rows 200000
+"""
+import argparse
+import json
+import sys
+import uuid
+
+from sqlalchemy import literal, select, text, union_all
+
+from database import engine
+from models import Organization, OrganizationUser, RFP, Supplier, SupplierUser
+from pagination import PageParams, paginate
+
+CHECKED_TABLES = {"users", "organizations", "organization_users", "rfps", "suppliers", "supplier_users"}
+
+
+def seed(run: str, users: int, organizations: int, rows: int, memberships: int):
+	prefix = f"plan-{run}-"
+	statements = [
+		("users", """
+			INSERT INTO users (uuid, email, first_name, last_name, hashed_password, created_at, updated_at)
+			SELECT gen_random_uuid(), :prefix || i || '@example.com', 'Plan', 'User', 'x',
+				now() AT TIME ZONE 'utc', now() AT TIME ZONE 'utc'
+			FROM generate_series(1, :users) AS i
+		"""),
+		("organizations", """
+			INSERT INTO organizations (uuid, name, owner_uuid, created_at, updated_at)
+			SELECT gen_random_uuid(), :prefix || i, run.users[1 + i % cardinality(run.users)],
+				(now() AT TIME ZONE 'utc') - random() * interval '365 days', now() AT TIME ZONE 'utc'
+			FROM generate_series(1, :organizations) AS i, run
+		"""),
+		# User i joins organizations i .. i + memberships - 1 (mod the count), so no pair repeats.
+		("organization_users", """
+			INSERT INTO organization_users (user_uuid, organization_uuid, created_at, updated_at)
+			SELECT run.users[u], run.organizations[1 + (u + j) % cardinality(run.organizations)],
+				now() AT TIME ZONE 'utc', now() AT TIME ZONE 'utc'
+			FROM run, generate_series(1, cardinality(run.users)) AS u, generate_series(0, :memberships - 1) AS j
+		"""),
+		("rfps", """
+			INSERT INTO rfps (uuid, name, organization_uuid, owner_uuid, data, created_at, updated_at)
+			SELECT gen_random_uuid(), 'RFP ' || i,
+				run.organizations[1 + i % cardinality(run.organizations)], run.users[1 + i % cardinality(run.users)],
+				jsonb_build_object('i', i), (now() AT TIME ZONE 'utc') - random() * interval '365 days', now() AT TIME ZONE 'utc'
+			FROM generate_series(1, :rows) AS i, run
+		"""),
+		("suppliers", """
+			INSERT INTO suppliers (uuid, name, organization_uuid, owner_uuid, data, created_at, updated_at)
+			SELECT gen_random_uuid(), 'Supplier ' || i,
+				run.organizations[1 + i % cardinality(run.organizations)], run.users[1 + i % cardinality(run.users)],
+				jsonb_build_object('i', i), (now() AT TIME ZONE 'utc') - random() * interval '365 days', now() AT TIME ZONE 'utc'
+			FROM generate_series(1, :rows) AS i, run
+		"""),
+		("supplier_users", """
+			INSERT INTO supplier_users (user_uuid, supplier_uuid, created_at, updated_at)
+			SELECT owner_uuid, uuid, now() AT TIME ZONE 'utc', now() AT TIME ZONE 'utc'
+			FROM suppliers WHERE organization_uuid = ANY((SELECT organizations FROM run))
+		"""),
+	]
+	run_arrays = f"""
+		WITH run AS (
+			SELECT
+				(SELECT array_agg(uuid ORDER BY id) FROM users WHERE email LIKE '{prefix}%') AS users,
+				(SELECT array_agg(uuid ORDER BY id) FROM organizations WHERE name LIKE '{prefix}%') AS organizations
+		)
+	"""
+	params = {"prefix": prefix, "users": users, "organizations": organizations, "rows": rows, "memberships": memberships}
+	with engine.begin() as connection:
+		for table, statement in statements:
+			connection.execute(text(run_arrays + statement), params)
+		for table in CHECKED_TABLES:
+			connection.execute(text(f"ANALYZE {table}"))
+		user_uuid, organization_uuid = connection.execute(text("""
+			SELECT ou.user_uuid, ou.organization_uuid FROM organization_users ou
+			JOIN users u ON u.uuid = ou.user_uuid WHERE u.email = :email LIMIT 1
+		"""), {"email": f"{prefix}1@example.com"}).one()
+		supplier_uuids = connection.execute(
+			select(Supplier.uuid).where(Supplier.organization_uuid == organization_uuid).limit(50)
+		).scalars().all()
+	return user_uuid, organization_uuid, supplier_uuids
+
+
+def hot_queries(user_uuid, organization_uuid, supplier_uuids) -> dict:
+	page = PageParams(limit=50, cursor=None)
+	return {
+		# depencies.load_memberships
+		"memberships": union_all(
+			select(literal("organization").label("kind"), OrganizationUser.organization_uuid.label("uuid")).filter(
+				OrganizationUser.user_uuid == user_uuid
+			),
+			select(literal("supplier").label("kind"), SupplierUser.supplier_uuid.label("uuid")).filter(
+				SupplierUser.user_uuid == user_uuid
+			),
+			select(literal("owner").label("kind"), Organization.uuid.label("uuid")).filter(
+				Organization.owner_uuid == user_uuid
+			),
+		),
+		# get_rfps, first page
+		"rfp_page": paginate(select(RFP).filter(RFP.organization_uuid == organization_uuid), RFP, page),
+		# get_suppliers, first page
+		"supplier_page": paginate(
+			select(Supplier).join(SupplierUser).filter(
+				SupplierUser.user_uuid == user_uuid, Supplier.organization_uuid == organization_uuid
+			),
+			Supplier, page,
+		),
+		# selectinload(Organization.users) and the organization ETag
+		"organization_members": select(OrganizationUser.user_uuid).where(
+			OrganizationUser.organization_uuid.in_([organization_uuid])
+		),
+		# selectinload(Supplier.users)
+		"supplier_members": select(SupplierUser.user_uuid).where(SupplierUser.supplier_uuid.in_(supplier_uuids)),
+	}
+
+
+def _walk(node):
+	yield node
+	for child in node.get("Plans", []):
+		yield from _walk(child)
+
+
+def seq_scans(plan: dict) -> list:
+	"""The checked tables that ``plan`` reads with a sequential scan."""
+	return sorted({
+		node["Relation Name"] for node in _walk(plan["Plan"])
+		if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in CHECKED_TABLES
+	})
+
+
+def explain(connection, stmt) -> dict:
+	sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+	raw = connection.execute(text("EXPLAIN (ANALYZE, FORMAT JSON) " + sql)).scalar()
+	return (json.loads(raw) if isinstance(raw, str) else raw)[0]
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--users", type=int, default=20000)
+	parser.add_argument("--organizations", type=int, default=2000)
+	parser.add_argument("--rows", type=int, default=200000, help="RFPs and suppliers each")
+	parser.add_argument("--memberships", type=int, default=3, help="organizations per user")
+	args = parser.parse_args()
+
+	if engine.dialect.name != "postgresql":
+		parser.error("plans are only meaningful on Postgres; point DATABASE_URL_ENV at a scratch Postgres database")
+
+	user_uuid, organization_uuid, supplier_uuids = seed(
+		uuid.uuid4().hex[:8], args.users, args.organizations, args.rows, args.memberships
+	)
+
+	failed = False
+	with engine.connect() as connection:
+		for name, stmt in hot_queries(user_uuid, organization_uuid, supplier_uuids).items():
+			plan = explain(connection, stmt)
+			scanned = seq_scans(plan)
+			indexes = sorted({node["Index Name"] for node in _walk(plan["Plan"]) if "Index Name" in node})
+			failed = failed or bool(scanned)
+			status = f"SEQ SCAN on {', '.join(scanned)}" if scanned else "ok"
+			print(f"{name:22s} {plan['Execution Time']:8.2f} ms  {status:30s} {', '.join(indexes)}")
+	sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+	main()
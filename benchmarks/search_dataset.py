@@ -0,0 +1,119 @@
+"""Generate a large searchable organization and time GET /api/search on it.
+
+Registers a throwaway user and organization through the API, fills it with
+--rows RFPs and --rows suppliers generated server-side with generate_series
+(Postgres only), then runs a fixed query mix in-process and prints latency
+percentiles and the number of first-page hits per query.
+
+    python -m benchmarks.search_dataset --rows 1000000 --repeat 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from sqlalchemy import text
+
+from database import engine
+from benchmarks.bulk_create import register
+
+COMMON_WORDS = [
+	"steel", "concrete", "timber", "cable", "pump", "valve", "turbine", "solar", "panel", "roofing",
+	"logistics", "freight", "catering", "cleaning", "security", "consulting", "software", "hardware",
+	"network", "maintenance", "installation", "inspection", "supply", "delivery", "framework", "annual",
+	"regional", "municipal", "hospital", "school", "bridge", "road", "water", "waste", "energy", "fleet",
+	"uniform", "printing", "furniture", "laboratory",
+]
+RARE_WORDS = [f"part{i:05d}" for i in range(20000)]
+CATEGORIES = ["construction", "services", "it", "facilities", "transport", "health"]
+
+QUERIES = [
+	"steel",                   # common single term
+	"solar panel",             # two common terms, AND
+	'"bridge inspection"',     # phrase
+	"pump OR valve",           # disjunction
+	"part00042",               # rare term
+	"logistics -freight",      # negation
+]
+
+
+def _pick(array: str, size: int) -> str:
+	return f"{array}[1 + floor(random() * {size})::int]"
+
+
+def _words(count: int) -> str:
+	return " || ' ' || ".join(_pick("common", len(COMMON_WORDS)) for _ in range(count))
+
+
+def seed(table: str, organization_uuid: str, owner_uuid: str, rows: int):
+	# Each row draws fresh random words; volatile functions are evaluated per row.
+	statement = text(f"""
+		INSERT INTO {table} (uuid, organization_uuid, owner_uuid, name, data, created_at, updated_at)
+		SELECT
+			gen_random_uuid(), :organization_uuid, :owner_uuid,
+			{_words(2)} || ' ' || {_pick("rare", len(RARE_WORDS))},
+			jsonb_build_object(
+				'title', {_words(3)},
+				'description', {_words(12)} || ' ' || {_pick("rare", len(RARE_WORDS))},
+				'category', {_pick("categories", len(CATEGORIES))},
+				'budget', jsonb_build_object('amount', floor(random() * 100000)::int)
+			),
+			(now() AT TIME ZONE 'utc') - random() * interval '365 days',
+			now() AT TIME ZONE 'utc'
+		FROM generate_series(1, :rows),
+			(SELECT CAST(:common AS text[]) AS common, CAST(:rare AS text[]) AS rare, CAST(:categories AS text[]) AS categories) AS vocabulary
+	""")
+	with engine.begin() as connection:
+		connection.execute(statement, {
+			"organization_uuid": organization_uuid,
+			"owner_uuid": owner_uuid,
+			"rows": rows,
+			"common": COMMON_WORDS,
+			"rare": RARE_WORDS,
+			"categories": CATEGORIES,
+		})
+		connection.execute(text(f"ANALYZE {table}"))
+
+
+async def measure(client, headers, organization_uuid, q, repeat) -> tuple:
+	timings, hits = [], 0
+	for _ in range(repeat):
+		start = time.perf_counter()
+		response = await client.get("/api/search", params={"organization_uuid": organization_uuid, "q": q}, headers=headers)
+		timings.append(time.perf_counter() - start)
+		response.raise_for_status()
+		hits = len(response.json()["items"])
+	timings.sort()
+	p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+	return statistics.median(timings), p95, hits
+
+
+async def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--rows", type=int, default=100000, help="RFPs and suppliers each")
+	parser.add_argument("--repeat", type=int, default=20)
+	args = parser.parse_args()
+
+	if engine.dialect.name != "postgresql":
+		parser.error("the dataset is generated with Postgres functions; point DATABASE_URL_ENV at Postgres")
+
+	from main import app
+
+	transport = httpx.ASGITransport(app=app)
+	async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+		headers, organization_uuid = await register(client)
+		owner_uuid = (await client.get("/api/organization/" + organization_uuid, headers=headers)).json()["owner_uuid"]
+
+		start = time.perf_counter()
+		for table in ("rfps", "suppliers"):
+			seed(table, organization_uuid, owner_uuid, args.rows)
+		print(f"seeded {2 * args.rows} rows in {time.perf_counter() - start:.1f}s (organization {organization_uuid})")
+
+		for q in QUERIES:
+			p50, p95, hits = await measure(client, headers, organization_uuid, q, args.repeat)
+			print(f"{q:24s} p50 {p50 * 1000:8.1f} ms   p95 {p95 * 1000:8.1f} ms   first page {hits}")
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
@@ -0,0 +1,71 @@
+"""Measure application startup: importing main (which builds the app) in a
+fresh interpreter, with and without the Google integration configured.
+
+Each sample is a new process, so module caches never carry over. Prints
+the median wall time per configuration and, from -X importtime, the
+slowest modules main imports directly when Google is not configured.
+
+    python -m benchmarks.startup --repeat 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+MEASURE = """
+import sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+google = sorted(name for name in ("googleapiclient", "google_auth_oauthlib", "google_calendar") if name in sys.modules)
+print(f"{elapsed} {','.join(google) or '-'}")
+"""
+
+
+def run(env: dict, *flags) -> subprocess.CompletedProcess:
+	return subprocess.run(
+		[sys.executable, *flags, "-c", MEASURE],
+		env=env, capture_output=True, text=True, check=True,
+	)
+
+
+def slowest_imports(env: dict, top: int) -> list:
+	result = run(env, "-X", "importtime")
+	imports = []
+	for line in result.stderr.splitlines():
+		if not line.startswith("import time:") or "cumulative" in line:
+			continue
+		_, cumulative, name = line[len("import time:"):].split("|")
+		# Nested imports are indented further; keep the direct imports of
+		# main so nothing is counted twice.
+		if name.startswith("   ") and not name.startswith("     "):
+			imports.append((int(cumulative), name.strip()))
+	return sorted(imports, reverse=True)[:top]
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--repeat", type=int, default=5)
+	parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+	args = parser.parse_args()
+
+	base = {key: value for key, value in os.environ.items() if key != "GOOGLE_CLIENT_SECRET"}
+	configurations = {
+		"without google": base,
+		"with google": {**base, "GOOGLE_CLIENT_SECRET": os.environ.get("GOOGLE_CLIENT_SECRET", '{"web": {}}')},
+	}
+	for name, env in configurations.items():
+		samples, loaded = [], "-"
+		for _ in range(args.repeat):
+			elapsed, loaded = run(env).stdout.split()[-2:]
+			samples.append(float(elapsed))
+		print(f"{name:16s} import main {statistics.median(samples) * 1000:8.1f} ms   google modules loaded: {loaded}")
+
+	print("\nslowest imports made by main, without google:")
+	for cumulative, module in slowest_imports(configurations["without google"], args.top):
+		print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+	main()
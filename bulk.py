@@ -0,0 +1,137 @@
+from fastapi import HTTPException
+from pydantic import ValidationError
+from typing import Any, List
+from uuid import UUID, uuid4
+from database import dialect_insert
+from depencies import invalidate_memberships
+from models import RFP, Supplier, SupplierUser
+from response_cache import invalidate_organization_response
+
+MAX_BULK_ITEMS = 1000
+
+
+def _format_error(error) -> str:
+	location = ".".join(str(part) for part in error["loc"])
+	return f"{location}: {error['msg']}" if location else error["msg"]
+
+
+def check_bulk_size(items: List[Any]):
+	if len(items) > MAX_BULK_ITEMS:
+		raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ITEMS} items per request.")
+
+
+def validate_bulk_items(items: List[Any], schema, memberships):
+	"""Validate each raw item on its own so one bad item does not fail the batch.
+
+	Returns the (index, item) pairs that may be inserted and a per-item error
+	list for the rest, indexed by position in the request body.
+	"""
+	check_bulk_size(items)
+
+	valid, errors = [], []
+	for index, raw in enumerate(items):
+		try:
+			item = schema.model_validate(raw)
+		except ValidationError as e:
+			detail = "; ".join(_format_error(error) for error in e.errors())
+			errors.append({"index": index, "detail": detail})
+			continue
+		if not memberships.in_organization(item.organization_uuid):
+			errors.append({"index": index, "detail": "User not in organization"})
+			continue
+		valid.append((index, item))
+	return valid, errors
+
+
+def bulk_job_payload(user_uuid, items: List[Any]) -> dict:
+	"""Payload of a bulk create job. Each item's uuid is picked here, so a
+	second run of the job finds the rows of the first instead of adding
+	them again."""
+	check_bulk_size(items)
+	return {"user_uuid": str(user_uuid), "items": items, "uuids": [str(uuid4()) for _ in items]}
+
+
+def _uuids(valid, uuids) -> list:
+	if uuids is None:
+		return [uuid4() for _ in valid]
+	return [UUID(uuids[index]) for index, _ in valid]
+
+
+async def create_rfps(db, owner_uuid, valid, uuids=None) -> list:
+	"""Insert the validated RFPs in one statement and commit.
+
+	Returns the created index/uuid pairs, in request order. ``uuids`` are
+	the bulk_job_payload uuids; items whose row already exists are left as
+	they are.
+	"""
+	rfp_uuids = _uuids(valid, uuids)
+	await db.execute(
+		dialect_insert(db)(RFP).on_conflict_do_nothing(index_elements=[RFP.uuid]),
+		[
+			dict(uuid=rfp_uuid, owner_uuid=owner_uuid, organization_uuid=rfp.organization_uuid, data=rfp.data)
+			for (_, rfp), rfp_uuid in zip(valid, rfp_uuids)
+		]
+	)
+	for organization_uuid in {rfp.organization_uuid for _, rfp in valid}:
+		invalidate_organization_response(db.sync_session, organization_uuid)
+	await db.commit()
+	return [
+		{"index": index, "uuid": rfp_uuid}
+		for (index, _), rfp_uuid in zip(valid, rfp_uuids)
+	]
+
+
+async def create_suppliers(db, owner_uuid, valid, uuids=None) -> list:
+	"""Insert the validated suppliers and the owner's memberships and commit.
+
+	Returns the created index/uuid pairs, in request order. ``uuids`` are
+	as for create_rfps.
+	"""
+	supplier_uuids = _uuids(valid, uuids)
+	await db.execute(
+		dialect_insert(db)(Supplier).on_conflict_do_nothing(index_elements=[Supplier.uuid]),
+		[
+			dict(uuid=supplier_uuid, name=supplier.name, owner_uuid=owner_uuid, organization_uuid=supplier.organization_uuid, data=supplier.data)
+			for (_, supplier), supplier_uuid in zip(valid, supplier_uuids)
+		]
+	)
+	await db.execute(
+		dialect_insert(db)(SupplierUser).on_conflict_do_nothing(
+			index_elements=[SupplierUser.user_uuid, SupplierUser.supplier_uuid]
+		),
+		[dict(supplier_uuid=supplier_uuid, user_uuid=owner_uuid) for supplier_uuid in supplier_uuids]
+	)
+	invalidate_memberships(db.sync_session, owner_uuid)
+	for organization_uuid in {supplier.organization_uuid for _, supplier in valid}:
+		invalidate_organization_response(db.sync_session, organization_uuid)
+	await db.commit()
+	return [
+		{"index": index, "uuid": supplier_uuid}
+		for (index, _), supplier_uuid in zip(valid, supplier_uuids)
+	]
+
+
+MAX_BATCH_ITEMS = 100
+
+
+def check_batch_size(uuids: List[Any]):
+	if len(uuids) > MAX_BATCH_ITEMS:
+		raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ITEMS} uuids per request.")
+
+
+def order_batch(uuids: List[Any], rows) -> dict:
+	"""Line fetched rows up with the requested uuids.
+
+	``items`` follows the request, repeats included, with None for uuids
+	that do not exist or that the caller may not see; those are not told
+	apart, as with the single-item 404. Each None also gets an entry in
+	``errors``, indexed like the bulk create errors.
+	"""
+	by_uuid = {row.uuid: row for row in rows}
+	items, errors = [], []
+	for index, uuid in enumerate(uuids):
+		row = by_uuid.get(uuid)
+		if row is None:
+			errors.append({"index": index, "detail": "Not found"})
+		items.append(row)
+	return {"items": items, "errors": errors}
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+_PENDING_INVALIDATIONS = "pending_cache_invalidations"
+
+# Every cache registers itself here so its statistics can be exposed.
+caches = {}
+
+
+class TTLLRUCache:
+	"""Bounded in-process cache: entries expire after ``ttl`` seconds and the
+	least recently used entry is evicted once ``maxsize`` is reached.
+
+	A ttl of 0 disables the cache; every lookup is then a miss.
+	"""
+
+	def __init__(self, name: str, maxsize: int, ttl: float):
+		self.name = name
+		self.maxsize = maxsize
+		self.ttl = ttl
+		self._entries = OrderedDict()
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.expirations = 0
+		self.invalidations = 0
+		caches[name] = self
+
+	def get(self, key, default=None):
+		now = time.monotonic()
+		with self._lock:
+			entry = self._entries.get(key, _MISSING)
+			if entry is _MISSING:
+				self.misses += 1
+				return default
+			expires_at, value = entry
+			if expires_at <= now:
+				del self._entries[key]
+				self.expirations += 1
+				self.misses += 1
+				return default
+			self._entries.move_to_end(key)
+			self.hits += 1
+			return value
+
+	def set(self, key, value):
+		if self.ttl <= 0 or self.maxsize <= 0:
+			return
+		with self._lock:
+			self._entries[key] = (time.monotonic() + self.ttl, value)
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.maxsize:
+				self._entries.popitem(last=False)
+				self.evictions += 1
+
+	def invalidate(self, key):
+		with self._lock:
+			if self._entries.pop(key, _MISSING) is not _MISSING:
+				self.invalidations += 1
+
+	def clear(self):
+		with self._lock:
+			self.invalidations += len(self._entries)
+			self._entries.clear()
+
+	def stats(self) -> dict:
+		with self._lock:
+			size = len(self._entries)
+		lookups = self.hits + self.misses
+		return {
+			"size": size,
+			"maxsize": self.maxsize,
+			"ttl_seconds": self.ttl,
+			"hits": self.hits,
+			"misses": self.misses,
+			"hit_ratio": self.hits / lookups if lookups else 0.0,
+			"evictions": self.evictions,
+			"expirations": self.expirations,
+			"invalidations": self.invalidations,
+		}
+
+
+class InvalidationBus:
+	"""Routes cache invalidations by channel to the caches of this process, and
+	hands them to optional publishers so other gunicorn workers drop them too.
+	"""
+
+	def __init__(self):
+		self._subscribers = {}
+		self._publishers = []
+
+	def subscribe(self, channel: str, callback):
+		self._subscribers.setdefault(channel, []).append(callback)
+
+	def add_publisher(self, publisher):
+		self._publishers.append(publisher)
+
+	def remove_publisher(self, publisher):
+		self._publishers.remove(publisher)
+
+	def deliver(self, channel: str, key: str):
+		for callback in self._subscribers.get(channel, []):
+			callback(key)
+
+	def invalidate(self, channel: str, key: str):
+		self.deliver(channel, key)
+		for publisher in self._publishers:
+			try:
+				publisher(channel, key)
+			except Exception:
+				logger.exception("Failed to broadcast %s invalidation", channel)
+
+
+invalidation_bus = InvalidationBus()
+
+
+def invalidate_after_commit(session: Session, channel: str, key: str):
+	"""Queue an invalidation that is only published once ``session`` commits.
+
+	Invalidating before the commit would let a concurrent request re-cache
+	the old rows in between.
+	"""
+	session.info.setdefault(_PENDING_INVALIDATIONS, set()).add((channel, key))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending_invalidations(session):
+	for channel, key in session.info.pop(_PENDING_INVALIDATIONS, ()):
+		invalidation_bus.invalidate(channel, key)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_pending_invalidations(session, previous_transaction):
+	session.info.pop(_PENDING_INVALIDATIONS, None)
+
+# Set to "postgres" to fan invalidations out to every worker with LISTEN/NOTIFY.
+CACHE_INVALIDATION_BROADCAST = os.getenv("CACHE_INVALIDATION_BROADCAST", "")
+
+
+class PostgresInvalidationBroadcaster:
+	"""Publishes invalidations with pg_notify and applies the ones other
+	workers send, over one dedicated asyncpg connection per worker.
+	"""
+
+	CHANNEL = "cache_invalidation"
+
+	def __init__(self, database_url: str, bus: InvalidationBus = invalidation_bus):
+		url = make_url(database_url).set(drivername="postgresql")
+		self.dsn = url.render_as_string(hide_password=False)
+		self.bus = bus
+		self.pid = None
+		self._connection = None
+		self._loop = None
+		self._outbox = None
+		self._sender = None
+
+	async def start(self):
+		import asyncpg
+
+		self.pid = str(os.getpid())
+		self._connection = await asyncpg.connect(self.dsn)
+		self._loop = asyncio.get_running_loop()
+		self._outbox = asyncio.Queue()
+		self._sender = asyncio.create_task(self._send_notifications())
+		await self._connection.add_listener(self.CHANNEL, self._on_notification)
+		self.bus.add_publisher(self.publish)
+
+	async def stop(self):
+		self.bus.remove_publisher(self.publish)
+		if self._sender is not None:
+			self._sender.cancel()
+			self._sender = None
+		if self._connection is not None:
+			await self._connection.close()
+			self._connection = None
+
+	async def _send_notifications(self):
+		# One connection can run one statement at a time, so NOTIFYs go out in order.
+		while True:
+			payload = await self._outbox.get()
+			try:
+				await self._connection.execute("SELECT pg_notify($1, $2)", self.CHANNEL, payload)
+			except Exception:
+				logger.exception("Failed to publish cache invalidation")
+
+	def _on_notification(self, connection, pid, channel, payload):
+		sender, cache_channel, key = payload.split(":", 2)
+		if sender != self.pid:
+			self.bus.deliver(cache_channel, key)
+
+	def publish(self, channel: str, key: str):
+		# Invalidations are raised from sync ORM event hooks, which may run off
+		# the loop thread, so hand the payload to the loop instead of awaiting.
+		if self._connection is None:
+			return
+		self._loop.call_soon_threadsafe(self._outbox.put_nowait, f"{self.pid}:{channel}:{key}")
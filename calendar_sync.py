@@ -0,0 +1,314 @@
+"""Incremental sync of users' primary Google calendars into calendar_events.
+
+The first sync of a user lists every event; the nextSyncToken it ends with
+is stored on the user's google_credentials row, and later syncs only fetch
+what changed since (cancelled events included, which are deleted locally).
+When Google rejects the token with 410 Gone, the user is fully resynced and
+local events the full listing no longer returns are removed.
+
+CalendarSyncer runs in each worker's lifespan and syncs the users whose
+last sync is older than GOOGLE_SYNC_INTERVAL. The first sync after a user
+connects runs as a "calendar_sync" job (see job_handlers.py) instead of
+waiting for the syncer. Either way the user is first claimed by setting
+sync_claimed_at with a conditional UPDATE, so two syncs of one user never
+run at once, and the sync's results are only written while the claim is
+still its own: reconnecting Google drops the claim, and a sync still
+running for the previous account then rolls back.
+/events is answered from the local table by events_page.
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+from fastapi import HTTPException
+from googleapiclient.errors import HttpError
+from sqlalchemy import delete, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+import google_calendar
+from database import AsyncSessionLocal, dialect_insert
+from models import CalendarEvent, GoogleCredential, utcnow
+from pagination import PageParams, decode_token, encode_token
+
+logger = logging.getLogger(__name__)
+
+# Seconds between syncs of one user; 0 turns the background sync off.
+GOOGLE_SYNC_INTERVAL = float(os.getenv("GOOGLE_SYNC_INTERVAL", 300))
+GOOGLE_SYNC_CONCURRENCY = int(os.getenv("GOOGLE_SYNC_CONCURRENCY", 4))
+# Users claimed per pass of the background loop.
+GOOGLE_SYNC_BATCH_SIZE = int(os.getenv("GOOGLE_SYNC_BATCH_SIZE", 50))
+# A claim older than this belongs to a sync that died, and can be taken over.
+GOOGLE_SYNC_CLAIM_TIMEOUT = float(os.getenv("GOOGLE_SYNC_CLAIM_TIMEOUT", 600))
+SYNC_PAGE_SIZE = 250
+# Every listing must use the same parameters, apart from the page and sync
+# tokens, or Google rejects the sync token.
+LIST_PARAMETERS = {"calendarId": "primary", "singleEvents": True, "maxResults": SYNC_PAGE_SIZE}
+
+
+class SyncTokenExpired(Exception):
+	pass
+
+
+class SyncInProgress(Exception):
+	"""Another sync holds the user's claim."""
+
+
+def _to_utc(value: datetime) -> datetime:
+	if value.tzinfo is not None:
+		value = value.astimezone(timezone.utc).replace(tzinfo=None)
+	return value
+
+
+def _event_time(value: dict) -> datetime:
+	# All-day events carry a date, timed events a dateTime with an offset.
+	if "dateTime" in value:
+		return _to_utc(datetime.fromisoformat(value["dateTime"]))
+	return datetime.fromisoformat(value["date"])
+
+
+async def _list_changes(credential: GoogleCredential, sync_token: Optional[str]):
+	"""Every page of events since ``sync_token`` (all events when None).
+
+	Returns (events, next_sync_token). The Google calls happen before any
+	write, so no database transaction stays open while they run.
+	"""
+	refreshed = []
+	events = []
+	page_token = None
+	while True:
+		parameters = dict(LIST_PARAMETERS)
+		if sync_token:
+			parameters["syncToken"] = sync_token
+		if page_token:
+			parameters["pageToken"] = page_token
+		try:
+			result = await google_calendar.execute(
+				str(credential.user_uuid),
+				credential.credentials,
+				lambda service: service.events().list(**parameters),
+				on_refresh=lambda credentials: refreshed.append(credentials.to_json()),
+			)
+		except HttpError as error:
+			if sync_token and error.resp.status == 410:
+				raise SyncTokenExpired()
+			raise
+		finally:
+			if refreshed:
+				credential.credentials = json.loads(refreshed[-1])
+		events.extend(result.get("items", []))
+		page_token = result.get("nextPageToken")
+		if not page_token:
+			return events, result.get("nextSyncToken")
+
+
+async def _apply(db: AsyncSession, user_uuid: UUID, events: list):
+	cancelled = [event["id"] for event in events if event.get("status") == "cancelled"]
+	if cancelled:
+		await db.execute(delete(CalendarEvent).where(
+			CalendarEvent.user_uuid == user_uuid, CalendarEvent.google_id.in_(cancelled)
+		))
+
+	now = utcnow()
+	rows = {
+		event["id"]: {
+			"user_uuid": user_uuid,
+			"google_id": event["id"],
+			"summary": event.get("summary"),
+			"start_at": _event_time(event["start"]),
+			"end_at": _event_time(event["end"]),
+			"data": event,
+			"created_at": now,
+			"updated_at": now,
+		}
+		for event in events if event.get("status") != "cancelled"
+	}
+	rows = list(rows.values())
+	for start in range(0, len(rows), SYNC_PAGE_SIZE):
+		stmt = dialect_insert(db)(CalendarEvent).values(rows[start:start + SYNC_PAGE_SIZE])
+		stmt = stmt.on_conflict_do_update(
+			index_elements=[CalendarEvent.user_uuid, CalendarEvent.google_id],
+			set_={
+				"summary": stmt.excluded.summary,
+				"start_at": stmt.excluded.start_at,
+				"end_at": stmt.excluded.end_at,
+				"data": stmt.excluded.data,
+				"updated_at": stmt.excluded.updated_at,
+			},
+		)
+		await db.execute(stmt)
+
+
+async def sync_user(db: AsyncSession, credential: GoogleCredential, claimed_at: datetime) -> int:
+	"""Bring the user's local events up to date; returns the changes applied.
+
+	``claimed_at`` is the claim taken with _claim. Nothing is written unless
+	it is still held when the sync finishes.
+	"""
+	# Refreshed credentials are written below only if the claim holds, so the
+	# row object must not be flushed on its own.
+	db.expunge(credential)
+	full = credential.sync_token is None
+	try:
+		events, next_sync_token = await _list_changes(credential, credential.sync_token)
+	except SyncTokenExpired:
+		logger.info("Sync token expired for %s, running a full sync", credential.user_uuid)
+		full = True
+		events, next_sync_token = await _list_changes(credential, None)
+
+	started = utcnow()
+	await _apply(db, credential.user_uuid, events)
+	if full:
+		# Anything the full listing did not return again is gone.
+		await db.execute(delete(CalendarEvent).where(
+			CalendarEvent.user_uuid == credential.user_uuid, CalendarEvent.updated_at < started
+		))
+	finished = await db.execute(
+		update(GoogleCredential)
+		.where(GoogleCredential.id == credential.id, GoogleCredential.sync_claimed_at == claimed_at)
+		.values(credentials=credential.credentials, sync_token=next_sync_token, synced_at=utcnow(), sync_claimed_at=None)
+	)
+	if not finished.rowcount:
+		await db.rollback()
+		logger.info("Calendar sync for %s lost its claim, discarded", credential.user_uuid)
+		return 0
+	await db.commit()
+	return len(events)
+
+
+async def _claim(db: AsyncSession, id: int, *criteria) -> Optional[datetime]:
+	"""Claim the user for a sync; returns the claim, or None when another
+	sync holds it. Commits."""
+	now = utcnow()
+	free = or_(
+		GoogleCredential.sync_claimed_at.is_(None),
+		GoogleCredential.sync_claimed_at < now - timedelta(seconds=GOOGLE_SYNC_CLAIM_TIMEOUT),
+	)
+	# Another sync's identical UPDATE then matches no row.
+	claim = await db.execute(
+		update(GoogleCredential).where(GoogleCredential.id == id, free, *criteria).values(sync_claimed_at=now)
+	)
+	await db.commit()
+	return now if claim.rowcount else None
+
+
+async def _release(id: int, claimed_at: datetime, **values):
+	async with AsyncSessionLocal() as db:
+		await db.execute(
+			update(GoogleCredential)
+			.where(GoogleCredential.id == id, GoogleCredential.sync_claimed_at == claimed_at)
+			.values(sync_claimed_at=None, **values)
+		)
+		await db.commit()
+
+
+async def sync_user_by_uuid(user_uuid: UUID):
+	"""Sync the user now, whenever they were last synced. Raises
+	SyncInProgress when another sync holds them, for the caller to retry."""
+	async with AsyncSessionLocal() as db:
+		id = await db.scalar(select(GoogleCredential.id).where(GoogleCredential.user_uuid == user_uuid))
+		if id is None:
+			return
+		claimed_at = await _claim(db, id)
+		if claimed_at is None:
+			raise SyncInProgress(f"Calendar of {user_uuid} is already being synced")
+		try:
+			await sync_user(db, await db.get(GoogleCredential, id), claimed_at)
+		except Exception:
+			await _release(id, claimed_at)
+			raise
+
+
+async def _claim_due(interval: float) -> list:
+	"""Claim up to a batch of users due a sync; returns (id, claim) pairs."""
+	due = or_(
+		GoogleCredential.synced_at.is_(None),
+		GoogleCredential.synced_at < utcnow() - timedelta(seconds=interval),
+	)
+	async with AsyncSessionLocal() as db:
+		result = await db.execute(
+			select(GoogleCredential.id).where(due)
+			.order_by(GoogleCredential.synced_at.nulls_first()).limit(GOOGLE_SYNC_BATCH_SIZE)
+		)
+		claimed = []
+		for id in result.scalars().all():
+			claimed_at = await _claim(db, id, due)
+			if claimed_at is not None:
+				claimed.append((id, claimed_at))
+		return claimed
+
+
+class CalendarSyncer:
+	"""Background loop that keeps every connected calendar in sync."""
+
+	def __init__(self, interval: float = GOOGLE_SYNC_INTERVAL, concurrency: int = GOOGLE_SYNC_CONCURRENCY):
+		self.interval = interval
+		self.concurrency = concurrency
+		self.synced = 0
+		self.failed = 0
+		self._task = None
+
+	async def start(self):
+		self._task = asyncio.create_task(self._run())
+
+	async def stop(self):
+		if self._task is not None:
+			self._task.cancel()
+			self._task = None
+
+	async def _sync_one(self, semaphore: asyncio.Semaphore, id: int, claimed_at: datetime):
+		async with semaphore:
+			try:
+				async with AsyncSessionLocal() as db:
+					credential = await db.get(GoogleCredential, id)
+					await sync_user(db, credential, claimed_at)
+				self.synced += 1
+			except Exception:
+				self.failed += 1
+				logger.exception("Calendar sync failed for credential %s", id)
+				# Retried after another interval, not on the next pass.
+				await _release(id, claimed_at, synced_at=utcnow())
+
+	async def _run(self):
+		semaphore = asyncio.Semaphore(self.concurrency)
+		while True:
+			try:
+				claimed = await _claim_due(self.interval)
+				await asyncio.gather(*(self._sync_one(semaphore, id, claimed_at) for id, claimed_at in claimed))
+			except Exception:
+				logger.exception("Calendar sync pass failed")
+			await asyncio.sleep(min(self.interval, 60))
+
+
+async def events_page(
+	db: AsyncSession,
+	user_uuid: UUID,
+	time_min: Optional[datetime],
+	time_max: Optional[datetime],
+	page: PageParams,
+) -> dict:
+	"""The user's events overlapping [time_min, time_max), by start time."""
+	stmt = select(CalendarEvent.id, CalendarEvent.start_at, CalendarEvent.data).where(
+		CalendarEvent.user_uuid == user_uuid
+	)
+	if time_min is not None:
+		stmt = stmt.where(CalendarEvent.end_at > _to_utc(time_min))
+	if time_max is not None:
+		stmt = stmt.where(CalendarEvent.start_at < _to_utc(time_max))
+	if page.cursor:
+		try:
+			start_at, id = decode_token(page.cursor)
+			cursor = (datetime.fromisoformat(start_at), int(id))
+		except (ValueError, TypeError):
+			raise HTTPException(status_code=400, detail="Invalid cursor")
+		stmt = stmt.where(tuple_(CalendarEvent.start_at, CalendarEvent.id) > tuple_(*cursor))
+	stmt = stmt.order_by(CalendarEvent.start_at, CalendarEvent.id).limit(page.limit + 1)
+
+	rows = (await db.execute(stmt)).all()
+	items = rows[:page.limit]
+	next_cursor = None
+	if len(rows) > page.limit:
+		last = items[-1]
+		next_cursor = encode_token([last.start_at.isoformat(), last.id])
+	return {"items": [row.data for row in items], "next_cursor": next_cursor}
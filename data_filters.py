@@ -0,0 +1,164 @@
+"""Server-side filtering on the JSON ``data`` column of RFPs and suppliers.
+
+Filters arrive as repeated ``filter`` query parameters of the form
+``path:op:value``, where ``path`` is a dot-separated key path into
+``data`` and ``value`` is parsed as JSON when possible, otherwise taken
+as a string:
+
+    filter=status:eq:"open"
+    filter=budget.amount:gte:1000
+    filter=tags:contains:"urgent"
+
+``eq`` and ``contains`` compile to jsonb containment (``@>``) and range
+operators to a jsonpath predicate (``@@``) with the bound written into
+the path; the GIN ``jsonb_path_ops`` index on ``data`` supports both
+operators. Postgres only takes equality conditions from a jsonpath to the
+index, though, so a range filter on its own is checked against the rows
+the organization index finds. On databases other than Postgres the same
+filters are evaluated in Python.
+"""
+import json
+import math
+import re
+from fastapi import HTTPException, Query
+from sqlalchemy import cast
+from sqlalchemy.dialects.postgresql import JSONB, JSONPATH
+from sqlalchemy.orm import undefer
+from typing import List
+from pagination import PageParams, paginate
+
+RANGE_OPERATORS = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+OPERATORS = {"eq", "contains", *RANGE_OPERATORS}
+KEY_PATTERN = re.compile(r"^[A-Za-z0-9_\-]+$")
+MAX_FILTERS = 10
+
+
+class DataFilter:
+	def __init__(self, path: List[str], op: str, value):
+		self.path = path
+		self.op = op
+		self.value = value
+
+	def _nest(self, value):
+		for key in reversed(self.path):
+			value = {key: value}
+		return value
+
+	def _containment_document(self):
+		value = self.value
+		if self.op == "contains" and not isinstance(value, (list, dict)):
+			value = [value]
+		return self._nest(value)
+
+	def clause(self, column):
+		"""The Postgres predicate for this filter against a JSONB column."""
+		if self.op in RANGE_OPERATORS:
+			# Keys are checked against KEY_PATTERN and the bound is a finite
+			# number, so both can go into the path as literals.
+			jsonpath = "$" + "".join(f'."{key}"' for key in self.path) + f" {RANGE_OPERATORS[self.op]} {json.dumps(self.value)}"
+			return column.op("@@")(cast(jsonpath, JSONPATH))
+		return column.op("@>")(cast(self._containment_document(), JSONB))
+
+	def matches(self, data) -> bool:
+		"""Python evaluation with the same semantics as clause()."""
+		if self.op in RANGE_OPERATORS:
+			value = data
+			for key in self.path:
+				if not isinstance(value, dict) or key not in value:
+					return False
+				value = value[key]
+			# jsonpath in lax mode unwraps arrays, so any element may match.
+			candidates = value if isinstance(value, list) else [value]
+			return any(_compare(candidate, self.op, self.value) for candidate in candidates)
+		return _contains(data, self._containment_document())
+
+
+def _compare(candidate, op: str, bound) -> bool:
+	if not _is_number(candidate):
+		return False
+	if op == "gt":
+		return candidate > bound
+	if op == "gte":
+		return candidate >= bound
+	if op == "lt":
+		return candidate < bound
+	return candidate <= bound
+
+
+def _contains(actual, expected) -> bool:
+	"""jsonb @> semantics: objects and arrays contain subsets, scalars compare equal."""
+	if isinstance(expected, dict):
+		return isinstance(actual, dict) and all(
+			key in actual and _contains(actual[key], value) for key, value in expected.items()
+		)
+	if isinstance(expected, list):
+		return isinstance(actual, list) and all(
+			any(_contains(item, value) for item in actual) for value in expected
+		)
+	if _is_number(actual) and _is_number(expected):
+		return actual == expected
+	return type(actual) is type(expected) and actual == expected
+
+
+def _is_number(value) -> bool:
+	return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def parse_filter(raw: str) -> DataFilter:
+	parts = raw.split(":", 2)
+	if len(parts) != 3:
+		raise HTTPException(status_code=400, detail=f"Invalid filter '{raw}', expected path:op:value")
+	path, op, raw_value = parts
+	keys = path.split(".")
+	if keys and keys[0] == "data":
+		keys = keys[1:]
+	if not keys or not all(KEY_PATTERN.match(key) for key in keys):
+		raise HTTPException(status_code=400, detail=f"Invalid filter path '{path}'")
+	if op not in OPERATORS:
+		raise HTTPException(status_code=400, detail=f"Invalid filter operator '{op}'")
+	try:
+		value = json.loads(raw_value)
+	except ValueError:
+		value = raw_value
+	if op in RANGE_OPERATORS and not (_is_number(value) and math.isfinite(value)):
+		raise HTTPException(status_code=400, detail=f"Filter operator '{op}' needs a number")
+	return DataFilter(keys, op, value)
+
+
+class DataFilterParams:
+	"""The repeated ``filter`` query parameter of the list endpoints."""
+
+	def __init__(
+		self,
+		filter: List[str] = Query([], description="Filter on data as path:op:value; op is eq, contains, gt, gte, lt or lte"),
+	):
+		if len(filter) > MAX_FILTERS:
+			raise HTTPException(status_code=400, detail=f"At most {MAX_FILTERS} filters per request.")
+		self.filters = [parse_filter(raw) for raw in filter]
+
+	def __bool__(self):
+		return bool(self.filters)
+
+	def clauses(self, column):
+		return [data_filter.clause(column) for data_filter in self.filters]
+
+	def matches(self, data) -> bool:
+		return all(data_filter.matches(data or {}) for data_filter in self.filters)
+
+
+async def fetch_filtered_page(db, stmt, model, page: PageParams, data_filters: DataFilterParams):
+	"""Fetch one keyset page of ``stmt`` with the data filters applied.
+
+	Postgres evaluates the filters in SQL. Other databases, which only back
+	tests, read everything past the cursor and filter in Python.
+	"""
+	if data_filters and db.bind.dialect.name != "postgresql":
+		# Loaded even when the response leaves data out (fields=).
+		result = await db.execute(paginate(stmt.options(undefer(model.data)), model, page).limit(None))
+		rows = [row for row in result.scalars() if data_filters.matches(row.data)]
+		return rows[:page.limit + 1]
+
+	if data_filters:
+		stmt = stmt.filter(*data_filters.clauses(model.data))
+	result = await db.execute(paginate(stmt, model, page))
+	return result.scalars().all()
@@ -1,15 +1,160 @@
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from dotenv import load_dotenv
+from metrics import Histogram
+import logging
 import os
+import time
 
 load_dotenv()
 DATABASE_URL_ENV = os.getenv("DATABASE_URL_ENV")
 
 if not DATABASE_URL_ENV:
     raise ValueError("DATABASE_URL_ENV is not set in the environment variables.")
-engine = create_engine(DATABASE_URL_ENV)
+
+logger = logging.getLogger(__name__)
+
+# asyncpg keeps a per-connection LRU of prepared statements; the ORM emits the
+# same handful of statements on every request so a larger cache avoids re-parsing.
+DB_PREPARED_STATEMENT_CACHE_SIZE = int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", 500))
+
+# Pool settings apply per engine and per gunicorn worker, so the connections a
+# deploy can open is workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) for each engine.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_POOL_SLOW_CHECKOUT_MS = float(os.getenv("DB_POOL_SLOW_CHECKOUT_MS", 100))
+
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def _async_database_url(url: str):
+    async_url = make_url(url)
+    driver = ASYNC_DRIVERS.get(async_url.get_backend_name())
+    if driver:
+        async_url = async_url.set(drivername=driver)
+    return async_url
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.checkout_wait = Histogram()
+        self.slow_checkouts = 0
+        self.checkout_timeouts = 0
+
+
+pool_metrics = {
+    "sync": PoolMetrics(),
+    "async": PoolMetrics(),
+}
+
+
+class TimedCheckoutMixin:
+    """Times how long each checkout waits for a pooled (or new) connection."""
+
+    metrics_key = None
+
+    def _do_get(self):
+        metrics = pool_metrics[self.metrics_key]
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            metrics.checkout_timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            metrics.checkout_wait.observe(waited)
+            if waited * 1000 >= DB_POOL_SLOW_CHECKOUT_MS:
+                metrics.slow_checkouts += 1
+                logger.warning(
+                    "Slow %s pool checkout: waited %.1f ms (%s)",
+                    self.metrics_key, waited * 1000, self.status(),
+                )
+
+
+class TimedQueuePool(TimedCheckoutMixin, QueuePool):
+    metrics_key = "sync"
+
+
+class TimedAsyncAdaptedQueuePool(TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    metrics_key = "async"
+
+
+pool_options = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+engine = create_engine(DATABASE_URL_ENV, poolclass=TimedQueuePool, **pool_options)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
\ No newline at end of file
+async_connect_args = {}
+if make_url(DATABASE_URL_ENV).get_backend_name() == "postgresql":
+    async_connect_args["prepared_statement_cache_size"] = DB_PREPARED_STATEMENT_CACHE_SIZE
+
+async_engine = create_async_engine(
+    _async_database_url(DATABASE_URL_ENV),
+    connect_args=async_connect_args,
+    poolclass=TimedAsyncAdaptedQueuePool,
+    **pool_options,
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+def _reset_pools_after_fork():
+    # A worker forked from a process that already opened connections (e.g.
+    # the gunicorn master with --preload) must not use the parent's sockets.
+    # dispose(close=False) gives the child fresh, empty pools and leaves the
+    # parent's connections alone.
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+
+def pool_status() -> dict:
+    """Live statistics for this process's connection pools."""
+    status = {}
+    for key, pool in (("sync", engine.pool), ("async", async_engine.sync_engine.pool)):
+        metrics = pool_metrics[key]
+        status[key] = {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": DB_MAX_OVERFLOW,
+            "slow_checkouts": metrics.slow_checkouts,
+            "checkout_timeouts": metrics.checkout_timeouts,
+            "checkout_wait_seconds": metrics.checkout_wait.snapshot(),
+        }
+    return status
+
+
+def dialect_insert(db):
+    """The INSERT construct of ``db``'s dialect, for ON CONFLICT clauses."""
+    return (postgresql if db.bind.dialect.name == "postgresql" else sqlite).insert
+
+
+Base = declarative_base()
@@ -1,14 +1,17 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select, event, inspect, literal, union_all
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, HTTPException
-from database import SessionLocal
+from database import AsyncSessionLocal
 import jwt
+from jwt import ExpiredSignatureError, InvalidTokenError, PyJWTError
 from datetime import datetime, timedelta
 from pydantic import BaseModel
 from typing import Optional
-from models import User, OrganizationUser, SupplierUser
-from passlib.context import CryptContext
+from models import User, Organization, OrganizationUser, SupplierUser
+from hashing import pwd_context, password_hasher
+from cache import TTLLRUCache, invalidation_bus, invalidate_after_commit
 from fastapi.security import OAuth2PasswordBearer
-from schemas import OrganizationUserSchema, SupplierUserSchema
 from uuid import UUID
 from dotenv import load_dotenv
 import os
@@ -23,25 +26,28 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
 SECRET_KEY = JWT_SECRET_KEY
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Authenticated users keyed by token subject, so most requests skip the users lookup.
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", 60))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
+principal_cache = TTLLRUCache("principal", PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+invalidation_bus.subscribe("principal", principal_cache.invalidate)
+USER_COLUMNS = [attr.key for attr in inspect(User).column_attrs]
 
 
 class TokenData(BaseModel):
     user_uuid: Optional[str] = None
     exp: Optional[int] = None  
     
-def get_db():
-    db = SessionLocal()  
-    try:
-        yield db 
-    finally:
-        db.close()
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_and_update_password(plain_password, hashed_password):
+    return await password_hasher.verify_and_update(plain_password, hashed_password)
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
@@ -58,7 +64,11 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 
 def verify_token(token: str) -> str:
 	try:
+		# Tokens minted for something else, such as the Google OAuth state,
+		# carry an audience (which jwt.decode rejects here) and a purpose.
 		payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+		if "purpose" in payload:
+			raise HTTPException(status_code=401, detail="Token is not an access token")
 		user_uuid: str = payload.get("sub")
 		if user_uuid is None:
 			raise HTTPException(status_code=401, detail="Token missing 'sub' field")		
@@ -73,49 +83,136 @@ def verify_token(token: str) -> str:
 	except Exception as e:
 		raise HTTPException(status_code=401, detail=f"Token error: {str(e)}")
     
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
 	try:
 		user_uuid = verify_token(token)
-		user = db.query(User).filter(User.uuid == user_uuid).first()
+		cached = principal_cache.get(user_uuid)
+		if cached is not None:
+			# Attach a copy to this request's session without a round trip, so
+			# handlers can still modify and commit the user as usual.
+			user = User(**cached)
+			make_transient_to_detached(user)
+			return await db.merge(user, load=False)
+
+		result = await db.execute(select(User).filter(User.uuid == UUID(user_uuid)))
+		user = result.scalars().first()
 		if not user:
 			raise HTTPException(status_code=400, detail="User not authenticated")
+		principal_cache.set(user_uuid, {key: getattr(user, key) for key in USER_COLUMNS})
 		return user
 	except:
 		raise HTTPException(status_code=401, detail="Unauthenticated request")
 		
-def verify_user_in_organization(organization_uuid: UUID, user_uuid: UUID, db: Session = Depends(get_db)):
-	try:
-		organization_user = db.query(OrganizationUserSchema).filter(
-			OrganizationUserSchema.user_uuid == user_uuid,
-			OrganizationUserSchema.organization_uuid == organization_uuid
-		).first()
-		if not organization_user:
-			raise HTTPException(status_code=400, detail="User not in organization")
-		return True
-	except: 
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_principal(mapper, connection, target):
+	session = object_session(target)
+	if session is not None:
+		invalidate_after_commit(session, "principal", str(target.uuid))
+
+class Memberships:
+	"""Every organization and supplier a user belongs to, and the
+	organizations they own, as sets of UUIDs."""
+
+	def __init__(self, organization_uuids, supplier_uuids, owned_organization_uuids=()):
+		self.organizations = frozenset(organization_uuids)
+		self.suppliers = frozenset(supplier_uuids)
+		self.owned_organizations = frozenset(owned_organization_uuids)
+
+	def in_organization(self, organization_uuid: UUID) -> bool:
+		return organization_uuid in self.organizations
+
+	def owns_organization(self, organization_uuid: UUID) -> bool:
+		return organization_uuid in self.owned_organizations
+
+	def in_supplier(self, supplier_uuid: UUID) -> bool:
+		return supplier_uuid in self.suppliers
+
+MEMBERSHIP_CACHE_TTL = float(os.getenv("MEMBERSHIP_CACHE_TTL", 60))
+MEMBERSHIP_CACHE_SIZE = int(os.getenv("MEMBERSHIP_CACHE_SIZE", 10000))
+membership_cache = TTLLRUCache("membership", MEMBERSHIP_CACHE_SIZE, MEMBERSHIP_CACHE_TTL)
+invalidation_bus.subscribe("membership", membership_cache.invalidate)
+
+async def load_memberships(db: AsyncSession, user_uuid: UUID) -> Memberships:
+	result = await db.execute(union_all(
+		select(literal("organization").label("kind"), OrganizationUser.organization_uuid.label("uuid")).filter(
+			OrganizationUser.user_uuid == user_uuid
+		),
+		select(literal("supplier").label("kind"), SupplierUser.supplier_uuid.label("uuid")).filter(
+			SupplierUser.user_uuid == user_uuid
+		),
+		select(literal("owner").label("kind"), Organization.uuid.label("uuid")).filter(
+			Organization.owner_uuid == user_uuid
+		),
+	))
+	rows = result.all()
+	return Memberships(
+		[row.uuid for row in rows if row.kind == "organization"],
+		[row.uuid for row in rows if row.kind == "supplier"],
+		[row.uuid for row in rows if row.kind == "owner"],
+	)
+
+async def get_memberships(
+	current_user: User = Depends(get_current_user),
+	db: AsyncSession = Depends(get_db)
+) -> Memberships:
+	key = str(current_user.uuid)
+	memberships = membership_cache.get(key)
+	if memberships is None:
+		memberships = await load_memberships(db, current_user.uuid)
+		membership_cache.set(key, memberships)
+	return memberships
+
+def invalidate_memberships(session: Session, user_uuid: UUID):
+	"""For membership rows written with Core statements, which skip the mapper events."""
+	invalidate_after_commit(session, "membership", str(user_uuid))
+
+@event.listens_for(OrganizationUser, "after_insert")
+@event.listens_for(OrganizationUser, "after_update")
+@event.listens_for(OrganizationUser, "after_delete")
+@event.listens_for(SupplierUser, "after_insert")
+@event.listens_for(SupplierUser, "after_update")
+@event.listens_for(SupplierUser, "after_delete")
+def _invalidate_memberships(mapper, connection, target):
+	session = object_session(target)
+	if session is not None:
+		invalidate_memberships(session, target.user_uuid)
+
+@event.listens_for(Organization, "after_insert")
+@event.listens_for(Organization, "after_delete")
+def _invalidate_owner(mapper, connection, target):
+	session = object_session(target)
+	if session is not None:
+		invalidate_memberships(session, target.owner_uuid)
+
+@event.listens_for(Organization, "after_update")
+def _invalidate_transferred_ownership(mapper, connection, target):
+	session = object_session(target)
+	history = inspect(target).attrs.owner_uuid.history
+	if session is None or not history.has_changes():
+		return
+	for owner_uuid in (*history.added, *history.deleted):
+		if owner_uuid is not None:
+			invalidate_memberships(session, owner_uuid)
+
+def verify_user_in_organization(organization_uuid: UUID, memberships: Memberships):
+	if not memberships.in_organization(organization_uuid):
 		raise HTTPException(status_code=401, detail="User not in organization")
+	return True
 
-def verify_user_in_supplier(supplier_uuid: UUID, user_uuid: UUID, db: Session = Depends(get_db)):
-	try:
-		supplier_user = db.query(SupplierUserSchema).filter(
-			SupplierUserSchema.user_uuid == user_uuid,
-			SupplierUserSchema.supplier_uuid == supplier_uuid
-		).first()
-		if not supplier_user:
-			raise HTTPException(status_code=400, detail="User not in supplier")
-		return True
-	except: 
+def verify_user_in_supplier(supplier_uuid: UUID, memberships: Memberships):
+	if not memberships.in_supplier(supplier_uuid):
 		raise HTTPException(status_code=401, detail="User not in supplier")
+	return True
 	
 
-def create_organization_user(organization_uuid: UUID, user_uuid: UUID, db: Session = Depends(get_db)):
+async def create_organization_user(organization_uuid: UUID, user_uuid: UUID, db: AsyncSession = Depends(get_db)):
 	try: 
 		new_organization_user = OrganizationUser(
 			user_uuid=user_uuid,
 			organization_uuid=organization_uuid
 		)
 		db.add(new_organization_user)
-		db.commit()
-		db.refresh(new_organization_user)
+		await db.commit()
 	except:
 		raise HTTPException(status_code=401, detail="User not added into organization users")
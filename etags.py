@@ -0,0 +1,101 @@
+"""Weak ETags for conditional GETs, computed without loading the object graph.
+
+A response's ETag is a hash over (row count, max(updated_at)) of every set
+of rows its schema is built from, gathered in one UNION ALL of indexed
+aggregates. Any insert or update moves a max(updated_at), any delete moves
+a count, so the tag changes whenever the serialized payload can.
+
+The fingerprint builders mirror the response shapes: the resource's own
+rows always, and the rows behind each relationship only when the request
+expands it, as the loaders in loaders.py do; keep them in step.
+"""
+import hashlib
+from fastapi import Request, Response
+from sqlalchemy import func, literal, select, union_all
+from models import Invitation, Organization, OrganizationUser, RFP, Supplier, SupplierUser, User
+
+
+def _aggregate(part: str, model, *criteria):
+	return select(
+		literal(part).label("part"),
+		func.count(model.id).label("rows"),
+		func.max(model.updated_at).label("updated_at"),
+	).where(*criteria)
+
+
+def _users(part: str, user_uuids):
+	"""The users behind a UserSummary, selected by ``user_uuids``."""
+	return _aggregate(part, User, User.uuid.in_(user_uuids))
+
+
+def organization_response_parts(organization_uuid, expand=()):
+	parts = [_aggregate("organization", Organization, Organization.uuid == organization_uuid)]
+	if "users" in expand:
+		members = select(OrganizationUser.user_uuid).where(OrganizationUser.organization_uuid == organization_uuid)
+		parts += [
+			_aggregate("organization.organization_users", OrganizationUser, OrganizationUser.organization_uuid == organization_uuid),
+			_users("organization.users", members),
+		]
+	if "invitations" in expand:
+		parts.append(_aggregate("organization.invitations", Invitation, Invitation.organization_uuid == organization_uuid))
+	if "rfps" in expand:
+		parts.append(_aggregate("organization.rfps", RFP, RFP.organization_uuid == organization_uuid))
+	if "suppliers" in expand:
+		parts.append(_aggregate("organization.suppliers", Supplier, Supplier.organization_uuid == organization_uuid))
+	return parts
+
+
+def rfp_response_parts(rfp_uuid, organization_uuid, expand=()):
+	parts = [_aggregate("rfp", RFP, RFP.uuid == rfp_uuid, RFP.organization_uuid == organization_uuid)]
+	if "owner" in expand:
+		parts.append(_users("owner", select(RFP.owner_uuid).where(RFP.uuid == rfp_uuid)))
+	if "organization" in expand:
+		parts.append(_aggregate("organization", Organization, Organization.uuid == organization_uuid))
+	return parts
+
+
+def supplier_list_parts(organization_uuid, user_uuid, expand=()):
+	visible = select(SupplierUser.supplier_uuid).where(SupplierUser.user_uuid == user_uuid)
+	suppliers = (Supplier.organization_uuid == organization_uuid, Supplier.uuid.in_(visible))
+	parts = [
+		_aggregate("supplier_users", SupplierUser, SupplierUser.user_uuid == user_uuid),
+		_aggregate("suppliers", Supplier, *suppliers),
+	]
+	if "owner" in expand:
+		parts.append(_users("owners", select(Supplier.owner_uuid).where(*suppliers)))
+	if "organization" in expand:
+		parts.append(_aggregate("organization", Organization, Organization.uuid == organization_uuid))
+	if "users" in expand:
+		listed = SupplierUser.supplier_uuid.in_(select(Supplier.uuid).where(*suppliers))
+		parts += [
+			_aggregate("members", SupplierUser, listed),
+			_users("members.users", select(SupplierUser.user_uuid).where(listed)),
+		]
+	return parts
+
+
+async def compute_etag(db, parts, variant: str = "") -> str:
+	"""``variant`` names the response shape (a fieldsets.Selection key), so
+	differently shaped responses built from the same rows get different tags."""
+	rows = (await db.execute(union_all(*parts))).all()
+	fingerprint = variant + repr(sorted(tuple(row) for row in rows))
+	return f'W/"{hashlib.sha1(fingerprint.encode()).hexdigest()}"'
+
+
+def _opaque(tag: str) -> str:
+	tag = tag.strip()
+	return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+	"""If-None-Match uses the weak comparison, so W/ prefixes are ignored."""
+	header = request.headers.get("if-none-match")
+	if not header:
+		return False
+	if header.strip() == "*":
+		return True
+	return _opaque(etag) in {_opaque(tag) for tag in header.split(",")}
+
+
+def not_modified(etag: str) -> Response:
+	return Response(status_code=304, headers={"ETag": etag})
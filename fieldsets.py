@@ -0,0 +1,135 @@
+"""Sparse fieldsets: the ``fields`` and ``expand`` query parameters.
+
+By default a response carries the resource's own columns and none of its
+relationships. ``expand=owner,organization`` loads and embeds the named
+relationships; ``fields=uuid,name`` narrows the columns. The documented
+response model in schemas.py lists everything a response can hold, and
+each (fields, expand) combination gets its own model cut down from it, so
+pydantic never reads an attribute the query did not load. Under
+AsyncSession such a read would be a lazy load, and fail.
+
+Routes take a ``Selection`` as a dependency, pass ``selection.options`` to
+the query and serialize with ``selection.dump``:
+
+    selection: Selection = Depends(RFP_FIELDS)
+"""
+from functools import lru_cache
+from typing import List, Optional
+
+from fastapi import HTTPException, Query
+from pydantic import ConfigDict, create_model
+from sqlalchemy.orm import load_only
+
+from loaders import ORGANIZATION_EXPANSIONS, RFP_EXPANSIONS, SUPPLIER_EXPANSIONS, USER_EXPANSIONS
+from models import Organization, RFP, Supplier, User
+from responses import dump_json
+from schemas import BulkItemError, OrganizationResponse, RFPResponse, SupplierResponse, UserProfile
+
+# Keyset pagination reads created_at and id, and the loaders of expanded
+# collections read uuid, so these are loaded whatever ``fields`` asks for.
+ALWAYS_LOADED = ("id", "uuid", "created_at")
+
+
+def _names(raw: Optional[str]) -> set:
+	return {name.strip() for name in raw.split(",") if name.strip()} if raw else set()
+
+
+class Selection:
+	"""One (fields, expand) combination of a fieldset."""
+
+	def __init__(self, fieldset: "Fieldset", fields: tuple, expand: tuple):
+		self.fields = fields
+		self.expand = expand
+		# Tells cached bodies and ETags of different shapes apart.
+		self.key = f"fields={','.join(fields)};expand={','.join(expand)}"
+		schema = fieldset.schema
+		self.schema = create_model(
+			schema.__name__,
+			__config__=ConfigDict(from_attributes=True),
+			**{name: (schema.model_fields[name].annotation, schema.model_fields[name]) for name in fields + expand},
+		)
+		self.page_schema = create_model(
+			f"{schema.__name__}Page",
+			items=(List[self.schema], ...),
+			next_cursor=(Optional[str], None),
+		)
+		self.batch_schema = create_model(
+			f"{schema.__name__}Batch",
+			items=(List[Optional[self.schema]], ...),
+			errors=(List[BulkItemError], ...),
+		)
+		model = fieldset.model
+		columns = [name for name in fieldset.fields if name in fields or name in ALWAYS_LOADED]
+		columns += [name for name in ALWAYS_LOADED if name not in columns]
+		self.options = (
+			load_only(*(getattr(model, name) for name in columns)),
+			*(fieldset.expansions[name] for name in expand),
+		)
+
+	def dump(self, obj) -> bytes:
+		return dump_json(self.schema, obj)
+
+	def dump_page(self, page: dict) -> bytes:
+		"""Serialize a pagination.build_page result."""
+		return dump_json(self.page_schema, page)
+
+	def dump_batch(self, batch: dict) -> bytes:
+		"""Serialize a bulk.order_batch result."""
+		return dump_json(self.batch_schema, batch)
+
+	@lru_cache(maxsize=None)
+	def envelope(self, schema, field: str):
+		"""``schema`` with ``field`` holding this selection, for responses
+		that wrap the resource, such as a user next to its access token."""
+		return create_model(schema.__name__, __base__=schema, **{field: (self.schema, ...)})
+
+
+class Fieldset:
+	"""The columns and expandable relationships of one resource.
+
+	Instances are FastAPI dependencies that validate the query parameters
+	and return the matching, cached ``Selection``.
+	"""
+
+	def __init__(self, schema, model, expansions: dict):
+		self.schema = schema
+		self.model = model
+		self.expansions = expansions
+		self.fields = tuple(name for name in schema.model_fields if name not in expansions)
+
+	def __call__(
+		self,
+		fields: Optional[str] = Query(None, description="Comma-separated columns to return; all by default"),
+		expand: Optional[str] = Query(None, description="Comma-separated relationships to load and embed; none by default"),
+	) -> Selection:
+		return self.select(fields, expand)
+
+	def select(self, fields: Optional[str] = None, expand: Optional[str] = None) -> Selection:
+		requested_fields, requested_expand = _names(fields), _names(expand)
+		unknown = requested_fields - set(self.fields)
+		if unknown:
+			raise HTTPException(
+				status_code=400,
+				detail=f"Unknown field {', '.join(sorted(unknown))}; choose from {', '.join(self.fields)}.",
+			)
+		unknown = requested_expand - set(self.expansions)
+		if unknown:
+			raise HTTPException(
+				status_code=400,
+				detail=f"Cannot expand {', '.join(sorted(unknown))}; choose from {', '.join(self.expansions)}.",
+			)
+		# Declaration order, so equivalent requests share one selection.
+		return self._selection(
+			tuple(name for name in self.fields if name in requested_fields) if requested_fields else self.fields,
+			tuple(name for name in self.expansions if name in requested_expand),
+		)
+
+	@lru_cache(maxsize=256)
+	def _selection(self, fields: tuple, expand: tuple) -> Selection:
+		return Selection(self, fields, expand)
+
+
+RFP_FIELDS = Fieldset(RFPResponse, RFP, RFP_EXPANSIONS)
+SUPPLIER_FIELDS = Fieldset(SupplierResponse, Supplier, SUPPLIER_EXPANSIONS)
+ORGANIZATION_FIELDS = Fieldset(OrganizationResponse, Organization, ORGANIZATION_EXPANSIONS)
+USER_FIELDS = Fieldset(UserProfile, User, USER_EXPANSIONS)
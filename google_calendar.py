@@ -0,0 +1,137 @@
+"""Google Calendar API client shared by the google router.
+
+The Calendar service is built once per process from the discovery document
+bundled with google-api-python-client, instead of being rebuilt (and the
+document re-parsed) on every request. Requests made from it are executed
+with the caller's own authorized transport, kept per user so the
+connection and the refreshed access token are reused between calls.
+
+googleapiclient and httplib2 are blocking, so every call runs on a small
+thread pool rather than on the event loop. httplib2.Http is not
+thread-safe, so calls for one user are serialized on that user's
+transport while different users run concurrently.
+
+GOOGLE_CALENDAR_BASE_URL and GOOGLE_TOKEN_URI override the API base URL and
+the OAuth token endpoint, for example to point at a local fake Calendar
+server (see benchmarks/calendar_client.py).
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+import httplib2
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp, Request as GoogleAuthRequest
+from googleapiclient.discovery import build
+from cache import TTLLRUCache
+
+GOOGLE_API_WORKERS = int(os.getenv("GOOGLE_API_WORKERS", 8))
+GOOGLE_API_TIMEOUT = float(os.getenv("GOOGLE_API_TIMEOUT", 10))
+GOOGLE_API_RETRIES = int(os.getenv("GOOGLE_API_RETRIES", 2))
+GOOGLE_CALENDAR_BASE_URL = os.getenv("GOOGLE_CALENDAR_BASE_URL")
+GOOGLE_TOKEN_URI = os.getenv("GOOGLE_TOKEN_URI")
+# Access tokens are refreshed this long before they expire, so a request
+# never goes out with a token that lapses in flight.
+GOOGLE_TOKEN_REFRESH_MARGIN = timedelta(seconds=int(os.getenv("GOOGLE_TOKEN_REFRESH_MARGIN", 300)))
+# Idle per-user transports are dropped after this long.
+GOOGLE_TRANSPORT_TTL = float(os.getenv("GOOGLE_TRANSPORT_TTL", 3600))
+GOOGLE_TRANSPORT_CACHE_SIZE = int(os.getenv("GOOGLE_TRANSPORT_CACHE_SIZE", 1000))
+
+_executor = ThreadPoolExecutor(max_workers=GOOGLE_API_WORKERS, thread_name_prefix="google-api")
+_transports = TTLLRUCache("google_transports", GOOGLE_TRANSPORT_CACHE_SIZE, GOOGLE_TRANSPORT_TTL)
+_transports_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def calendar_service():
+	"""The Calendar v3 service, built once from the bundled discovery document.
+
+	It is built with an unauthorized transport and never executes requests
+	itself: UserTransport.execute passes each user's transport explicitly.
+	"""
+	client_options = {"api_endpoint": GOOGLE_CALENDAR_BASE_URL} if GOOGLE_CALENDAR_BASE_URL else None
+	return build(
+		"calendar", "v3",
+		http=httplib2.Http(timeout=GOOGLE_API_TIMEOUT),
+		static_discovery=True,
+		cache_discovery=False,
+		client_options=client_options,
+	)
+
+
+def _utcnow() -> datetime:
+	# google-auth keeps expiry as a naive UTC datetime.
+	return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class UserTransport:
+	"""One user's credentials and authorized HTTP connection."""
+
+	def __init__(self, credentials: Credentials):
+		self.credentials = credentials
+		self.http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=GOOGLE_API_TIMEOUT))
+		self.lock = threading.Lock()
+
+	def _refresh_if_expiring(self, on_refresh):
+		expiry = self.credentials.expiry
+		if self.credentials.token and expiry is not None and expiry - GOOGLE_TOKEN_REFRESH_MARGIN > _utcnow():
+			return
+		self.credentials.refresh(GoogleAuthRequest(self.http.http))
+		if on_refresh is not None:
+			on_refresh(self.credentials)
+
+	def execute(self, make_request, on_refresh=None):
+		"""Build a request from the shared service and run it as this user.
+
+		``on_refresh`` belongs to this call, not to the shared transport:
+		the callers of later calls are the ones that must store a token
+		refreshed for them. Blocking; runs on the Google API thread pool.
+		"""
+		with self.lock:
+			self._refresh_if_expiring(on_refresh)
+			request = make_request(calendar_service())
+			return request.execute(http=self.http, num_retries=GOOGLE_API_RETRIES)
+
+
+def user_transport(user_key: str, credentials_info: dict) -> UserTransport:
+	"""The cached transport for ``user_key``, rebuilt when the user has
+	re-authorized since it was created.
+	"""
+	with _transports_lock:
+		transport = _transports.get(user_key)
+		if transport is None or transport.credentials.refresh_token != credentials_info.get("refresh_token"):
+			credentials = Credentials.from_authorized_user_info(credentials_info)
+			if GOOGLE_TOKEN_URI:
+				# with_token_uri() does not carry the expiry over to the copy.
+				expiry = credentials.expiry
+				credentials = credentials.with_token_uri(GOOGLE_TOKEN_URI)
+				credentials.expiry = expiry
+			transport = UserTransport(credentials)
+		# Setting on every use keeps active users' transports from expiring.
+		_transports.set(user_key, transport)
+		return transport
+
+
+def forget_user(user_key: str):
+	_transports.invalidate(user_key)
+
+
+async def execute(user_key: str, credentials_info: dict, make_request, on_refresh=None):
+	"""Run ``make_request(service)`` as the user, off the event loop.
+
+	``on_refresh(credentials)`` is called, from a worker thread, after the
+	access token has been refreshed so the caller can store the new one.
+	"""
+	transport = user_transport(user_key, credentials_info)
+	loop = asyncio.get_running_loop()
+	return await loop.run_in_executor(_executor, transport.execute, make_request, on_refresh)
+
+
+async def run_blocking(fn, *args):
+	"""Run another blocking Google client call, such as an OAuth token
+	exchange, on the same thread pool.
+	"""
+	loop = asyncio.get_running_loop()
+	return await loop.run_in_executor(_executor, fn, *args)
@@ -0,0 +1,32 @@
+import glob
+import os
+from dotenv import load_dotenv
+
+# Before prometheus_client, which reads PROMETHEUS_MULTIPROC_DIR on import.
+load_dotenv()
+
+from prometheus_client import CollectorRegistry, multiprocess, start_http_server
+
+# Done here rather than in on_starting: with --preload gunicorn imports the
+# app, whose metrics open their files in this directory, before any hook
+# runs, and the directory may not exist yet (/tmp is empty on a new dyno).
+# Files left by an earlier run would be added into this run's counters.
+_multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if _multiproc_dir:
+    os.makedirs(_multiproc_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(_multiproc_dir, "*.db")):
+        os.remove(path)
+
+
+def when_ready(server):
+    # Served by the master, off the API's port, aggregating every worker.
+    port = os.environ.get("METRICS_PORT")
+    if port and _multiproc_dir:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(int(port), registry=registry)
+
+
+def child_exit(server, worker):
+    # Drop the live gauges of a worker that exited, so in-flight counts stay right.
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+from typing import Optional, Tuple
+from dotenv import load_dotenv
+from metrics import Histogram
+
+load_dotenv()
+
+# Hashes made with a different cost are flagged by verify_and_update() and
+# rewritten on the next successful login, so raising this is a rolling change.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# bcrypt releases the GIL, so threads give real parallelism. 0 hashes inline
+# on the event loop, which is only useful for comparison in benchmarks.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+# Past these, a hash is refused with PasswordHashingOverloaded instead of
+# queued: at most this many callers wait for a worker, for at most this many
+# seconds. 0 lifts the limit.
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 16))
+PASSWORD_HASH_MAX_WAIT = float(os.getenv("PASSWORD_HASH_MAX_WAIT", 1))
+
+pwd_context = CryptContext(
+	schemes=["bcrypt"],
+	deprecated="auto",
+	bcrypt__default_rounds=BCRYPT_ROUNDS,
+	bcrypt__min_rounds=BCRYPT_ROUNDS,
+	bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+class PasswordHashingOverloaded(Exception):
+	"""Raised when a hash would queue past ``max_queue`` or ``max_wait``."""
+
+
+class PasswordHasher:
+	"""Runs bcrypt off the event loop with at most ``max_workers`` hashes at once.
+
+	Callers over the limit wait on a semaphore instead of piling into the
+	executor queue, which keeps the queue depth and wait time observable.
+	Once ``max_queue`` callers are waiting, or one has waited ``max_wait``
+	seconds, further ones are refused straight away: under a login burst a
+	quick refusal is better than a response that arrives after the client
+	has given up.
+	"""
+
+	def __init__(
+		self,
+		context: CryptContext,
+		max_workers: int,
+		max_queue: int = PASSWORD_HASH_MAX_QUEUE,
+		max_wait: float = PASSWORD_HASH_MAX_WAIT,
+	):
+		self.context = context
+		self.max_workers = max_workers
+		self.max_queue = max_queue
+		self.max_wait = max_wait
+		self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash") if max_workers else None
+		self._semaphore = asyncio.Semaphore(max_workers or 1)
+		self.queued = 0
+		self.running = 0
+		self.completed = 0
+		self.rejected = 0
+		self.queue_wait = Histogram()
+		self.duration = Histogram()
+
+	async def _run(self, fn, *args):
+		if self._executor is None:
+			start = time.perf_counter()
+			try:
+				return fn(*args)
+			finally:
+				self.completed += 1
+				self.duration.observe(time.perf_counter() - start)
+
+		if self.overloaded():
+			self.rejected += 1
+			raise PasswordHashingOverloaded(f"{self.queued} password hashes already waiting")
+		submitted = time.perf_counter()
+		self.queued += 1
+		try:
+			await asyncio.wait_for(self._semaphore.acquire(), self.max_wait or None)
+		except asyncio.TimeoutError:
+			self.rejected += 1
+			raise PasswordHashingOverloaded(f"No password hash worker free within {self.max_wait} s") from None
+		finally:
+			self.queued -= 1
+		started = time.perf_counter()
+		self.queue_wait.observe(started - submitted)
+		self.running += 1
+		try:
+			loop = asyncio.get_running_loop()
+			return await loop.run_in_executor(self._executor, fn, *args)
+		finally:
+			self.running -= 1
+			self.completed += 1
+			self.duration.observe(time.perf_counter() - started)
+			self._semaphore.release()
+
+	def overloaded(self) -> bool:
+		"""Whether a hash started now would be refused for the full queue."""
+		return bool(self._executor and self.max_queue) and self.queued >= self.max_queue
+
+	async def hash(self, password: str) -> str:
+		return await self._run(self.context.hash, password)
+
+	async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+		"""Returns (verified, new_hash); new_hash is set when the stored cost is stale."""
+		return await self._run(self.context.verify_and_update, password, hashed_password)
+
+	def status(self) -> dict:
+		return {
+			"bcrypt_rounds": BCRYPT_ROUNDS,
+			"max_workers": self.max_workers,
+			"max_queue": self.max_queue,
+			"max_wait_seconds": self.max_wait,
+			"queued": self.queued,
+			"running": self.running,
+			"completed": self.completed,
+			"rejected": self.rejected,
+			"queue_wait_seconds": self.queue_wait.snapshot(),
+			"hash_seconds": self.duration.snapshot(),
+		}
+
+
+password_hasher = PasswordHasher(pwd_context, PASSWORD_HASH_WORKERS)
@@ -0,0 +1,183 @@
+"""Per-request HTTP and SQL instrumentation.
+
+SQLAlchemy cursor events on both engines from database.py attribute each
+statement, and the time it took, to the request running it through a
+ContextVar. RequestMetricsMiddleware turns that into Prometheus metrics
+per route template, the X-Query-Count header, and a slow-request log
+entry listing the slowest statements.
+
+The metrics are prometheus_client objects, served in Prometheus format on
+their own port, METRICS_PORT, apart from the API. Under gunicorn, set
+PROMETHEUS_MULTIPROC_DIR to a directory shared by the workers;
+gunicorn.conf.py empties it on startup, cleans up after exited workers,
+and serves the aggregate of every worker from the master. Run directly,
+main.py serves this process's metrics.
+"""
+import heapq
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+from database import engine, async_engine
+from metrics import LATENCY_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_HEADER = b"x-query-count"
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", 500))
+# Statements kept per request for the slow-request log, slowest first.
+SLOW_REQUEST_STATEMENTS = 5
+_STATEMENT_LOG_LENGTH = 500
+
+REQUESTS = Counter(
+	"http_requests_total", "HTTP requests handled.", ["method", "route", "status"]
+)
+REQUEST_DURATION = Histogram(
+	"http_request_duration_seconds", "Time to handle a request, until the last body byte is sent.",
+	["method", "route"], buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+	"http_requests_in_flight", "Requests currently being handled.", multiprocess_mode="livesum"
+)
+RESPONSE_SIZE = Histogram(
+	"http_response_size_bytes", "Response body size.",
+	["method", "route"], buckets=(100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000),
+)
+REQUEST_STATEMENTS = Histogram(
+	"db_statements_per_request", "SQL statements executed by a request.",
+	["method", "route"], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+REQUEST_DB_TIME = Histogram(
+	"db_time_per_request_seconds", "Time a request spent executing SQL statements.",
+	["method", "route"], buckets=LATENCY_BUCKETS,
+)
+
+
+class QueryStats:
+	def __init__(self):
+		self.count = 0
+		self.duration = 0.0
+		self._slowest = []
+		self._sequence = 0
+
+	def record(self, statement: str, duration: float):
+		self.duration += duration
+		self._sequence += 1
+		entry = (duration, self._sequence, statement)
+		if len(self._slowest) < SLOW_REQUEST_STATEMENTS:
+			heapq.heappush(self._slowest, entry)
+		else:
+			heapq.heappushpop(self._slowest, entry)
+
+	def slowest(self) -> list:
+		return [(duration, statement) for duration, _, statement in sorted(self._slowest, reverse=True)]
+
+
+_query_stats: ContextVar = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries():
+	"""Count and time the SQL statements executed inside the block, on either engine."""
+	stats = QueryStats()
+	token = _query_stats.set(stats)
+	try:
+		yield stats
+	finally:
+		_query_stats.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+	stats = _query_stats.get()
+	if stats is not None:
+		stats.count += 1
+		conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+	stats = _query_stats.get()
+	start_times = conn.info.get("query_start_time")
+	if stats is not None and start_times:
+		stats.record(statement, time.perf_counter() - start_times.pop())
+
+
+def _discard_start_time(exception_context):
+	# A failed statement never reaches after_cursor_execute.
+	connection = exception_context.connection
+	if connection is not None and _query_stats.get() is not None:
+		start_times = connection.info.get("query_start_time")
+		if start_times:
+			start_times.pop()
+
+
+for _engine in (engine, async_engine.sync_engine):
+	event.listen(_engine, "before_cursor_execute", _before_cursor_execute)
+	event.listen(_engine, "after_cursor_execute", _after_cursor_execute)
+	event.listen(_engine, "handle_error", _discard_start_time)
+
+
+def _route_label(scope) -> str:
+	# The path template, not the raw path, keeps label cardinality bounded.
+	# FastAPI versions that keep included routers nested leave the route
+	# without its prefix in scope["route"] and the full template in their
+	# effective route context.
+	context = scope.get("fastapi", {}).get("effective_route_context")
+	path = getattr(context, "path", None) or getattr(scope.get("route"), "path", None)
+	return path or "unmatched"
+
+
+class RequestMetricsMiddleware:
+	"""Records latency, response size and SQL usage per route, reports the
+	number of SQL statements in X-Query-Count and logs slow requests.
+	"""
+
+	def __init__(self, app):
+		self.app = app
+
+	async def __call__(self, scope, receive, send):
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+
+		status = 500
+		size = 0
+		start = time.perf_counter()
+		REQUESTS_IN_FLIGHT.inc()
+		try:
+			with track_queries() as stats:
+				async def send_with_metrics(message):
+					nonlocal status, size
+					if message["type"] == "http.response.start":
+						status = message["status"]
+						headers = list(message.get("headers", []))
+						headers.append((QUERY_COUNT_HEADER, str(stats.count).encode()))
+						message = {**message, "headers": headers}
+					elif message["type"] == "http.response.body":
+						size += len(message.get("body", b""))
+					await send(message)
+
+				await self.app(scope, receive, send_with_metrics)
+		finally:
+			REQUESTS_IN_FLIGHT.dec()
+			self._observe(scope, status, size, time.perf_counter() - start, stats)
+
+	def _observe(self, scope, status: int, size: int, duration: float, stats: QueryStats):
+		method, route = scope["method"], _route_label(scope)
+		REQUESTS.labels(method, route, str(status)).inc()
+		REQUEST_DURATION.labels(method, route).observe(duration)
+		RESPONSE_SIZE.labels(method, route).observe(size)
+		REQUEST_STATEMENTS.labels(method, route).observe(stats.count)
+		REQUEST_DB_TIME.labels(method, route).observe(stats.duration)
+
+		if duration * 1000 >= SLOW_REQUEST_MS:
+			statements = "".join(
+				f"\n  {statement_duration * 1000:8.1f} ms  {' '.join(statement.split())[:_STATEMENT_LOG_LENGTH]}"
+				for statement_duration, statement in stats.slowest()
+			)
+			logger.warning(
+				"Slow request: %s %s -> %s in %.1f ms, %d statements, %.1f ms in the database; slowest statements:%s",
+				method, scope["path"], status, duration * 1000, stats.count, stats.duration * 1000, statements,
+			)
@@ -0,0 +1,43 @@
+"""Handlers of the jobs.py job kinds. worker.py imports this module to
+register them; the web app only enqueues.
+"""
+from uuid import UUID
+from bulk import create_rfps, create_suppliers, validate_bulk_items
+from database import AsyncSessionLocal
+from depencies import load_memberships
+from jobs import handler
+from schemas import RFPCreate, SupplierCreate
+
+
+@handler("calendar_sync")
+async def calendar_sync(payload: dict):
+	# Imported on first use, so workers without Google configured never
+	# load its client libraries.
+	from calendar_sync import sync_user_by_uuid
+
+	await sync_user_by_uuid(UUID(payload["user_uuid"]))
+
+
+async def _bulk_create(payload: dict, schema, create) -> dict:
+	# Memberships are checked as they are when the job runs, not as they were
+	# when it was queued.
+	user_uuid = UUID(payload["user_uuid"])
+	async with AsyncSessionLocal() as db:
+		memberships = await load_memberships(db, user_uuid)
+		valid, errors = validate_bulk_items(payload["items"], schema, memberships)
+		# Jobs queued before the uuids were part of the payload have none.
+		created = await create(db, user_uuid, valid, payload.get("uuids")) if valid else []
+	return {
+		"created": [{"index": item["index"], "uuid": str(item["uuid"])} for item in created],
+		"errors": errors,
+	}
+
+
+@handler("rfp_bulk_create")
+async def rfp_bulk_create(payload: dict) -> dict:
+	return await _bulk_create(payload, RFPCreate, create_rfps)
+
+
+@handler("supplier_bulk_create")
+async def supplier_bulk_create(payload: dict) -> dict:
+	return await _bulk_create(payload, SupplierCreate, create_suppliers)
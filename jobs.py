@@ -0,0 +1,243 @@
+"""Durable background jobs, queued in the jobs table.
+
+enqueue() adds a job to the caller's session, so it is committed, or rolled
+back, together with the request's own writes. Workers (worker.py) claim due
+jobs with UPDATE ... WHERE id = (SELECT ... FOR UPDATE SKIP LOCKED), so any
+number of them can poll the table without blocking one another or taking
+the same job. A failed attempt is retried after an exponential backoff
+with jitter until the job runs out of attempts. A job still running twice
+JOB_TIMEOUT after it was claimed lost its worker, and goes back in the
+queue.
+
+Delivery is at least once: a worker can die between a handler's commit
+and the job's, and the job then runs again, so handlers must tolerate a
+second run. Handlers are async functions of the payload, registered with
+@handler, that return a JSON-serializable result or None. They live in
+job_handlers.py, which only worker.py imports; the web app just enqueues.
+"""
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+from datetime import timedelta
+from typing import Optional
+from uuid import uuid4
+from prometheus_client import Counter, Histogram
+from sqlalchemy import func, select, update
+from database import AsyncSessionLocal
+from metrics import LATENCY_BUCKETS
+from models import Job, utcnow
+
+logger = logging.getLogger(__name__)
+
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+# Seconds before the first retry; doubles with each attempt up to the max.
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", 10))
+JOB_RETRY_MAX_DELAY = float(os.getenv("JOB_RETRY_MAX_DELAY", 3600))
+# An attempt running longer is cancelled and counts as failed.
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", 600))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1))
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", 4))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+_ERROR_LENGTH = 2000
+
+JOB_ATTEMPTS = Counter(
+	"job_attempts_total", "Job attempts finished, by outcome: succeeded, retried or failed.", ["kind", "outcome"]
+)
+JOB_DURATION = Histogram(
+	"job_duration_seconds", "Time a job attempt ran.", ["kind"], buckets=LATENCY_BUCKETS
+)
+
+handlers = {}
+
+
+def handler(kind: str):
+	"""Register the decorated coroutine function as the handler of ``kind``."""
+	def register(function):
+		handlers[kind] = function
+		return function
+	return register
+
+
+class PermanentJobError(Exception):
+	"""Raised by a handler to fail the job without retrying it."""
+
+
+def enqueue(db, kind: str, payload: dict, owner_uuid=None, delay: float = 0, max_attempts: int = JOB_MAX_ATTEMPTS) -> Job:
+	"""Add a job to ``db``; it is queued once the caller commits."""
+	job = Job(
+		uuid=uuid4(),
+		kind=kind,
+		payload=payload,
+		owner_uuid=owner_uuid,
+		status=QUEUED,
+		attempts=0,
+		max_attempts=max_attempts,
+		run_at=utcnow() + timedelta(seconds=delay),
+	)
+	db.add(job)
+	return job
+
+
+def retry_delay(attempts: int) -> float:
+	"""Seconds to wait after the ``attempts``-th failed attempt."""
+	delay = min(JOB_RETRY_MAX_DELAY, JOB_RETRY_DELAY * 2 ** min(attempts - 1, 32))
+	# Jitter keeps jobs that failed together from retrying together.
+	return delay * random.uniform(0.5, 1)
+
+
+async def claim(worker_id: str) -> Optional[Job]:
+	"""Take the next due job, or return None when there is none."""
+	now = utcnow()
+	due = (
+		select(Job.id).where(Job.status == QUEUED, Job.run_at <= now)
+		.order_by(Job.run_at).limit(1)
+		.with_for_update(skip_locked=True)
+	)
+	async with AsyncSessionLocal() as db:
+		result = await db.execute(
+			update(Job).where(Job.id == due.scalar_subquery())
+			.values(status=RUNNING, attempts=Job.attempts + 1, locked_by=worker_id, locked_at=now)
+			.returning(Job)
+			.execution_options(synchronize_session=False)
+		)
+		job = result.scalars().first()
+		await db.commit()
+	return job
+
+
+async def _finish(job: Job, worker_id: str, **values):
+	# Matches nothing if the job was requeued as lost and claimed again since.
+	async with AsyncSessionLocal() as db:
+		await db.execute(
+			update(Job).where(Job.id == job.id, Job.locked_by == worker_id, Job.attempts == job.attempts)
+			.values(locked_by=None, locked_at=None, **values)
+			.execution_options(synchronize_session=False)
+		)
+		await db.commit()
+
+
+async def run_job(job: Job, worker_id: str):
+	"""Run one claimed attempt of ``job`` and record how it went."""
+	function = handlers.get(job.kind)
+	start = time.perf_counter()
+	try:
+		if function is None:
+			raise PermanentJobError(f"No handler for job kind {job.kind!r}")
+		result = await asyncio.wait_for(function(job.payload), JOB_TIMEOUT)
+	except Exception as e:
+		error = f"{type(e).__name__}: {e}"[:_ERROR_LENGTH]
+		if isinstance(e, PermanentJobError) or job.attempts >= job.max_attempts:
+			outcome = FAILED
+			await _finish(job, worker_id, status=FAILED, finished_at=utcnow(), last_error=error)
+		else:
+			outcome = "retried"
+			run_at = utcnow() + timedelta(seconds=retry_delay(job.attempts))
+			await _finish(job, worker_id, status=QUEUED, run_at=run_at, last_error=error)
+		logger.warning(
+			"Job %s (%s) attempt %d of %d failed, %s", job.uuid, job.kind, job.attempts, job.max_attempts, outcome,
+			exc_info=True,
+		)
+	else:
+		outcome = SUCCEEDED
+		await _finish(job, worker_id, status=SUCCEEDED, finished_at=utcnow(), result=result)
+	finally:
+		JOB_DURATION.labels(job.kind).observe(time.perf_counter() - start)
+	JOB_ATTEMPTS.labels(job.kind, outcome).inc()
+
+
+async def requeue_lost() -> int:
+	"""Put running jobs whose worker went away back in the queue, or fail
+	them if that was their last attempt. Returns how many were found."""
+	now = utcnow()
+	lost = (Job.status == RUNNING, Job.locked_at < now - timedelta(seconds=JOB_TIMEOUT * 2))
+	released = dict(locked_by=None, locked_at=None, last_error="Worker lost while running the job")
+	async with AsyncSessionLocal() as db:
+		failed = await db.execute(
+			update(Job).where(*lost, Job.attempts >= Job.max_attempts)
+			.values(status=FAILED, finished_at=now, **released)
+			.execution_options(synchronize_session=False)
+		)
+		requeued = await db.execute(
+			update(Job).where(*lost)
+			.values(status=QUEUED, run_at=now, **released)
+			.execution_options(synchronize_session=False)
+		)
+		await db.commit()
+	return failed.rowcount + requeued.rowcount
+
+
+async def queue_status(db) -> dict:
+	"""Job counts by kind and status, and how late the oldest due job is."""
+	now = utcnow()
+	rows = (await db.execute(
+		select(Job.kind, Job.status, func.count()).group_by(Job.kind, Job.status)
+	)).all()
+	oldest = await db.scalar(select(func.min(Job.run_at)).where(Job.status == QUEUED, Job.run_at <= now))
+	counts = {}
+	for kind, status, count in rows:
+		counts.setdefault(kind, {})[status] = count
+	return {
+		"jobs": counts,
+		"oldest_due_seconds": (now - oldest).total_seconds() if oldest is not None else 0.0,
+	}
+
+
+class Worker:
+	"""Runs ``concurrency`` claim-and-run loops, and the lost-job sweep, in
+	one process. stop() lets the running jobs finish and then returns from
+	run().
+	"""
+
+	def __init__(self, concurrency: int = JOB_WORKER_CONCURRENCY, poll_interval: float = JOB_POLL_INTERVAL, name: Optional[str] = None):
+		self.concurrency = concurrency
+		self.poll_interval = poll_interval
+		self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+		self._stopping = asyncio.Event()
+
+	def stop(self):
+		self._stopping.set()
+
+	async def run(self):
+		loops = [self._loop(f"{self.name}/{slot}") for slot in range(self.concurrency)]
+		await asyncio.gather(*loops, self._sweep())
+
+	async def _wait(self, seconds: float):
+		try:
+			await asyncio.wait_for(self._stopping.wait(), seconds)
+		except asyncio.TimeoutError:
+			pass
+
+	async def _loop(self, worker_id: str):
+		while not self._stopping.is_set():
+			try:
+				job = await claim(worker_id)
+			except Exception:
+				logger.exception("Claiming a job failed")
+				job = None
+			if job is None:
+				# Jittered so idle loops spread their polls out.
+				await self._wait(self.poll_interval * random.uniform(0.5, 1.5))
+				continue
+			try:
+				await run_job(job, worker_id)
+			except Exception:
+				# Recording the outcome failed; requeue_lost picks the job up.
+				logger.exception("Job %s (%s) could not be finished", job.uuid, job.kind)
+
+	async def _sweep(self):
+		while not self._stopping.is_set():
+			try:
+				lost = await requeue_lost()
+				if lost:
+					logger.warning("Released %d jobs whose worker went away", lost)
+			except Exception:
+				logger.exception("Sweeping lost jobs failed")
+			await self._wait(min(JOB_TIMEOUT, 60))
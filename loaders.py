@@ -0,0 +1,52 @@
+from sqlalchemy.orm import joinedload, selectinload
+from models import User, Organization, RFP, Supplier
+
+# AsyncSession cannot lazy-load relationships while a response is being
+# serialized, so every relationship a response model reads has to be loaded
+# by the query that fetches the rows. One tuple of loader options per shape.
+#
+# Many-to-one relationships are joined into the parent query; collections use
+# selectin so each one costs a single extra query however many rows are listed.
+
+ORGANIZATION_SCHEMA_OPTIONS = (
+	selectinload(Organization.suppliers),
+)
+
+USER_SCHEMA_OPTIONS = (
+	joinedload(User.active_organization).options(*ORGANIZATION_SCHEMA_OPTIONS),
+	selectinload(User.owned_invitations),
+	selectinload(User.organizations).options(*ORGANIZATION_SCHEMA_OPTIONS),
+	selectinload(User.suppliers),
+)
+
+# The ``expand`` options of fieldsets.py, one loader per relationship. The
+# embedded objects are summaries without relationships of their own, so
+# only their summary columns are loaded.
+
+USER_SUMMARY_COLUMNS = (User.id, User.uuid, User.email, User.first_name, User.last_name)
+ORGANIZATION_SUMMARY_COLUMNS = (Organization.id, Organization.uuid, Organization.name, Organization.owner_uuid)
+
+RFP_EXPANSIONS = {
+	"owner": joinedload(RFP.owner).load_only(*USER_SUMMARY_COLUMNS),
+	"organization": joinedload(RFP.organization, innerjoin=True).load_only(*ORGANIZATION_SUMMARY_COLUMNS),
+}
+
+SUPPLIER_EXPANSIONS = {
+	"owner": joinedload(Supplier.owner).load_only(*USER_SUMMARY_COLUMNS),
+	"organization": joinedload(Supplier.organization, innerjoin=True).load_only(*ORGANIZATION_SUMMARY_COLUMNS),
+	"users": selectinload(Supplier.users).load_only(*USER_SUMMARY_COLUMNS),
+}
+
+ORGANIZATION_EXPANSIONS = {
+	"users": selectinload(Organization.users).load_only(*USER_SUMMARY_COLUMNS),
+	"invitations": selectinload(Organization.invitations),
+	"rfps": selectinload(Organization.rfps),
+	"suppliers": selectinload(Organization.suppliers),
+}
+
+USER_EXPANSIONS = {
+	"active_organization": joinedload(User.active_organization).load_only(*ORGANIZATION_SUMMARY_COLUMNS),
+	"owned_invitations": selectinload(User.owned_invitations),
+	"organizations": selectinload(User.organizations).load_only(*ORGANIZATION_SUMMARY_COLUMNS),
+	"suppliers": selectinload(User.suppliers),
+}
@@ -1,49 +1,105 @@
+from dotenv import load_dotenv
+
+# Before the other imports: modules down to prometheus_client read their
+# settings from the environment as they are imported.
+load_dotenv()
+
 from fastapi import FastAPI
+from fastapi.datastructures import Default
 from fastapi.middleware.cors import CORSMiddleware
 
 from routes.authenticate import router as authenticate_router
 from routes.organization import router as organization_router
 from routes.rfp import router as rfp_router
 from routes.supplier import router as supplier_router
-from routes.google import router as google
-from dotenv import load_dotenv
+from routes.metrics import router as metrics_router
+from routes.search import router as search_router
+from routes.jobs import router as jobs_router
+from instrumentation import RequestMetricsMiddleware
+from responses import ORJSONResponse
+from cache import CACHE_INVALIDATION_BROADCAST, PostgresInvalidationBroadcaster
+from database import DATABASE_URL_ENV
+from contextlib import asynccontextmanager
 import os
-import uvicorn
-
-
-load_dotenv()
 
 BASE_URL = os.getenv("BASE_URL")
 if not BASE_URL:
     raise ValueError("BASE_URL is not set in the environment variables.")
+# The Google integration (OAuth, Calendar client and sync) and its client
+# libraries are only imported when it is configured.
+GOOGLE_ENABLED = bool(os.getenv("GOOGLE_CLIENT_SECRET"))
 import logging
 
-app = FastAPI()
-if __name__ == "__main__":
-    # Use the PORT environment variable, default to 8000 for local development
-    port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
-    
-origins = [BASE_URL]
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    broadcaster = None
+    if CACHE_INVALIDATION_BROADCAST == "postgres":
+        broadcaster = PostgresInvalidationBroadcaster(DATABASE_URL_ENV)
+        await broadcaster.start()
+    calendar_syncer = None
+    if GOOGLE_ENABLED:
+        from calendar_sync import GOOGLE_SYNC_INTERVAL, CalendarSyncer
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,  # Allows specific origins
-    allow_credentials=True,  # Allows cookies to be included
-    allow_methods=["*"],  # Allows all methods (GET, POST, etc.)
-    allow_headers=["*"],  # Allows all headers
-)
+        if GOOGLE_SYNC_INTERVAL > 0:
+            calendar_syncer = CalendarSyncer()
+            await calendar_syncer.start()
+    yield
+    if calendar_syncer is not None:
+        await calendar_syncer.stop()
+    if broadcaster is not None:
+        await broadcaster.stop()
 
 logging.basicConfig(level=logging.DEBUG)
 
-@app.get("/")
-async def read_root():
-    return {"API Working"}
+def create_app() -> FastAPI:
+    # Default() keeps FastAPI's direct pydantic serialization for routes with a
+    # response model; ORJSONResponse renders the rest. See responses.py.
+    app = FastAPI(lifespan=lifespan, default_response_class=Default(ORJSONResponse))
 
-app.include_router(authenticate_router, prefix="/api", tags=["authenticate"])
-app.include_router(organization_router, prefix="/api", tags=["organization"])
-app.include_router(rfp_router, prefix="/api", tags=["rfp"])
-app.include_router(supplier_router, prefix="/api", tags=["supplier"])
+    origins = [BASE_URL]
 
-app.include_router(google, prefix="/api", tags=["google"])
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,  # Allows specific origins
+        allow_credentials=True,  # Allows cookies to be included
+        allow_methods=["*"],  # Allows all methods (GET, POST, etc.)
+        allow_headers=["*"],  # Allows all headers
+        expose_headers=["ETag"],  # Lets the frontend send If-None-Match on polls
+    )
+    app.add_middleware(RequestMetricsMiddleware)
 
+    @app.get("/")
+    async def read_root():
+        return {"API Working"}
+
+    app.include_router(authenticate_router, prefix="/api", tags=["authenticate"])
+    app.include_router(organization_router, prefix="/api", tags=["organization"])
+    app.include_router(rfp_router, prefix="/api", tags=["rfp"])
+    app.include_router(supplier_router, prefix="/api", tags=["supplier"])
+    app.include_router(search_router, prefix="/api", tags=["search"])
+    app.include_router(jobs_router, prefix="/api", tags=["jobs"])
+
+    if GOOGLE_ENABLED:
+        from routes.google import router as google
+
+        app.include_router(google, prefix="/api", tags=["google"])
+    app.include_router(metrics_router, prefix="/api", tags=["metrics"])
+    return app
+
+# Imported by uvicorn/gunicorn as main:app. Importing it in the gunicorn
+# master with --preload is safe: database.py resets the connection pools in
+# each forked worker.
+app = create_app()
+
+if __name__ == "__main__":
+    # Use the PORT environment variable, default to 8000 for local development
+    import uvicorn
+
+    port = int(os.getenv("PORT", 8000))
+    # Under gunicorn the master serves the metrics of every worker; see gunicorn.conf.py.
+    metrics_port = os.getenv("METRICS_PORT")
+    if metrics_port:
+        from prometheus_client import start_http_server
+
+        start_http_server(int(metrics_port))
+    uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,35 @@
+import threading
+from bisect import bisect_left
+
+# Upper bounds in seconds, shared by every latency histogram in the app.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+	"""Cumulative histogram with fixed upper bounds, Prometheus style."""
+
+	def __init__(self, buckets=LATENCY_BUCKETS):
+		self.buckets = tuple(sorted(buckets))
+		self._counts = [0] * (len(self.buckets) + 1)
+		self._sum = 0.0
+		self._count = 0
+		self._lock = threading.Lock()
+
+	def observe(self, value: float):
+		index = bisect_left(self.buckets, value)
+		with self._lock:
+			self._counts[index] += 1
+			self._sum += value
+			self._count += 1
+
+	def snapshot(self) -> dict:
+		with self._lock:
+			counts = list(self._counts)
+			total, count = self._sum, self._count
+		buckets = {}
+		cumulative = 0
+		for bound, bucket_count in zip(self.buckets, counts):
+			cumulative += bucket_count
+			buckets[str(bound)] = cumulative
+		buckets["+Inf"] = count
+		return {"buckets": buckets, "sum": total, "count": count}
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, DateTime, Integer, String, ForeignKey, JSON, Enum
+from sqlalchemy import Column, DateTime, Integer, String, ForeignKey, JSON, Enum, Index, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 import uuid
 from datetime import datetime, timezone
@@ -21,10 +21,16 @@ class SupplierUserRole(str, enum.Enum):
 	user = "user"	
 
 
+def utcnow():
+	# The columns are TIMESTAMP WITHOUT TIME ZONE holding UTC; asyncpg refuses
+	# aware datetimes for them, so drop the tzinfo after taking UTC time.
+	return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class CustomBase(Base):
 	__abstract__ = True 
-	created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-	updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+	created_at = Column(DateTime, default=utcnow)
+	updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
     
 class User(CustomBase):
 	__tablename__ = 'users'
@@ -80,6 +86,12 @@ class Organization(CustomBase):
 	rfps = relationship("RFP", back_populates="organization")
 	suppliers = relationship("Supplier", back_populates="organization")
 
+	__table_args__ = (
+		Index("ix_organizations_created_at_id", "created_at", "id"),
+		# depencies.load_memberships finds the organizations a user owns.
+		Index("ix_organizations_owner_uuid", "owner_uuid"),
+	)
+
 class OrganizationUser(CustomBase):
     __tablename__ = 'organization_users'
 
@@ -87,6 +99,12 @@ class OrganizationUser(CustomBase):
     user_uuid = Column(UUID(as_uuid=True), ForeignKey('users.uuid'), nullable=False)  
     organization_uuid = Column(UUID(as_uuid=True), ForeignKey('organizations.uuid'), nullable=False)
 
+    __table_args__ = (
+        # Membership checks filter on the user; loading an organization's members on the organization.
+        Index("ix_organization_users_user_uuid_organization_uuid", "user_uuid", "organization_uuid", unique=True),
+        Index("ix_organization_users_organization_uuid", "organization_uuid"),
+    )
+
 class SupplierUser(CustomBase):
 	__tablename__ = 'supplier_users'
 
@@ -94,6 +112,13 @@ class SupplierUser(CustomBase):
 	user_uuid = Column(UUID(as_uuid=True), ForeignKey('users.uuid'), nullable=False)  
 	supplier_uuid = Column(UUID(as_uuid=True), ForeignKey('suppliers.uuid'), nullable=False)
 
+	__table_args__ = (
+		Index("ix_supplier_users_user_uuid_supplier_uuid", "user_uuid", "supplier_uuid", unique=True),
+		Index("ix_supplier_users_supplier_uuid", "supplier_uuid"),
+	)
+
+# rfps and suppliers also have a Postgres-generated search_vector column that
+# is left unmapped on purpose; see search.py.
 class RFP(CustomBase):
 	__tablename__ = 'rfps'
 
@@ -102,11 +127,16 @@ class RFP(CustomBase):
 	uuid = Column(UUID(as_uuid=True), default=uuid.uuid4, unique=True, nullable=False, index=True)	
 	organization_uuid = Column(UUID(as_uuid=True), ForeignKey('organizations.uuid'), nullable=False)
 	owner_uuid = Column(UUID(as_uuid=True), ForeignKey('users.uuid'))
-	data = Column(JSON, nullable=True)
+	data = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
 
 	organization = relationship("Organization", back_populates="rfps")
 	owner = relationship("User", back_populates="owned_rfps")
 
+	__table_args__ = (
+		Index("ix_rfps_organization_uuid_created_at_id", "organization_uuid", "created_at", "id"),
+		Index("ix_rfps_data", "data", postgresql_using="gin", postgresql_ops={"data": "jsonb_path_ops"}),
+	)
+
 class Supplier(CustomBase):
 	__tablename__ = 'suppliers'
 
@@ -115,8 +145,8 @@ class Supplier(CustomBase):
 	uuid = Column(UUID(as_uuid=True), default=uuid.uuid4, unique=True, nullable=False, index=True)	
 	organization_uuid = Column(UUID(as_uuid=True), ForeignKey('organizations.uuid'), nullable=False)
 	owner_uuid = Column(UUID(as_uuid=True), ForeignKey('users.uuid'))
-	logo_url = Column(String, index=True)
-	data = Column(JSON, nullable=True)
+	logo_url = Column(String)
+	data = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
 	users = relationship(
 		"User", 
 		secondary="supplier_users", 
@@ -125,4 +155,67 @@ class Supplier(CustomBase):
 	organization = relationship("Organization", back_populates="suppliers")
 	owner = relationship("User", back_populates="owned_suppliers")
 
+	__table_args__ = (
+		Index("ix_suppliers_organization_uuid_created_at_id", "organization_uuid", "created_at", "id"),
+		Index("ix_suppliers_data", "data", postgresql_using="gin", postgresql_ops={"data": "jsonb_path_ops"}),
+	)
+
+class GoogleCredential(CustomBase):
+	__tablename__ = 'google_credentials'
+
+	id = Column(Integer, primary_key=True, index=True)
+	user_uuid = Column(UUID(as_uuid=True), ForeignKey('users.uuid'), unique=True, nullable=False)
+	# Authorized-user info as google-auth serializes it, refresh token included.
+	credentials = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False)
+	# nextSyncToken of the last completed sync of the primary calendar.
+	sync_token = Column(String, nullable=True)
+	synced_at = Column(DateTime, nullable=True)
+	# Set while a sync holds the user; see calendar_sync._claim.
+	sync_claimed_at = Column(DateTime, nullable=True)
+
+class CalendarEvent(CustomBase):
+	__tablename__ = 'calendar_events'
+
+	id = Column(Integer, primary_key=True, index=True)
+	user_uuid = Column(UUID(as_uuid=True), ForeignKey('users.uuid'), nullable=False)
+	google_id = Column(String, nullable=False)
+	summary = Column(String, nullable=True)
+	# UTC; all-day events start and end at midnight.
+	start_at = Column(DateTime, nullable=False)
+	end_at = Column(DateTime, nullable=False)
+	# The event resource as returned by the Calendar API.
+	data = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False)
+
+	__table_args__ = (
+		Index("ix_calendar_events_user_uuid_google_id", "user_uuid", "google_id", unique=True),
+		Index("ix_calendar_events_user_uuid_start_at_id", "user_uuid", "start_at", "id"),
+	)
+
+class Job(CustomBase):
+	__tablename__ = 'jobs'
 
+	id = Column(Integer, primary_key=True, index=True)
+	uuid = Column(UUID(as_uuid=True), default=uuid.uuid4, unique=True, nullable=False, index=True)
+	# Names a handler registered with jobs.handler.
+	kind = Column(String, nullable=False)
+	payload = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False)
+	# queued, running, succeeded or failed.
+	status = Column(String, nullable=False, default="queued")
+	attempts = Column(Integer, nullable=False, default=0)
+	max_attempts = Column(Integer, nullable=False)
+	# Not claimed before this; pushed back after each failed attempt.
+	run_at = Column(DateTime, nullable=False, default=utcnow)
+	locked_by = Column(String, nullable=True)
+	locked_at = Column(DateTime, nullable=True)
+	finished_at = Column(DateTime, nullable=True)
+	last_error = Column(String, nullable=True)
+	result = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
+	# Who enqueued the job; only they can see it through /jobs.
+	owner_uuid = Column(UUID(as_uuid=True), ForeignKey('users.uuid'), nullable=True)
+
+	__table_args__ = (
+		# Claiming scans due queued jobs, and running ones whose worker went away.
+		Index("ix_jobs_queued_run_at", "run_at", postgresql_where=text("status = 'queued'")),
+		Index("ix_jobs_running_locked_at", "locked_at", postgresql_where=text("status = 'running'")),
+		Index("ix_jobs_owner_uuid_created_at_id", "owner_uuid", "created_at", "id"),
+	)
@@ -0,0 +1,71 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from fastapi import HTTPException, Query
+from sqlalchemy import tuple_
+from typing import Optional
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class PageParams:
+	"""Query parameters shared by every keyset-paginated list endpoint."""
+
+	def __init__(
+		self,
+		limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of items to return"),
+		cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+	):
+		self.limit = limit
+		self.cursor = cursor
+
+
+def encode_token(values: list) -> str:
+	payload = json.dumps(values).encode()
+	return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_token(cursor: str) -> list:
+	try:
+		padded = cursor + "=" * (-len(cursor) % 4)
+		values = json.loads(base64.urlsafe_b64decode(padded))
+	except (ValueError, TypeError, binascii.Error):
+		raise HTTPException(status_code=400, detail="Invalid cursor")
+	if not isinstance(values, list):
+		raise HTTPException(status_code=400, detail="Invalid cursor")
+	return values
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+	return encode_token([created_at.isoformat(), id])
+
+
+def decode_cursor(cursor: str):
+	try:
+		created_at, id = decode_token(cursor)
+		return datetime.fromisoformat(created_at), int(id)
+	except (ValueError, TypeError):
+		raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(stmt, model, page: PageParams):
+	"""Order newest first on (created_at, id) and seek past the cursor.
+
+	One row more than the limit is fetched so the caller can tell whether
+	another page exists without a COUNT query.
+	"""
+	if page.cursor:
+		created_at, id = decode_cursor(page.cursor)
+		stmt = stmt.filter(tuple_(model.created_at, model.id) < tuple_(created_at, id))
+	return stmt.order_by(model.created_at.desc(), model.id.desc()).limit(page.limit + 1)
+
+
+def build_page(rows, page: PageParams) -> dict:
+	items = list(rows[:page.limit])
+	next_cursor = None
+	if len(rows) > page.limit:
+		last = items[-1]
+		next_cursor = encode_cursor(last.created_at, last.id)
+	return {"items": items, "next_cursor": next_cursor}
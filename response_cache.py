@@ -0,0 +1,260 @@
+"""Read-through cache for serialized organization workspace responses.
+
+Entries hold the response body together with the ETag it was built for,
+one per response shape (fieldsets.Selection key), all under a single entry
+per organization so that invalidating it drops every shape.
+get_organization_with_id computes that ETag on every request anyway, so a
+cached body is only served while the tag still matches, and a hit skips
+the relationship loads and serialization. The tag is only as fine as the
+row counts and max(updated_at) it is built from (etags.py), and updated_at
+is stamped by the app host's clock: a write from another process within
+the same clock tick, or from a host whose clock lags, can leave it
+unchanged. Writes through the rfp, supplier and organization routers
+therefore also invalidate the entry after commit, and the TTL bounds
+whatever slips through both.
+
+Entries are keyed by the caller's permission scope in the organization,
+owner or member, as well as the organization.
+
+The backend is chosen with RESPONSE_CACHE_BACKEND: ``memory`` (default) is
+a TTL/LRU cache per worker; ``redis`` shares entries between workers and
+hosts and needs the ``redis`` package.
+"""
+import asyncio
+import logging
+import os
+from uuid import UUID
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from cache import TTLLRUCache, caches, invalidation_bus, invalidate_after_commit
+from models import Invitation, Organization, OrganizationUser, RFP, Supplier
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 30))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 1000))
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0")
+# Response shapes kept per organization; the oldest is dropped past this.
+RESPONSE_CACHE_VARIANTS = int(os.getenv("RESPONSE_CACHE_VARIANTS", 8))
+
+# Owners and members are cached apart, so a body built for one is never
+# served to the other once their workspaces differ.
+PERMISSION_SCOPES = ("owner", "member")
+
+
+def permission_scope(memberships, organization_uuid) -> str:
+	"""The caller's permission scope within the organization, part of the key."""
+	return "owner" if memberships.owns_organization(organization_uuid) else "member"
+
+
+class MemoryBackend:
+	"""Per-process TTL/LRU storage. An entry is a dict of (etag, body) by
+	variant."""
+
+	def __init__(self, name: str, maxsize: int, ttl: float):
+		self._cache = TTLLRUCache(name, maxsize, ttl)
+
+	async def get(self, key: str, variant: str):
+		entry = self._cache.get(key)
+		return None if entry is None else entry.get(variant)
+
+	async def set(self, key: str, variant: str, value):
+		# Copied rather than changed in place, since set() is what refreshes the TTL.
+		entry = dict(self._cache.get(key) or {})
+		entry.pop(variant, None)
+		entry[variant] = value
+		while len(entry) > RESPONSE_CACHE_VARIANTS:
+			del entry[next(iter(entry))]
+		self._cache.set(key, entry)
+
+	def invalidate(self, key: str):
+		self._cache.invalidate(key)
+
+	def clear(self):
+		self._cache.clear()
+
+	def stats(self) -> dict:
+		stats = self._cache.stats()
+		return {
+			"backend": "memory",
+			"size": stats["size"],
+			"maxsize": stats["maxsize"],
+			"ttl_seconds": stats["ttl_seconds"],
+			"evictions": stats["evictions"],
+			"expirations": stats["expirations"],
+			"invalidations": stats["invalidations"],
+		}
+
+
+class RedisBackend:
+	"""Storage shared by every worker. Redis expires entries itself and, with
+	``maxmemory-policy allkeys-lru``, bounds the size by evicting the least
+	recently used ones. An entry is a hash of ``etag\nbody`` by variant.
+
+	Any redis.asyncio-compatible ``client`` can be passed in place of the
+	one built from ``url``; benchmarks/cache_backends.py runs against
+	fakeredis that way.
+	"""
+
+	def __init__(self, name: str, ttl: float, url: str = RESPONSE_CACHE_REDIS_URL, client=None):
+		if client is None:
+			import redis.asyncio as redis
+
+			client = redis.from_url(url)
+		self.client = client
+		self.prefix = f"{name}:"
+		self.ttl = ttl
+		self.errors = 0
+		self.invalidations = 0
+		self._pending = set()
+
+	async def get(self, key: str, variant: str):
+		try:
+			raw = await self.client.hget(self.prefix + key, variant)
+		except Exception:
+			self.errors += 1
+			logger.warning("Response cache read failed", exc_info=True)
+			return None
+		if raw is None:
+			return None
+		etag, body = raw.split(b"\n", 1)
+		return etag.decode(), body
+
+	async def set(self, key: str, variant: str, value):
+		if self.ttl <= 0:
+			return
+		etag, body = value
+		try:
+			async with self.client.pipeline(transaction=False) as pipe:
+				pipe.hset(self.prefix + key, variant, etag.encode() + b"\n" + body)
+				pipe.expire(self.prefix + key, max(1, int(self.ttl)))
+				await pipe.execute()
+		except Exception:
+			self.errors += 1
+			logger.warning("Response cache write failed", exc_info=True)
+
+	def invalidate(self, key: str):
+		# Called from sync session hooks; the delete is sent from the loop.
+		# A dropped delete is harmless because entries are checked against
+		# the current ETag before they are served.
+		try:
+			loop = asyncio.get_running_loop()
+		except RuntimeError:
+			return
+		self.invalidations += 1
+		self._spawn(loop, self.client.delete(self.prefix + key))
+
+	def clear(self):
+		try:
+			loop = asyncio.get_running_loop()
+		except RuntimeError:
+			return
+		self._spawn(loop, self._delete_all())
+
+	async def _delete_all(self):
+		async for key in self.client.scan_iter(match=self.prefix + "*"):
+			await self.client.delete(key)
+
+	def _spawn(self, loop, coroutine):
+		task = loop.create_task(coroutine)
+		self._pending.add(task)
+		task.add_done_callback(self._pending.discard)
+
+	def stats(self) -> dict:
+		return {
+			"backend": "redis",
+			"ttl_seconds": self.ttl,
+			"invalidations": self.invalidations,
+			"errors": self.errors,
+		}
+
+
+class ResponseCache:
+	def __init__(self, name: str, backend):
+		self.name = name
+		self.backend = backend
+		self.hits = 0
+		self.misses = 0
+		self.stale = 0
+		# Replaces the registration of a MemoryBackend's inner cache, whose
+		# hit counts would include entries rejected as stale.
+		caches[name] = self
+		invalidation_bus.subscribe(name, self.invalidate)
+
+	@staticmethod
+	def key(organization_uuid, scope: str) -> str:
+		return f"{organization_uuid}:{scope}"
+
+	async def get(self, key: str, etag: str, variant: str):
+		entry = await self.backend.get(key, variant)
+		if entry is None:
+			self.misses += 1
+			return None
+		cached_etag, body = entry
+		if cached_etag != etag:
+			self.stale += 1
+			self.misses += 1
+			return None
+		self.hits += 1
+		return body
+
+	async def set(self, key: str, etag: str, variant: str, body: bytes):
+		await self.backend.set(key, variant, (etag, body))
+
+	def invalidate(self, organization_uuid: str):
+		for scope in PERMISSION_SCOPES:
+			self.backend.invalidate(self.key(organization_uuid, scope))
+
+	def clear(self):
+		self.backend.clear()
+
+	def stats(self) -> dict:
+		lookups = self.hits + self.misses
+		return {
+			**self.backend.stats(),
+			"hits": self.hits,
+			"misses": self.misses,
+			"stale": self.stale,
+			"hit_ratio": self.hits / lookups if lookups else 0.0,
+		}
+
+
+def _make_backend(name: str):
+	if RESPONSE_CACHE_BACKEND == "redis":
+		return RedisBackend(name, RESPONSE_CACHE_TTL)
+	return MemoryBackend(name, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+
+
+organization_response_cache = ResponseCache("organization_response", _make_backend("organization_response"))
+
+
+def invalidate_organization_response(session: Session, organization_uuid: UUID):
+	"""For rows written with Core statements, which skip the mapper events."""
+	invalidate_after_commit(session, organization_response_cache.name, str(organization_uuid))
+
+
+@event.listens_for(Organization, "after_update")
+@event.listens_for(Organization, "after_delete")
+def _invalidate_organization(mapper, connection, target):
+	session = object_session(target)
+	if session is not None:
+		invalidate_organization_response(session, target.uuid)
+
+
+@event.listens_for(Invitation, "after_insert")
+@event.listens_for(Invitation, "after_update")
+@event.listens_for(Invitation, "after_delete")
+@event.listens_for(OrganizationUser, "after_insert")
+@event.listens_for(OrganizationUser, "after_update")
+@event.listens_for(OrganizationUser, "after_delete")
+@event.listens_for(RFP, "after_insert")
+@event.listens_for(RFP, "after_update")
+@event.listens_for(RFP, "after_delete")
+@event.listens_for(Supplier, "after_insert")
+@event.listens_for(Supplier, "after_update")
+@event.listens_for(Supplier, "after_delete")
+def _invalidate_organization_contents(mapper, connection, target):
+	session = object_session(target)
+	if session is not None:
+		invalidate_organization_response(session, target.organization_uuid)
@@ -0,0 +1,34 @@
+"""JSON rendering for responses.
+
+Routes with a response model are serialized by FastAPI through the
+model's compiled pydantic-core serializer, straight from the validated
+ORM data to bytes. ORJSONResponse covers everything else: routes that
+return plain dicts and error bodies. main.py installs it as the default
+response class wrapped in ``Default`` so that the first path stays on;
+any explicit response class turns it off.
+"""
+from functools import lru_cache
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+
+class ORJSONResponse(JSONResponse):
+	def render(self, content: Any) -> bytes:
+		return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+@lru_cache(maxsize=None)
+def _adapter(schema) -> TypeAdapter:
+	return TypeAdapter(schema)
+
+
+def dump_json(schema, obj) -> bytes:
+	"""Validate ``obj`` (ORM objects included) against ``schema`` and
+	serialize it to JSON bytes in one pass through pydantic-core, the same
+	way FastAPI renders a response model.
+	"""
+	adapter = _adapter(schema)
+	return adapter.dump_json(adapter.validate_python(obj, from_attributes=True))
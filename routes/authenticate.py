@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from depencies import get_db, verify_password, create_access_token, hash_password, verify_user_in_organization, get_current_user
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from admission import AuthAdmission
+from depencies import get_db, verify_and_update_password, create_access_token, hash_password, get_current_user, get_memberships, Memberships
 from models import User
+from loaders import USER_SCHEMA_OPTIONS
+from fieldsets import USER_FIELDS, Selection
+from responses import dump_json
 from datetime import timedelta
 from pydantic import BaseModel
-from schemas import UserCreate, UserSchema, ActiveTeamCreate
+from schemas import UserCreate, UserSchema, UserProfile, ActiveTeamCreate
 from typing import Annotated
 from fastapi.security import OAuth2PasswordRequestForm
 
@@ -20,6 +25,11 @@ class UserResponse(BaseModel):
 	access_token: str
 	token_type: str
 
+class UserProfileResponse(BaseModel):
+	user: UserProfile
+	access_token: str
+	token_type: str
+
 class ProfileResponse(BaseModel):
     user: UserSchema
     
@@ -27,21 +37,35 @@ class LoginRequest(BaseModel):
     username: str
     password: str
 
-@router.post("/login", response_model=UserResponse)
-async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
+async def _check_password(db: AsyncSession, user: User, password: str):
+    """Raise 401 unless ``password`` is the user's; upgrades an outdated hash."""
+    # Ends the read so the connection goes back to the pool while bcrypt runs;
+    # under a login burst the pool would otherwise drain into the hash queue.
+    await db.commit()
 
-    if not user:
+    verified, new_hash = await verify_and_update_password(password, user.hashed_password)
+    if not verified:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect password"
         )
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+
+@router.post("/login", response_model=UserResponse, dependencies=[Depends(AuthAdmission("login", "username"))])
+async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: AsyncSession = Depends(get_db)):
+    result = await db.execute(
+        select(User).options(*USER_SCHEMA_OPTIONS).filter(User.email == form_data.username)
+    )
+    user = result.scalars().first()
 
-    if not verify_password(form_data.password, user.hashed_password):
+    if not user:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect password"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
         )
+    await _check_password(db, user, form_data.password)
 
     token_data = {"sub": str(user.uuid)}
     access_token = create_access_token(
@@ -51,21 +75,17 @@ async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db:
 
     return {"user": user, "access_token": access_token, "token_type": "bearer"}
 
-@router.post("/token", response_model=TokenResponse)
-async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
+@router.post("/token", response_model=TokenResponse, dependencies=[Depends(AuthAdmission("token", "username"))])
+async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(User).filter(User.email == form_data.username))
+    user = result.scalars().first()
 
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-
-    if not verify_password(form_data.password, user.hashed_password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect password"
-        )
+    await _check_password(db, user, form_data.password)
 
     token_data = {"sub": str(user.uuid)}
     access_token = create_access_token(
@@ -75,27 +95,34 @@ async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db:
 
     return {"access_token": access_token, "token_type": "bearer"}
 
-@router.post("/register", response_model=UserResponse)
-async def register(user_create: UserCreate, db: Session = Depends(get_db)):
-	existing_user = db.query(User).filter(User.email == user_create.email).first()
+@router.post("/register", response_model=UserResponse, dependencies=[Depends(AuthAdmission("register", "email"))])
+async def register(user_create: UserCreate, db: AsyncSession = Depends(get_db)):
+	result = await db.execute(select(User).filter(User.email == user_create.email))
+	existing_user = result.scalars().first()
 	if existing_user:
 		raise HTTPException(
 			status_code=status.HTTP_400_BAD_REQUEST,
 			detail="Email already registered"
 		)
+	# As in _check_password, no connection is held while bcrypt runs.
+	await db.commit()
+	hashed_password = await hash_password(user_create.password)
 
-	hashed_password = hash_password(user_create.password)
-
+	# A new user has no memberships yet: setting the relationships the
+	# response reads to empty spares reloading them after the INSERT.
 	new_user = User(
 		email=user_create.email,
 		hashed_password=hashed_password,
 		first_name=user_create.first_name,
-		last_name=user_create.last_name
+		last_name=user_create.last_name,
+		active_organization=None,
+		owned_invitations=[],
+		organizations=[],
+		suppliers=[],
 	)
 
 	db.add(new_user)
-	db.commit()
-	db.refresh(new_user)
+	await db.commit()
 	token_data = {"sub": str(new_user.uuid)}
       
 	access_token = create_access_token(
@@ -108,27 +135,30 @@ async def register(user_create: UserCreate, db: Session = Depends(get_db)):
 @router.post("/activeTeam")
 async def active_team(
     active_team: ActiveTeamCreate, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships)
 ):
-	user_in_organization: bool = Depends(lambda: verify_user_in_organization(active_team.organization_uuid, current_user))
-	if not user_in_organization:
+	if not memberships.in_organization(active_team.organization_uuid):
 		raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User does not belong to this organization."
         )
 	current_user.active_organization_uuid = active_team.organization_uuid
-	db.commit()
-	db.refresh(current_user)
+	await db.commit()
 	return {"message": "Active organization updated successfully."} 
 
 
-@router.post("/user", response_model=UserResponse)
+@router.post("/user", response_model=UserProfileResponse)
 async def get_user(
-	db: Session = Depends(get_db),
+	selection: Selection = Depends(USER_FIELDS),
+	db: AsyncSession = Depends(get_db),
 	current_user: User = Depends(get_current_user)    
 ):
-	user = db.query(User).filter(User.uuid == current_user.uuid).first()
+	result = await db.execute(
+		select(User).options(*selection.options).filter(User.uuid == current_user.uuid)
+	)
+	user = result.scalars().first()
 
 	if not current_user:
 		raise HTTPException(status_code=401, detail="User not authenticated.")
@@ -139,5 +169,6 @@ async def get_user(
 		expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
 	)
 
-	return {"user": user, "access_token": access_token, "token_type": "bearer"}	
+	body = dump_json(selection.envelope(UserProfileResponse, "user"), {"user": user, "access_token": access_token, "token_type": "bearer"})
+	return Response(content=body, media_type="application/json")	
         
\ No newline at end of file
@@ -1,10 +1,22 @@
-from fastapi import FastAPI, Depends, HTTPException, Request, APIRouter
-from fastapi.responses import RedirectResponse
-from google.oauth2.credentials import Credentials
+from fastapi import FastAPI, Depends, HTTPException, Request, APIRouter, Query
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
 from dotenv import load_dotenv
+from datetime import datetime, timedelta
+from jwt import PyJWTError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from functools import lru_cache
+from typing import Optional
+from uuid import UUID
+from depencies import get_db, get_current_user, create_access_token, SECRET_KEY, ALGORITHM
+from jobs import enqueue
+from models import User, GoogleCredential
+from pagination import PageParams
+from schemas import CalendarEventPage
+import calendar_sync
+import google_calendar
 import json
+import jwt
 
 import os
 load_dotenv()
@@ -20,45 +32,97 @@ SCOPES = [os.getenv("GOOGLE_SCOPES")]
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 if GOOGLE_CLIENT_SECRET is None:
     raise ValueError("Client secret JSON not found in environment variables")
-GOOGLE_CLIENT_SECRET_JSON = json.loads(GOOGLE_CLIENT_SECRET)
 
-user_credentials = {}
+@lru_cache(maxsize=None)
+def client_config() -> dict:
+    # Parsed on the first OAuth request rather than at startup.
+    return json.loads(GOOGLE_CLIENT_SECRET)
+
+OAUTH_STATE_PURPOSE = "google_oauth"
+OAUTH_STATE_AUDIENCE = "google-oauth-state"
+OAUTH_STATE_EXPIRE = timedelta(minutes=10)
+
+def create_oauth_state(user_uuid: UUID) -> str:
+    """The signed state that tells the callback which user is connecting.
+
+    It travels through Google's redirect URL, browser history and proxy
+    logs, so it must not work as a bearer token: the audience makes
+    jwt.decode refuse it anywhere it is not asked for, and verify_token
+    also refuses any token with a purpose.
+    """
+    return create_access_token(
+        {"sub": str(user_uuid), "purpose": OAUTH_STATE_PURPOSE, "aud": OAUTH_STATE_AUDIENCE},
+        OAUTH_STATE_EXPIRE,
+    )
+
+def read_oauth_state(state: str) -> UUID:
+    try:
+        claims = jwt.decode(state, SECRET_KEY, algorithms=[ALGORITHM], audience=OAUTH_STATE_AUDIENCE)
+    except PyJWTError:
+        raise HTTPException(status_code=400, detail="Invalid OAuth state")
+    if claims.get("purpose") != OAUTH_STATE_PURPOSE:
+        raise HTTPException(status_code=400, detail="Invalid OAuth state")
+    return UUID(claims["sub"])
 
 @router.get("/loginGoogle")
-def login_with_google():
+def login_with_google(current_user: User = Depends(get_current_user)):
     flow = Flow.from_client_config(
-        GOOGLE_CLIENT_SECRET_JSON,
+        client_config(),
         scopes=SCOPES,
         redirect_uri=REDIRECT_URI
     )
-    auth_url, state = flow.authorization_url(access_type="offline", include_granted_scopes="true")
-    return RedirectResponse(auth_url)
+    # The callback is a redirect from Google without our bearer token.
+    state = create_oauth_state(current_user.uuid)
+    auth_url, state = flow.authorization_url(access_type="offline", include_granted_scopes="true", prompt="consent", state=state)
+    # Answered as JSON, not a redirect: the call carries a bearer token, so
+    # it comes from script, which then sends the browser to Google itself.
+    return {"auth_url": auth_url}
 
 @router.get("/auth/google/callback")
-async def auth_callback(request: Request):
+async def auth_callback(request: Request, state: str, db: AsyncSession = Depends(get_db)):
+    user_uuid = read_oauth_state(state)
+
     authorization_response = str(request.url)
     
     flow = Flow.from_client_config(
-        GOOGLE_CLIENT_SECRET_JSON, 
+        client_config(), 
         scopes=SCOPES,
-        redirect_uri=REDIRECT_URI
+        redirect_uri=REDIRECT_URI,
+        state=state
     )
-    flow.fetch_token(authorization_response=authorization_response)
+    await google_calendar.run_blocking(lambda: flow.fetch_token(authorization_response=authorization_response))
     
-    credentials = flow.credentials
-    user_id = "unique_user_id"
-    user_credentials[user_id] = credentials.to_json()
-    return { "message": "Authorization successful, credentials stored for user."}
+    credentials = json.loads(flow.credentials.to_json())
+    result = await db.execute(select(GoogleCredential).where(GoogleCredential.user_uuid == user_uuid))
+    stored = result.scalars().first()
+    if stored is None:
+        db.add(GoogleCredential(user_uuid=user_uuid, credentials=credentials))
+    else:
+        # Possibly a different Google account: start over with a full sync,
+        # and drop the claim so a sync still running for the old one is
+        # discarded instead of written over the new credentials.
+        stored.credentials = credentials
+        stored.sync_token = None
+        stored.sync_claimed_at = None
+    # Committed with the credentials, so a worker picks it up even if this
+    # process goes away.
+    enqueue(db, "calendar_sync", {"user_uuid": str(user_uuid)}, owner_uuid=user_uuid)
+    await db.commit()
+    google_calendar.forget_user(str(user_uuid))
+    return { "message": "Authorization successful, calendar sync queued."}
 
-@router.get("/events")
-async def get_events(user_id: str):
-    if user_id not in user_credentials:
-        raise HTTPException(status_code=401, detail="User not authenticated")
-    
-    creds = Credentials.from_authorized_user_info(user_credentials[user_id])
-    service = build("calendar", "v3", credentials=creds)
-    
-    events_result = service.events().list(calendarId="primary", maxResults=10, singleEvents=True, orderBy="startTime").execute()
-    events = events_result.get("items", [])
-    
-    return {"events": events}
\ No newline at end of file
+@router.get("/events", response_model=CalendarEventPage)
+async def get_events(
+    time_min: Optional[datetime] = Query(None, description="Only events ending after this time"),
+    time_max: Optional[datetime] = Query(None, description="Only events starting before this time"),
+    page: PageParams = Depends(),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    result = await db.execute(select(GoogleCredential.synced_at).where(GoogleCredential.user_uuid == current_user.uuid))
+    credential = result.first()
+    if credential is None:
+        raise HTTPException(status_code=401, detail="Google Calendar not connected")
+
+    events = await calendar_sync.events_page(db, current_user.uuid, time_min, time_max, page)
+    return {**events, "synced_at": credential.synced_at}
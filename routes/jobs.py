@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from depencies import get_db, get_current_user
+from models import User, Job
+from schemas import JobResponse, JobPage
+from pagination import PageParams, paginate, build_page
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from uuid import UUID
+
+router = APIRouter()
+
+@router.get("/jobs", response_model=JobPage)
+async def get_jobs(
+    status: Optional[str] = Query(None, description="Only jobs in this status: queued, running, succeeded or failed"),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+	stmt = select(Job).filter(Job.owner_uuid == current_user.uuid)
+	if status:
+		stmt = stmt.filter(Job.status == status)
+	result = await db.execute(paginate(stmt, Job, page))
+	return build_page(result.scalars().all(), page)
+
+@router.get("/jobs/{job_uuid}", response_model=JobResponse)
+async def get_job(
+    job_uuid: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+	result = await db.execute(select(Job).filter(Job.uuid == job_uuid, Job.owner_uuid == current_user.uuid))
+	job = result.scalars().first()
+
+	if not job:
+		raise HTTPException(status_code=404, detail="No job found for the user.")
+
+	return job
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import pool_status
+from hashing import password_hasher
+from admission import rate_limiter
+from cache import caches
+from depencies import get_db
+from jobs import queue_status
+import os
+import secrets
+
+# Operators' token for these endpoints; while unset they answer 403 to all.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+def require_metrics_token(authorization: str = Header(None)):
+	expected = f"Bearer {METRICS_TOKEN}"
+	if not METRICS_TOKEN or not secrets.compare_digest((authorization or "").encode(), expected.encode()):
+		raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
+
+
+# Pool, cache, rate-limit and queue figures are for operators, not users: a
+# signed-in user's token does not open them. The Prometheus metrics are
+# served on METRICS_PORT instead (gunicorn.conf.py).
+router = APIRouter(dependencies=[Depends(require_metrics_token)])
+
+@router.get("/metrics/pool")
+async def get_pool_metrics():
+	# Every gunicorn worker owns its pools, so the figures are per process.
+	return {"pid": os.getpid(), "pools": pool_status()}
+
+@router.get("/metrics/hashing")
+async def get_hashing_metrics():
+	return {"pid": os.getpid(), "password_hashing": password_hasher.status()}
+
+@router.get("/metrics/admission")
+async def get_admission_metrics():
+	# Served and shed counts per endpoint are in auth_requests_total on METRICS_PORT.
+	return {"pid": os.getpid(), "rate_limits": rate_limiter.stats()}
+
+@router.get("/metrics/caches")
+async def get_cache_metrics():
+	return {"pid": os.getpid(), "caches": {name: cache.stats() for name, cache in caches.items()}}
+
+@router.get("/metrics/jobs")
+async def get_job_metrics(db: AsyncSession = Depends(get_db)):
+	# Read from the jobs table, so the same for every worker.
+	return await queue_status(db)
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from depencies import get_db, get_current_user
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from depencies import get_db, get_current_user, get_memberships, Memberships
 from models import User, Organization, OrganizationUser
-from schemas import OrganizationCreate, OrganizationResponse
-from sqlalchemy.orm import Session
-from typing import List
-from uuid import UUID
+from schemas import OrganizationCreate, OrganizationResponse, OrganizationPage
+from pagination import PageParams, paginate, build_page
+from loaders import ORGANIZATION_EXPANSIONS
+from fieldsets import ORGANIZATION_FIELDS, Selection
+from etags import compute_etag, etag_matches, not_modified, organization_response_parts
+from response_cache import organization_response_cache, permission_scope
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID, uuid4
 
 
 router = APIRouter()
@@ -12,52 +17,84 @@ router = APIRouter()
 @router.post("/organization", response_model=OrganizationResponse)
 async def create_organization(
     organization: OrganizationCreate, 
-    db: Session = Depends(get_db),
+    selection: Selection = Depends(ORGANIZATION_FIELDS),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
    
+    # The organization and the owner's membership go in one transaction. The
+    # uuid is generated here so the membership can refer to it in the same
+    # flush, and the still-empty collections are set so they are not queried.
     new_organization = Organization(
+        uuid=uuid4(),
         name=organization.name,
-        owner_uuid=current_user.uuid  
+        owner_uuid=current_user.uuid,
+        invitations=[],
+        rfps=[],
+        suppliers=[],
     )
-    db.add(new_organization)
-    db.commit()
-    db.refresh(new_organization)
-
     organization_user = OrganizationUser(
         organization_uuid=new_organization.uuid,
         user_uuid=current_user.uuid
     )
-    db.add(organization_user)
-    db.commit()
-    return new_organization
+    db.add_all([new_organization, organization_user])
+    await db.flush()
+
+    # Loaded before the commit, so it runs inside the same transaction. Only
+    # the members can need loading; the other collections are known to be empty.
+    if "users" in selection.expand:
+        result = await db.execute(
+            select(Organization).options(ORGANIZATION_EXPANSIONS["users"]).filter(Organization.uuid == new_organization.uuid)
+        )
+        new_organization = result.scalars().one()
+    await db.commit()
+    return Response(content=selection.dump(new_organization), media_type="application/json")
 
-@router.get("/organization", response_model=List[OrganizationResponse])
+@router.get("/organization", response_model=OrganizationPage)
 async def get_organizations(
-    db: Session = Depends(get_db),
+    page: PageParams = Depends(),
+    selection: Selection = Depends(ORGANIZATION_FIELDS),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    organizations = db.query(Organization).join(OrganizationUser).filter(
+    result = await db.execute(paginate(select(Organization).options(*selection.options).join(OrganizationUser).filter(
         OrganizationUser.user_uuid == current_user.uuid
-    ).all()
+    ), Organization, page))
+    organizations = result.scalars().all()
 
-    if not organizations:
+    if not organizations and not page.cursor:
         raise HTTPException(status_code=404, detail="No organizations found for the user.")
 
-    return organizations
+    return Response(content=selection.dump_page(build_page(organizations, page)), media_type="application/json")
 
 @router.get("/organization/{organization_uuid}", response_model=OrganizationResponse)
 async def get_organization_with_id(
     organization_uuid: UUID,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    selection: Selection = Depends(ORGANIZATION_FIELDS),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships)
 ):
-    organizations = db.query(Organization).join(OrganizationUser).filter(
-        OrganizationUser.user_uuid == current_user.uuid,
-        Organization.uuid == organization_uuid
-    ).first()
-
-    if not organizations:
+    if not memberships.in_organization(organization_uuid):
         raise HTTPException(status_code=404, detail="No organization found for the user.")
 
-    return organizations
\ No newline at end of file
+    etag = await compute_etag(db, organization_response_parts(organization_uuid, selection.expand), selection.key)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    cache_key = organization_response_cache.key(organization_uuid, permission_scope(memberships, organization_uuid))
+    body = await organization_response_cache.get(cache_key, etag, selection.key)
+    if body is None:
+        result = await db.execute(select(Organization).options(*selection.options).filter(
+            Organization.uuid == organization_uuid
+        ))
+        organizations = result.scalars().first()
+
+        if not organizations:
+            raise HTTPException(status_code=404, detail="No organization found for the user.")
+
+        body = selection.dump(organizations)
+        await organization_response_cache.set(cache_key, etag, selection.key, body)
+
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
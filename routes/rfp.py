@@ -1,9 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from depencies import get_db, get_current_user, verify_user_in_organization
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from depencies import get_db, get_current_user, get_memberships, verify_user_in_organization, Memberships
 from models import User, RFP, OrganizationUser, Organization
-from schemas import RFPCreate, RFPResponse
-from sqlalchemy.orm import Session
-from typing import List
+from schemas import RFPCreate, RFPResponse, RFPPage, RFPBatch, BulkCreateResponse, JobResponse
+from bulk import bulk_job_payload, check_batch_size, create_rfps, order_batch, validate_bulk_items
+from jobs import enqueue
+from responses import dump_json
+from pagination import PageParams, build_page
+from data_filters import DataFilterParams, fetch_filtered_page
+from fieldsets import RFP_FIELDS, Selection
+from export import ExportFormat, export_response
+from etags import compute_etag, etag_matches, not_modified, rfp_response_parts
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Any
 from uuid import UUID
 
 router = APIRouter()
@@ -11,13 +20,12 @@ router = APIRouter()
 @router.post("/rfp", response_model=RFPResponse)
 async def create_rfp(
     rfp: RFPCreate, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-): 
-	user_in_organization: bool = Depends(lambda: verify_user_in_organization(rfp.organization_uuid, current_user))
-
-	if not user_in_organization:
-		raise HTTPException(status_code=401, detail="User not in organization")
+    selection: Selection = Depends(RFP_FIELDS),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships)
+):
+	verify_user_in_organization(rfp.organization_uuid, memberships)
 		
 	new_rfp = RFP(
 		owner_uuid=current_user.uuid,  
@@ -25,47 +33,122 @@ async def create_rfp(
 		data=rfp.data
 	)
 	db.add(new_rfp)
-	db.commit()
-	db.refresh(new_rfp) 
-	return new_rfp
+	await db.flush()
+	# Expansions are loaded before the commit, so in the same transaction.
+	if selection.expand:
+		result = await db.execute(
+			select(RFP).options(*selection.options).filter(RFP.uuid == new_rfp.uuid)
+		)
+		new_rfp = result.scalars().one()
+	await db.commit()
+	return Response(content=selection.dump(new_rfp), media_type="application/json")
+
+@router.post("/rfp/bulk", response_model=BulkCreateResponse, responses={202: {"model": JobResponse}})
+async def create_rfps_bulk(
+    items: List[Any],
+    background: bool = Query(False, description="Queue the import as a job and answer 202 with it; see /jobs"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships)
+):
+	if background:
+		# Validated, memberships included, when the job runs.
+		job = enqueue(db, "rfp_bulk_create", bulk_job_payload(current_user.uuid, items), owner_uuid=current_user.uuid)
+		await db.commit()
+		return Response(content=dump_json(JobResponse, job), status_code=202, media_type="application/json")
+
+	valid, errors = validate_bulk_items(items, RFPCreate, memberships)
+	created = []
+	if valid:
+		created = await create_rfps(db, current_user.uuid, valid)
+	return {"created": created, "errors": errors}
 
-@router.get("/rfp", response_model=List[RFPResponse])
+@router.get("/rfp", response_model=RFPPage)
 async def get_rfps(
     organization_uuid: UUID = Query(..., description="Organization UUID to define organization"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    page: PageParams = Depends(),
+    data_filters: DataFilterParams = Depends(),
+    selection: Selection = Depends(RFP_FIELDS),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships)
 ):
-	user_in_organization: bool = Depends(lambda: verify_user_in_organization(organization_uuid, current_user))
-
-	if not user_in_organization:
-		raise HTTPException(status_code=401, detail="User not in organization")
+	verify_user_in_organization(organization_uuid, memberships)
           
-	rfps = db.query(RFP).filter(
-		RFP.organization_uuid == organization_uuid
-    ).all()
+	rfps = await fetch_filtered_page(
+		db,
+		select(RFP).options(*selection.options).filter(
+			RFP.organization_uuid == organization_uuid
+		),
+		RFP, page, data_filters
+	)
 
-	if not rfps:
+	if not rfps and not page.cursor and not data_filters:
 		raise HTTPException(status_code=404, detail="No rfps found for the user.")
 
-	return rfps
+	return Response(content=selection.dump_page(build_page(rfps, page)), media_type="application/json")
+
+@router.get("/rfp/export")
+async def export_rfps(
+    organization_uuid: UUID = Query(..., description="Organization UUID to define organization"),
+    format: ExportFormat = Query(ExportFormat.ndjson, description="ndjson or csv"),
+    gzip: bool = Query(False, description="gzip the stream on the fly"),
+    data_filters: DataFilterParams = Depends(),
+    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships)
+):
+	verify_user_in_organization(organization_uuid, memberships)
+
+	return export_response(
+		select(RFP).filter(RFP.organization_uuid == organization_uuid),
+		RFP, format, "rfps", data_filters, gzip
+	)
+
+@router.get("/rfp/batch", response_model=RFPBatch)
+async def get_rfps_batch(
+    organization_uuid: UUID = Query(..., description="Organization UUID to define organization"),
+    uuids: List[UUID] = Query(..., alias="uuid", description="RFP UUIDs to fetch, in the order to return them"),
+    selection: Selection = Depends(RFP_FIELDS),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships)
+):
+	check_batch_size(uuids)
+	verify_user_in_organization(organization_uuid, memberships)
+
+	result = await db.execute(
+		select(RFP).options(*selection.options).filter(
+			RFP.organization_uuid == organization_uuid,
+			RFP.uuid.in_(set(uuids))
+		)
+	)
+	return Response(content=selection.dump_batch(order_batch(uuids, result.scalars().all())), media_type="application/json")
 
 @router.get("/rfp/{rfp_uuid}", response_model=RFPResponse)
 async def get_rfp_with_id(
     rfp_uuid: UUID,
+    request: Request,
 	organization_uuid: UUID = Query(..., description="Organization UUID to define organization"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    selection: Selection = Depends(RFP_FIELDS),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships)
 ):
-	user_in_organization: bool = Depends(lambda: verify_user_in_organization(organization_uuid, current_user))
+	verify_user_in_organization(organization_uuid, memberships)
 
-	if not user_in_organization:
-		raise HTTPException(status_code=401, detail="User not in organization")
+	etag = await compute_etag(db, rfp_response_parts(rfp_uuid, organization_uuid, selection.expand), selection.key)
+	if etag_matches(request, etag):
+		return not_modified(etag)
 	
-	rfp = db.query(RFP).filter(
-		RFP.uuid == rfp_uuid
-	).first()
+	result = await db.execute(
+		select(RFP).options(*selection.options).filter(
+			RFP.uuid == rfp_uuid,
+			RFP.organization_uuid == organization_uuid
+		)
+	)
+	rfp = result.scalars().first()
 
 	if not rfp:
 		raise HTTPException(status_code=404, detail="No rfp found for the user.")
 
-	return rfp
\ No newline at end of file
+	return Response(content=selection.dump(rfp), media_type="application/json", headers={"ETag": etag})
\ No newline at end of file
@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends, Query
+from depencies import get_db, get_current_user, get_memberships, verify_user_in_organization, Memberships
+from models import User
+from schemas import SearchPage
+from pagination import PageParams
+from search import search_page
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID
+
+router = APIRouter()
+
+@router.get("/search", response_model=SearchPage)
+async def search(
+    organization_uuid: UUID = Query(..., description="Organization UUID to define organization"),
+    q: str = Query(..., min_length=1, max_length=200, description="Search terms; quoted phrases, OR and -term are supported"),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships)
+):
+	verify_user_in_organization(organization_uuid, memberships)
+
+	return await search_page(db, organization_uuid, q, page)
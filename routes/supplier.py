@@ -1,10 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from depencies import get_db, get_current_user, verify_user_in_organization
-from models import User, Supplier, SupplierUser, OrganizationUser
-from schemas import SupplierCreate, SupplierResponse
-from sqlalchemy.orm import Session
-from typing import List
-from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from depencies import get_db, get_current_user, get_memberships, verify_user_in_organization, Memberships
+from models import User, Supplier, SupplierUser
+from schemas import SupplierCreate, SupplierResponse, SupplierPage, SupplierBatch, BulkCreateResponse, JobResponse
+from bulk import bulk_job_payload, check_batch_size, create_suppliers, order_batch, validate_bulk_items
+from jobs import enqueue
+from responses import dump_json
+from pagination import PageParams, build_page
+from data_filters import DataFilterParams, fetch_filtered_page
+from fieldsets import SUPPLIER_FIELDS, Selection
+from export import ExportFormat, export_response
+from etags import compute_etag, etag_matches, not_modified, supplier_list_parts
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Any
+from uuid import UUID, uuid4
 
 router = APIRouter()
 class SupplierUserRole(str):
@@ -15,79 +24,155 @@ class SupplierUserRole(str):
 @router.post("/supplier", response_model=SupplierResponse)
 async def create_supplier(
     supplier: SupplierCreate, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-): 
-	user_in_organization: bool = Depends(lambda: verify_user_in_organization(supplier.organization_uuid, current_user))
-
-	if not user_in_organization:
-		raise HTTPException(status_code=401, detail="User not in organization")
+    selection: Selection = Depends(SUPPLIER_FIELDS),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships)
+):
+	verify_user_in_organization(supplier.organization_uuid, memberships)
 		
+	# One transaction for the supplier and the owner's membership; see
+	# create_organization.
 	new_supplier = Supplier(
-        name=supplier.name,
+		uuid=uuid4(),
+		name=supplier.name,
 		owner_uuid=current_user.uuid,  
 		organization_uuid=supplier.organization_uuid,
 		data=supplier.data
 	)
-	db.add(new_supplier)
-	db.commit()
-	db.refresh(new_supplier) 
-	
 	supplier_user = SupplierUser(
 		supplier_uuid=new_supplier.uuid,
 		user_uuid=current_user.uuid,
 	)
-	db.add(supplier_user)
-	db.commit()
+	db.add_all([new_supplier, supplier_user])
+	await db.flush()
+
+	if selection.expand:
+		result = await db.execute(
+			select(Supplier).options(*selection.options).filter(Supplier.uuid == new_supplier.uuid)
+		)
+		new_supplier = result.scalars().one()
+	await db.commit()
+	return Response(content=selection.dump(new_supplier), media_type="application/json")
+
+@router.post("/supplier/bulk", response_model=BulkCreateResponse, responses={202: {"model": JobResponse}})
+async def create_suppliers_bulk(
+    items: List[Any],
+    background: bool = Query(False, description="Queue the import as a job and answer 202 with it; see /jobs"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships)
+):
+	if background:
+		# Validated, memberships included, when the job runs.
+		job = enqueue(db, "supplier_bulk_create", bulk_job_payload(current_user.uuid, items), owner_uuid=current_user.uuid)
+		await db.commit()
+		return Response(content=dump_json(JobResponse, job), status_code=202, media_type="application/json")
 
-	return new_supplier
+	valid, errors = validate_bulk_items(items, SupplierCreate, memberships)
+	created = []
+	if valid:
+		created = await create_suppliers(db, current_user.uuid, valid)
+	return {"created": created, "errors": errors}
 
-@router.get("/suppliers", response_model=List[SupplierResponse])
+@router.get("/suppliers", response_model=SupplierPage)
 async def get_suppliers(
+    request: Request,
     organization_uuid: UUID = Query(..., description="UUID of the organization to filter suppliers by"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    page: PageParams = Depends(),
+    data_filters: DataFilterParams = Depends(),
+    selection: Selection = Depends(SUPPLIER_FIELDS),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships)
 ):
-    user_in_org = db.query(OrganizationUser).filter(
-        OrganizationUser.user_uuid == current_user.uuid,
-        OrganizationUser.organization_uuid == organization_uuid
-    ).first()
-
-    if not user_in_org:
+    if not memberships.in_organization(organization_uuid):
         raise HTTPException(status_code=403, detail="User does not belong to the specified organization.")
 
-    suppliers = db.query(Supplier).join(SupplierUser).filter(
+    # The tag covers every supplier the user can see in the organization, so
+    # it is safe for any page or filter of this URL.
+    etag = await compute_etag(db, supplier_list_parts(organization_uuid, current_user.uuid, selection.expand), selection.key)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    suppliers = await fetch_filtered_page(db, select(Supplier).options(*selection.options).join(SupplierUser).filter(
         SupplierUser.user_uuid == current_user.uuid,
         Supplier.organization_uuid == organization_uuid
-    ).all()
+    ), Supplier, page, data_filters)
 
-    if not suppliers:
+    if not suppliers and not page.cursor and not data_filters:
         raise HTTPException(status_code=404, detail="No suppliers found for the user in this organization.")
 
-    return suppliers
+    return Response(content=selection.dump_page(build_page(suppliers, page)), media_type="application/json", headers={"ETag": etag})
+
+@router.get("/suppliers/export")
+async def export_suppliers(
+    organization_uuid: UUID = Query(..., description="UUID of the organization to export suppliers of"),
+    format: ExportFormat = Query(ExportFormat.ndjson, description="ndjson or csv"),
+    gzip: bool = Query(False, description="gzip the stream on the fly"),
+    data_filters: DataFilterParams = Depends(),
+    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships)
+):
+    if not memberships.in_organization(organization_uuid):
+        raise HTTPException(status_code=403, detail="User does not belong to the specified organization.")
+
+    return export_response(
+        select(Supplier).join(SupplierUser).filter(
+            SupplierUser.user_uuid == current_user.uuid,
+            Supplier.organization_uuid == organization_uuid
+        ),
+        Supplier, format, "suppliers", data_filters, gzip
+    )
+
+@router.get("/suppliers/batch", response_model=SupplierBatch)
+async def get_suppliers_batch(
+    organization_uuid: UUID = Query(..., description="UUID of the organization to get suppliers by"),
+    uuids: List[UUID] = Query(..., alias="uuid", description="Supplier UUIDs to fetch, in the order to return them"),
+    selection: Selection = Depends(SUPPLIER_FIELDS),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships)
+):
+    check_batch_size(uuids)
+    if not memberships.in_organization(organization_uuid):
+        raise HTTPException(status_code=403, detail="User does not belong to the specified organization.")
+
+    # Suppliers the user is not a member of are reported as missing without
+    # being queried, as get_supplier_by_uuid answers 404 for them.
+    visible = {supplier_uuid for supplier_uuid in uuids if memberships.in_supplier(supplier_uuid)}
+    suppliers = []
+    if visible:
+        result = await db.execute(select(Supplier).options(*selection.options).filter(
+            Supplier.organization_uuid == organization_uuid,
+            Supplier.uuid.in_(visible)
+        ))
+        suppliers = result.scalars().all()
+
+    return Response(content=selection.dump_batch(order_batch(uuids, suppliers)), media_type="application/json")
 
 @router.get("/suppliers{supplier_uuid}", response_model=SupplierResponse)
 async def get_supplier_by_uuid(
     supplier_uuid: UUID,
     organization_uuid: UUID = Query(..., description="UUID of the organization to get supplier by"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    selection: Selection = Depends(SUPPLIER_FIELDS),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships)
 ):
-    user_in_org = db.query(OrganizationUser).filter(
-        OrganizationUser.user_uuid == current_user.uuid,
-        OrganizationUser.organization_uuid == organization_uuid
-    ).first()
-
-    if not user_in_org:
+    if not memberships.in_organization(organization_uuid):
         raise HTTPException(status_code=403, detail="User does not belong to the specified organization.")
 
-    supplier = db.query(Supplier).join(SupplierUser).filter(
-        SupplierUser.user_uuid == current_user.uuid,
+    if not memberships.in_supplier(supplier_uuid):
+        raise HTTPException(status_code=404, detail="No supplier found for the user in this organization.")
+
+    result = await db.execute(select(Supplier).options(*selection.options).filter(
         Supplier.organization_uuid == organization_uuid,
         Supplier.uuid == supplier_uuid
-    ).first()
+    ))
+    supplier = result.scalars().first()
 
     if not supplier:
         raise HTTPException(status_code=404, detail="No supplier found for the user in this organization.")
 
-    return supplier
\ No newline at end of file
+    return Response(content=selection.dump(supplier), media_type="application/json")
\ No newline at end of file
@@ -1,4 +1,5 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from datetime import datetime
 from typing import List, Optional, Dict, Any
 from uuid import UUID
 
@@ -8,8 +9,7 @@ class InvitationSchema(BaseModel):
     email: str
     status: str
 
-    class Config:
-        orm_mode = True  # Enable ORM mode for direct use of SQLAlchemy models
+    model_config = ConfigDict(from_attributes=True)  # Validate straight from SQLAlchemy models
 
 class SupplierSchema(BaseModel):
 	id: int
@@ -18,8 +18,7 @@ class SupplierSchema(BaseModel):
 	data: Dict[str, Any] = Field(default_factory=dict)
 	uuid: UUID
 
-	class Config:
-		orm_mode = True
+	model_config = ConfigDict(from_attributes=True)
 
 class OrganizationSchema(BaseModel):
 	id: int
@@ -27,12 +26,13 @@ class OrganizationSchema(BaseModel):
 	uuid: UUID
 	suppliers: List[SupplierSchema] = [] 
 
-	class Config:
-		orm_mode = True
+	model_config = ConfigDict(from_attributes=True)
 
 class UserSchema(BaseModel):
 	uuid: UUID
-	email: EmailStr
+	# Validated as EmailStr on the way in; re-running the email validator for
+	# every nested user on every response cost more than the rest combined.
+	email: str
 	first_name: str
 	last_name: str
 	active_organization: Optional[OrganizationSchema] = None
@@ -40,8 +40,7 @@ class UserSchema(BaseModel):
 	owned_organizations: List[OrganizationSchema] = []
 	organizations: List[OrganizationSchema] = []
 	suppliers: List[SupplierSchema] = [] 
-	class Config:
-		orm_mode = True
+	model_config = ConfigDict(from_attributes=True)
         
 class UserCreate(BaseModel):
 	email: EmailStr
@@ -49,11 +48,41 @@ class UserCreate(BaseModel):
 	last_name: str
 	password: str
 	
+class UserSummary(BaseModel):
+	uuid: UUID
+	email: str
+	first_name: str
+	last_name: str
+
+	model_config = ConfigDict(from_attributes=True)
+
+class OrganizationSummary(BaseModel):
+	uuid: UUID
+	name: str
+	owner_uuid: UUID
+
+	model_config = ConfigDict(from_attributes=True)
+
+# The *Response models below document every field a response can carry. A
+# response holds the columns named in ``fields`` (all of them by default)
+# and only the relationships named in ``expand``; see fieldsets.py.
+
 class RFPResponse(BaseModel):
 	uuid: UUID	
-	data: Dict[str, Any] = Field(default_factory=dict)
-	owner: UserSchema
-	organization: OrganizationSchema
+	name: Optional[str] = None
+	data: Optional[Dict[str, Any]] = None
+	organization_uuid: UUID
+	owner_uuid: Optional[UUID] = None
+	created_at: datetime
+	updated_at: datetime
+	owner: Optional[UserSummary] = None
+	organization: Optional[OrganizationSummary] = None
+
+	model_config = ConfigDict(from_attributes=True)
+
+class RFPPage(BaseModel):
+	items: List[RFPResponse] = []
+	next_cursor: Optional[str] = None
 
       
 class RFPCreate(BaseModel):
@@ -62,13 +91,27 @@ class RFPCreate(BaseModel):
 
 class RFPSchema(BaseModel):
 	data: Optional[dict[str, Any]] = Field(default_factory=dict) 
+
+	model_config = ConfigDict(from_attributes=True)
       
 class SupplierResponse(BaseModel):
 	uuid: UUID	
-	name: str
-	data: Optional[dict[str, Any]] = Field(default_factory=dict) 
-	owner: UserSchema
-	organization: OrganizationSchema
+	name: Optional[str] = None
+	logo_url: Optional[str] = None
+	data: Optional[Dict[str, Any]] = None
+	organization_uuid: UUID
+	owner_uuid: Optional[UUID] = None
+	created_at: datetime
+	updated_at: datetime
+	owner: Optional[UserSummary] = None
+	organization: Optional[OrganizationSummary] = None
+	users: List[UserSummary] = []
+
+	model_config = ConfigDict(from_attributes=True)
+
+class SupplierPage(BaseModel):
+	items: List[SupplierResponse] = []
+	next_cursor: Optional[str] = None
 
 
       
@@ -82,14 +125,22 @@ class OrganizationCreate(BaseModel):
 	name: str
 
 class OrganizationResponse(BaseModel):
-	name: str	
 	uuid: UUID
+	name: str	
 	owner_uuid: UUID
-	users: List[UserSchema] = [] 
+	created_at: datetime
+	updated_at: datetime
+	users: List[UserSummary] = [] 
 	invitations: List[InvitationSchema] = [] 
 	rfps: List[RFPSchema] = [] 
 	suppliers: List[SupplierSchema] = [] 
 
+	model_config = ConfigDict(from_attributes=True)
+
+class OrganizationPage(BaseModel):
+	items: List[OrganizationResponse] = []
+	next_cursor: Optional[str] = None
+
 
 class OrganizationSchema(BaseModel):
 	name: str	
@@ -99,6 +150,23 @@ class OrganizationSchema(BaseModel):
 	rfps: List[RFPSchema] = [] 
 	suppliers: List[SupplierSchema] = [] 
 
+	model_config = ConfigDict(from_attributes=True)
+
+class UserProfile(BaseModel):
+	uuid: UUID
+	email: str
+	first_name: str
+	last_name: str
+	active_organization_uuid: Optional[UUID] = None
+	created_at: datetime
+	updated_at: datetime
+	active_organization: Optional[OrganizationSummary] = None
+	owned_invitations: List[InvitationSchema] = []
+	organizations: List[OrganizationSummary] = []
+	suppliers: List[SupplierSchema] = []
+
+	model_config = ConfigDict(from_attributes=True)
+
 class OrganizationUserSchema(BaseModel):
 	user_uuid: UUID
 	organization_uuid: UUID
@@ -116,4 +184,61 @@ class SupplierUserSchema(BaseModel):
 
 class SupplierUserCreate(BaseModel):
 	user_uuid: UUID
-	supplier_uuid: UUID
\ No newline at end of file
+	supplier_uuid: UUID
+
+class BulkCreatedItem(BaseModel):
+	index: int
+	uuid: UUID
+
+class BulkItemError(BaseModel):
+	index: int
+	detail: str
+
+class BulkCreateResponse(BaseModel):
+	created: List[BulkCreatedItem] = []
+	errors: List[BulkItemError] = []
+
+class RFPBatch(BaseModel):
+	# Aligned with the requested uuids; None where errors has the index.
+	items: List[Optional[RFPResponse]] = []
+	errors: List[BulkItemError] = []
+
+class SupplierBatch(BaseModel):
+	items: List[Optional[SupplierResponse]] = []
+	errors: List[BulkItemError] = []
+
+class JobResponse(BaseModel):
+	uuid: UUID
+	kind: str
+	status: str
+	attempts: int
+	max_attempts: int
+	run_at: datetime
+	finished_at: Optional[datetime] = None
+	last_error: Optional[str] = None
+	result: Optional[Any] = None
+	created_at: datetime
+	updated_at: datetime
+
+	model_config = ConfigDict(from_attributes=True)
+
+class JobPage(BaseModel):
+	items: List[JobResponse] = []
+	next_cursor: Optional[str] = None
+
+class SearchResult(BaseModel):
+	kind: str
+	uuid: UUID
+	name: Optional[str] = None
+	rank: float
+	highlight: Optional[str] = None
+
+class SearchPage(BaseModel):
+	items: List[SearchResult] = []
+	next_cursor: Optional[str] = None
+
+class CalendarEventPage(BaseModel):
+	# Event resources as the Calendar API returns them, served from the local copy.
+	items: List[Dict[str, Any]] = []
+	next_cursor: Optional[str] = None
+	synced_at: Optional[datetime] = None
@@ -0,0 +1,96 @@
+"""Full-text search across the RFPs and suppliers of an organization.
+
+On Postgres both tables carry a ``search_vector`` tsvector column, generated
+from the name and the SEARCH_DATA_FIELDS of ``data`` and served by a GIN
+index (see the search_vector migration). The column is deliberately not
+mapped on the models: it is maintained by Postgres, and leaving it off the
+mapping keeps it out of every ``select(RFP)``.
+
+Matches are ranked with ts_rank and paged on (rank, kind, id); highlights
+are only computed for the rows of the returned page. On other databases,
+which only back tests, a case-insensitive substring match stands in.
+"""
+from sqlalchemy import func, literal, literal_column, select, tuple_, union_all
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from fastapi import HTTPException
+from models import RFP, Supplier
+from pagination import PageParams, encode_token, decode_token
+
+SEARCH_CONFIG = "english"
+# Keep in step with the generated column expression in the migration.
+SEARCH_DATA_FIELDS = ("title", "description", "category")
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MinWords=5, MaxWords=20"
+SEARCH_MODELS = (("rfp", RFP), ("supplier", Supplier))
+
+
+def _document(name, data):
+	"""The searchable text of a row, the same text the tsvector is built from."""
+	document = func.coalesce(name, "")
+	for field in SEARCH_DATA_FIELDS:
+		document = document + " " + func.coalesce(data[field].as_string(), "")
+	return document
+
+
+def _matches(kind, model, organization_uuid, q, postgres):
+	columns = [
+		literal(kind).label("kind"),
+		model.id.label("id"),
+		model.uuid.label("uuid"),
+		model.name.label("name"),
+		model.data.label("data"),
+	]
+	if postgres:
+		vector = literal_column(f"{model.__tablename__}.search_vector", TSVECTOR)
+		query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+		return select(*columns, func.ts_rank(vector, query).label("rank")).filter(
+			model.organization_uuid == organization_uuid,
+			vector.op("@@")(query),
+		)
+	return select(*columns, literal(0.0).label("rank")).filter(
+		model.organization_uuid == organization_uuid,
+		func.lower(_document(model.name, model.data)).contains(q.lower(), autoescape=True),
+	)
+
+
+def _decode_search_cursor(cursor: str):
+	try:
+		rank, kind, id = decode_token(cursor)
+		return float(rank), str(kind), int(id)
+	except (ValueError, TypeError):
+		raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def search_page(db, organization_uuid, q: str, page: PageParams) -> dict:
+	postgres = db.bind.dialect.name == "postgresql"
+	matches = union_all(
+		*(_matches(kind, model, organization_uuid, q, postgres) for kind, model in SEARCH_MODELS)
+	).subquery("matches")
+
+	stmt = select(matches)
+	if page.cursor:
+		stmt = stmt.filter(
+			tuple_(matches.c.rank, matches.c.kind, matches.c.id) < tuple_(*_decode_search_cursor(page.cursor))
+		)
+	ranked = stmt.order_by(
+		matches.c.rank.desc(), matches.c.kind.desc(), matches.c.id.desc()
+	).limit(page.limit + 1).subquery("ranked")
+
+	document = _document(ranked.c.name, ranked.c.data)
+	if postgres:
+		highlight = func.ts_headline(SEARCH_CONFIG, document, func.websearch_to_tsquery(SEARCH_CONFIG, q), HEADLINE_OPTIONS)
+	else:
+		highlight = document
+	result = await db.execute(
+		select(
+			ranked.c.kind, ranked.c.id, ranked.c.uuid, ranked.c.name, ranked.c.rank,
+			highlight.label("highlight"),
+		).order_by(ranked.c.rank.desc(), ranked.c.kind.desc(), ranked.c.id.desc())
+	)
+	rows = result.all()
+
+	items = rows[:page.limit]
+	next_cursor = None
+	if len(rows) > page.limit:
+		last = items[-1]
+		next_cursor = encode_token([last.rank, last.kind, last.id])
+	return {"items": [row._asdict() for row in items], "next_cursor": next_cursor}
@@ -0,0 +1,55 @@
+"""Fixtures for the regression tests.
+
+The tests create tables in, and add rows to, the database at
+TEST_DATABASE_URL, so point it at a scratch database; without it they are
+skipped. The query-plan tests also need it to be Postgres.
+
+    TEST_DATABASE_URL=postgresql://localhost/scratch python -m pytest
+"""
+import asyncio
+import os
+import pytest
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+	# database.py reads it on import, and load_dotenv does not override it.
+	os.environ["DATABASE_URL_ENV"] = TEST_DATABASE_URL
+	# depencies.py and main.py refuse to import without these.
+	os.environ.setdefault("JWT_SECRET_KEY", "test-secret-key")
+	os.environ.setdefault("BASE_URL", "http://localhost:3000")
+
+
+@pytest.fixture(scope="session")
+def database():
+	if not TEST_DATABASE_URL:
+		pytest.skip("TEST_DATABASE_URL is not set")
+	from database import engine
+	from models import Base
+
+	Base.metadata.create_all(engine)
+	return engine
+
+
+@pytest.fixture(scope="session")
+def postgres(database):
+	if database.dialect.name != "postgresql":
+		pytest.skip("query plans are only meaningful on Postgres")
+	return database
+
+
+@pytest.fixture
+def run(database):
+	"""asyncio.run for the app's coroutines."""
+	from database import async_engine
+
+	def run(coroutine):
+		async def and_dispose():
+			try:
+				return await coroutine
+			finally:
+				# Its connections belong to this event loop, which is closed next.
+				await async_engine.dispose()
+
+		return asyncio.run(and_dispose())
+
+	return run
@@ -0,0 +1,8 @@
+def test_create_endpoints_stay_within_their_round_trip_budgets(run):
+	from benchmarks.create_round_trips import ROUND_TRIP_BUDGETS, measure
+
+	results = run(measure())
+
+	assert set(results) == set(ROUND_TRIP_BUDGETS)
+	over = {name: result for name, result in results.items() if sum(result.values()) > ROUND_TRIP_BUDGETS[name]}
+	assert not over, f"round trips over budget {ROUND_TRIP_BUDGETS}: {over}"
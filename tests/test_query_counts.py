@@ -0,0 +1,9 @@
+def test_list_endpoints_stay_within_their_query_budgets(run):
+	from benchmarks.query_counts import QUERY_BUDGETS, measure, seed
+
+	email, organization_uuid = seed(rows=20)
+	counts = run(measure(email, organization_uuid))
+
+	assert set(counts) == set(QUERY_BUDGETS)
+	over = {name: count for name, count in counts.items() if count > QUERY_BUDGETS[name]}
+	assert not over, f"queries over budget {QUERY_BUDGETS}: {over}"
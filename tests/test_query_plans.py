@@ -0,0 +1,25 @@
+import uuid
+import pytest
+
+# Large enough that Postgres picks an index whenever one can serve the
+# query, small enough to seed in a few seconds.
+USERS = 5000
+ORGANIZATIONS = 1000
+ROWS = 50000
+MEMBERSHIPS = 3
+
+
+@pytest.fixture(scope="module")
+def hot_queries(postgres):
+	from benchmarks.query_plans import hot_queries, seed
+
+	return hot_queries(*seed(uuid.uuid4().hex[:8], USERS, ORGANIZATIONS, ROWS, MEMBERSHIPS))
+
+
+@pytest.mark.parametrize("name", ["memberships", "rfp_page", "supplier_page", "organization_members", "supplier_members"])
+def test_hot_query_does_not_scan_a_large_table(postgres, hot_queries, name):
+	from benchmarks.query_plans import explain, seq_scans
+
+	with postgres.connect() as connection:
+		plan = explain(connection, hot_queries[name])
+	assert not seq_scans(plan), f"{name} scans {seq_scans(plan)}"
@@ -0,0 +1,61 @@
+"""Background job worker: claims and runs the jobs queued in the database.
+
+    python worker.py --concurrency 8
+
+Stops on SIGTERM or SIGINT once the jobs it is running have finished. Set
+JOB_METRICS_PORT to serve its Prometheus metrics, such as attempts by
+outcome, on that port.
+"""
+import argparse
+import asyncio
+import importlib
+import logging
+import os
+import signal
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from prometheus_client import start_http_server
+from cache import CACHE_INVALIDATION_BROADCAST, PostgresInvalidationBroadcaster
+from database import DATABASE_URL_ENV, async_engine
+from jobs import JOB_WORKER_CONCURRENCY, Worker
+
+# Registers the handlers.
+importlib.import_module("job_handlers")
+
+JOB_METRICS_PORT = os.getenv("JOB_METRICS_PORT")
+
+
+async def run(concurrency: int):
+	worker = Worker(concurrency)
+	loop = asyncio.get_running_loop()
+	for signum in (signal.SIGTERM, signal.SIGINT):
+		loop.add_signal_handler(signum, worker.stop)
+	# Jobs write through the ORM too, so the web workers' caches must hear
+	# about it the same way.
+	broadcaster = None
+	if CACHE_INVALIDATION_BROADCAST == "postgres":
+		broadcaster = PostgresInvalidationBroadcaster(DATABASE_URL_ENV)
+		await broadcaster.start()
+	try:
+		await worker.run()
+	finally:
+		if broadcaster is not None:
+			await broadcaster.stop()
+		await async_engine.dispose()
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY, help="jobs run at once")
+	args = parser.parse_args()
+
+	logging.basicConfig(level=logging.INFO)
+	if JOB_METRICS_PORT:
+		start_http_server(int(JOB_METRICS_PORT))
+	asyncio.run(run(args.concurrency))
+
+
+if __name__ == "__main__":
+	main()